@@ -31,6 +31,7 @@
 #include "inc/MjjStatisticalTest.h"
 #include "inc/MjjStatisticsBundle.h"
 #include "inc/MathFunctions.h"
+#include "inc/MjjPvalCache.h"
 
 // ---------------------------------------------------------
 class MjjBumpHunter : public MjjStatisticalTest 
@@ -64,6 +65,13 @@ class MjjBumpHunter : public MjjStatisticalTest
       TGraphErrors GetBumpHunterTomography()
           { return fSpectrumTomography; };
 
+      /**
+       * Retrieves the cache of window p-values, which is
+       * kept across calls to DoTest. Use it to check the hit rate.
+       * @return The p-value cache. */
+      MjjPvalCache & GetPvalCache()
+          { return fPvalCache; };
+
       /** @} */
 
       /** \name Member functions (set) */
@@ -119,6 +127,13 @@ class MjjBumpHunter : public MjjStatisticalTest
       void SetNoisy(bool isnoisy)
           { fNoisy = isnoisy; };
 
+      /**
+       * Sets number of window p-values remembered between
+       * calls to DoTest. Zero switches the cache off.
+       * @param nEntries Maximum number of cached p-values. */
+      void SetPvalCacheSize(unsigned int nEntries)
+          { fPvalCache.SetMaxEntries(nEntries); };
+
       /** @} */
       /** \name Member functions (overloaded from MjjStatisticalTest) */
       /** @{ */
@@ -226,6 +241,11 @@ class MjjBumpHunter : public MjjStatisticalTest
 
       bool fNoisy;
 
+      /**
+       * Memoized window p-values. The background is the same
+       * for every pseudo-experiment, so the same (d, b) pairs recur. */
+      MjjPvalCache fPvalCache;
+
 };
 
 #endif
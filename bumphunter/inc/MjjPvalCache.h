@@ -0,0 +1,127 @@
+#ifndef MJJPVALCACHE_H
+#define MJJPVALCACHE_H
+
+/*!
+ * \class MjjPvalCache
+ * \brief Memoized Poisson tail probabilities
+ *
+ * The background passed to the BumpHunter is the same in every
+ * pseudo-experiment, so the window sums of the background are too,
+ * and toys keep asking for the p-value of the same integer observed
+ * count in the same window. This class remembers PoissonPval and
+ * PoissonConvGammaPval results keyed on (d, b, bErr), dropping the
+ * least recently used entry once it holds fMaxEntries values, and
+ * counts hits and misses so the hit rate can be checked.
+ */
+
+// ---------------------------------------------------------
+
+#include <iostream>
+#include <list>
+#include <unordered_map>
+#include <functional>
+
+#include "inc/MathFunctions.h"
+
+// ---------------------------------------------------------
+class MjjPvalCache
+{
+
+   public:
+
+      /** \name Constructors and destructors */
+      /** @{ */
+
+      /**
+       * The default constructor.
+       * @param maxEntries Number of p-values kept. Zero, the default,
+       * switches caching off. */
+      MjjPvalCache(unsigned int maxEntries=0);
+
+      /**
+       * The default destructor. */
+      ~MjjPvalCache();
+
+      /** @} */
+      /** \name Member functions (get) */
+      /** @{ */
+
+      /**
+       * PoissonPval(d,b), from the cache if possible. */
+      double PoissonPval(const double& d, const double& b);
+
+      /**
+       * PoissonConvGammaPval(d,b,bErr), from the cache if possible. */
+      double PoissonConvGammaPval(const double& d, const double& b, const double& bErr);
+
+      unsigned long GetHits()
+          { return fHits; };
+
+      unsigned long GetMisses()
+          { return fMisses; };
+
+      unsigned int GetMaxEntries()
+          { return fMaxEntries; };
+
+      /**
+       * @return Fraction of look-ups answered from the cache. */
+      double GetHitRate();
+
+      /**
+       * Print number of entries, hits, misses and hit rate. */
+      void PrintStatistics();
+
+      /** @} */
+      /** \name Member functions (set) */
+      /** @{ */
+
+      /**
+       * Sets maximum number of stored p-values and
+       * evicts the oldest ones if there are more. */
+      void SetMaxEntries(unsigned int maxEntries);
+
+      /**
+       * Forget all stored p-values and reset the counters. */
+      void Clear();
+
+      /** @} */
+
+   private:
+
+      /**
+       * Key of a stored p-value. bErr is negative for PoissonPval. */
+      struct Key {
+        double d, b, bErr;
+        bool operator==(const Key & other) const
+            { return d==other.d && b==other.b && bErr==other.bErr; };
+      };
+
+      struct KeyHash {
+        size_t operator()(const Key & key) const
+            { std::hash<double> hasher;
+              size_t seed = hasher(key.d);
+              seed ^= hasher(key.b) + 0x9e3779b9 + (seed<<6) + (seed>>2);
+              seed ^= hasher(key.bErr) + 0x9e3779b9 + (seed<<6) + (seed>>2);
+              return seed; };
+      };
+
+      typedef std::list<std::pair<Key,double> > EntryList;
+
+      /**
+       * Stored value for key, computing it with
+       * PoissonPval or PoissonConvGammaPval if absent. */
+      double Lookup(const Key & key);
+
+      /**
+       * Entries from most to least recently used. */
+      EntryList fEntries;
+
+      std::unordered_map<Key, EntryList::iterator, KeyHash> fIndex;
+
+      unsigned int fMaxEntries;
+
+      unsigned long fHits, fMisses;
+
+};
+
+#endif
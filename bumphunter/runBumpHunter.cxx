@@ -42,6 +42,7 @@ int main (int argc,char **argv)
   TString dataHistoName = "" ;
   TString bkgHistoName = "";
   int nPseudoExpBH = 1e3;
+  int pvalCacheSize = 0;
   //------------------------------------------
 
   // Start reading input configuration
@@ -162,6 +163,20 @@ int main (int argc,char **argv)
           break ;
         }
       }
+      //number of p-values cached by the BumpHunter (default 0: no cache)
+      else if (string(argv[ip])=="--pvalCacheSize") 
+      {
+        if (ip+1<argc && string(argv[ip+1]).substr(0,2)!="--") 
+        {
+          pvalCacheSize=std::stoi(string(argv[ip+1]));
+          ip+=2;
+        } 
+        else 
+        {
+          std::cout<<"\nP-value cache size not specified "<<std::endl; 
+          break ;
+        }
+      }
       //unknown command
       else 
       {
@@ -268,6 +283,10 @@ int main (int argc,char **argv)
   // The default in the current code is "false" but you can
   // control it here
   theBumpHunter.SetUseSidebands(false);
+
+  // Pseudo-experiments share the background, so window p-values
+  // repeat from toy to toy. Each cached p-value takes about 100 bytes.
+  theBumpHunter.SetPvalCacheSize(pvalCacheSize);
   
   // Un-set any exclusions and bump hunt the spectrum
   theBumpHunter.SetUseWindowExclusion(false);
@@ -312,6 +331,9 @@ int main (int argc,char **argv)
   MjjStatisticsBundle theseChi2Stats = myStats.at(1);
   MjjStatisticsBundle theseBHStats = myStats.at(2);
 
+  if (theBumpHunter.GetPvalCache().GetMaxEntries()>0)
+    theBumpHunter.GetPvalCache().PrintStatistics();
+
   std::cout<<"Absolute values of LogL: "<<theseLogLStats.originalStatistic<<std::endl; 
   std::cout<<"Absolute values of Chi2: "<<theseChi2Stats.originalStatistic<<std::endl; 
   std::cout<<"Absolute values of BumpHUnter: "<<theseBHStats.originalStatistic<<std::endl; 
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+# Benchmarks of the python BumpHunter statistics pipeline on synthetic
+# dijet-like spectra. Each stage (DoTest on the observed spectrum, toy
+# generation, pseudo-experiment p-values, plotting) runs for every
+# requested number of bins in a process of its own, so that the peak
+# memory reported is that of the stage alone. Results are written as
+# JSON; passing the JSON of an earlier commit with --compare prints the
+# change in time and memory of every stage.
+#
+# Example:
+#   python benchmarkBumpHunter.py --nBins 50 500 5000 --nToys 200 --outFile bench.json
+#   python benchmarkBumpHunter.py --outFile new.json --compare bench.json
+
+from hunt.spectrum import Spectrum
+from hunt.scanengine import BumpHunterScan
+from hunt.goodnessoffit import LogLikelihoodTest, Chi2Test
+from hunt.pseudoexperiments import PseudoExperimenter
+from hunt.mathfunctions import getFrequentistPValAndError
+import multiprocessing
+try :
+  import queue as Queue
+except ImportError :
+  import Queue
+import numpy as np
+import subprocess
+import platform
+import resource
+import tempfile
+import shutil
+import json
+import sys,os
+import time
+import traceback
+import argparse
+
+allStages = ["doTest", "toys", "pvalue", "plotting"]
+
+def main():
+  # User controlled arguments
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--nBins", type=int, nargs="+", default=[50, 200, 1000, 5000], help="Numbers of bins of the synthetic spectra")
+  parser.add_argument("--nToys", type=int, default=100, help="Number of pseudoexperiments for the toys and pvalue stages")
+  parser.add_argument("--nEvents", type=float, default=1e6, help="Expected number of events in each spectrum")
+  parser.add_argument("--stages", type=str, nargs="+", default=allStages, choices=allStages, help="Stages to run")
+  parser.add_argument("--maxBumpWidth", type=int, default=-1, help="Widest BumpHunter window in bins (default: no limit)")
+  parser.add_argument("--repeat", type=int, default=1, help="Runs of each stage; the fastest is kept")
+  parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data and of the toys")
+  parser.add_argument("--outFile", type=str, default="", help="JSON file to write the results to")
+  parser.add_argument("--compare", type=str, default="", help="JSON file of an earlier run to compare with")
+  parser.add_argument("--tolerance", type=float, default=1.2, help="Time ratio to the earlier run above which a stage counts as slower")
+
+  args = parser.parse_args()
+
+  results = []
+  for nBins in args.nBins :
+    for stage in args.stages :
+      result = RunStageInProcess(stage, nBins, args)
+      results.append(result)
+      if result["status"] == "ok" :
+        print("%-10s %5d bins: %10.4f s, peak memory %8.1f MB" \
+              % (stage, nBins, result["seconds"], result["peakMemoryMB"]))
+      else :
+        print("%-10s %5d bins: %s" % (stage, nBins, result["status"]))
+        if "traceback" in result :
+          print(result["traceback"])
+
+  summary = {"commit" : GetCommit(),
+             "date" : time.strftime("%Y-%m-%d %H:%M:%S"),
+             "python" : platform.python_version(),
+             "numpy" : np.__version__,
+             "host" : platform.node(),
+             "nToys" : args.nToys,
+             "nEvents" : args.nEvents,
+             "maxBumpWidth" : args.maxBumpWidth,
+             "repeat" : args.repeat,
+             "results" : results}
+
+  if args.outFile :
+    with open(args.outFile, "w") as outFile :
+      json.dump(summary, outFile, indent=2, sort_keys=True)
+    print("Results written to %s" % args.outFile)
+
+  if args.compare :
+    with open(args.compare) as oldFile :
+      reference = json.load(oldFile)
+    nSlower = CompareResults(reference, summary, args.tolerance)
+    if nSlower > 0 :
+      sys.exit(1)
+  if any(result["status"].startswith("failed") for result in results) :
+    sys.exit(1)
+
+def MakeSyntheticSpectra(nBins, nEvents, seed) :
+  # Background from the standard dijet function on 1-8 TeV and data
+  # fluctuated around it, both as Spectrum objects
+  binEdges = np.linspace(1000., 8000., nBins + 1)
+  x = 0.5*(binEdges[1:] + binEdges[:-1])/13000.
+  shape = (1. - x)**10/x**5
+  bkg = nEvents*shape/shape.sum()
+  data = np.random.RandomState(seed).poisson(bkg).astype(float)
+  dataSpectrum = Spectrum(data, np.sqrt(data), binEdges, False)
+  bkgSpectrum = Spectrum(bkg, np.sqrt(bkg), binEdges, False)
+  return dataSpectrum, bkgSpectrum
+
+def GetBumpHunter(args) :
+  # Same settings as runBumpHunter
+  theBumpHunter = BumpHunterScan()
+  theBumpHunter.setMinBumpWidth(4)
+  theBumpHunter.setUseSidebands(False)
+  theBumpHunter.setUseWindowExclusion(False)
+  if args.maxBumpWidth > 0 :
+    theBumpHunter.setMaxBumpWidth(args.maxBumpWidth)
+  return theBumpHunter
+
+def RunStage(stage, nBins, args) :
+  # Set up the inputs of stage, then return a function running it
+  dataSpectrum, bkgSpectrum = MakeSyntheticSpectra(nBins, args.nEvents, args.seed)
+  firstBin, lastBin = bkgSpectrum.firstBinWithData, dataSpectrum.lastBinWithData
+
+  if stage == "doTest" :
+    def run() :
+      LogLikelihoodTest().doTest(dataSpectrum.effectiveContent, bkgSpectrum.effectiveContent, firstBin, lastBin)
+      Chi2Test().doTest(dataSpectrum.effectiveContent, bkgSpectrum.effectiveContent, \
+                        bkgSpectrum.effectiveErrors, firstBin, lastBin)
+      GetBumpHunter(args).doTest(dataSpectrum.effectiveContent, bkgSpectrum.effectiveContent, \
+                                 dataSpectrum.binEdges, firstBin, lastBin)
+    return run
+
+  if stage == "toys" :
+    def run() :
+      PseudoExperimenter(args.seed).getToys(bkgSpectrum, args.nToys)
+    return run
+
+  if stage == "pvalue" :
+    def run() :
+      thePseudinator = PseudoExperimenter(args.seed)
+      thePseudinator.setVerbose(False)
+      bundles = thePseudinator.getPseudoExperimentStatsOnHistogram(bkgSpectrum, dataSpectrum, \
+                  [LogLikelihoodTest(), Chi2Test(), GetBumpHunter(args)], firstBin, lastBin, args.nToys)
+      for bundle in bundles :
+        getFrequentistPValAndError(bundle.statisticsFromPseudoexperiments, bundle.originalStatistic)
+    return run
+
+  if stage == "plotting" :
+    # Painting needs ROOT, which is only imported here so that the
+    # other stages run without it
+    import ROOT
+    from art.morisot import Morisot
+    ROOT.gROOT.SetBatch(True)
+    ROOT.TH1.AddDirectory(ROOT.kFALSE)
+    myPainter = Morisot()
+    binEdges = dataSpectrum.binEdges/1000.
+    dataHist = MakeTH1("basicData", dataSpectrum.content, binEdges)
+    bkgHist = MakeTH1("basicBkg", bkgSpectrum.content, binEdges)
+    residuals = (dataSpectrum.content - bkgSpectrum.content)/np.sqrt(bkgSpectrum.content)
+    residualHist = MakeTH1("residualHist", residuals, binEdges)
+    def run() :
+      outPath = tempfile.mkdtemp(prefix="benchmarkBumpHunter")
+      try :
+        myPainter.drawDataAndFitOverSignificanceHist(dataHist,bkgHist,residualHist,\
+                  'Reconstructed m_{jj} [TeV]','Events','Significance','{0}/figure1'.format(outPath),\
+                  37.0,13,binEdges[0],binEdges[-1],firstBin,lastBin,True,\
+                  binEdges[nBins//2],binEdges[nBins//2+1],[],True,False,[],True,0.5)
+      finally :
+        shutil.rmtree(outPath, ignore_errors=True)
+    return run
+
+def MakeTH1(name, content, binEdges) :
+  import ROOT
+  from array import array
+  hist = ROOT.TH1D(name, "", len(content), array('d', binEdges))
+  for bin in range(len(content)) :
+    hist.SetBinContent(bin+1, content[bin])
+    hist.SetBinError(bin+1, np.sqrt(abs(content[bin])))
+  return hist
+
+def GetPeakRSS() :
+  # Peak resident memory of this process in MB (ru_maxrss is in kB on Linux, bytes on macOS)
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  if sys.platform == "darwin" :
+    return peak/1024./1024.
+  return peak/1024.
+
+def StageWorker(stage, nBins, args, queue) :
+  result = {"stage" : stage, "nBins" : nBins, "nToys" : args.nToys}
+  try :
+    run = RunStage(stage, nBins, args)
+    baseline = GetPeakRSS()
+    times = []
+    for repetition in range(max(1, args.repeat)) :
+      startTime = time.time()
+      run()
+      times.append(time.time() - startTime)
+    result["status"] = "ok"
+    result["seconds"] = min(times)
+    result["peakMemoryMB"] = max(0., GetPeakRSS() - baseline)
+  except ImportError as error :
+    result["status"] = "skipped (%s)" % error
+  except Exception as error :
+    result["status"] = "failed (%s: %s)" % (type(error).__name__, error)
+    result["traceback"] = traceback.format_exc()
+  queue.put(result)
+
+def RunStageInProcess(stage, nBins, args) :
+  # A fresh process per stage, so that its peak memory is not hidden
+  # by that of an earlier, bigger stage
+  queue = multiprocessing.Queue()
+  process = multiprocessing.Process(target=StageWorker, args=(stage, nBins, args, queue))
+  process.start()
+  result = None
+  try :
+    # Also stops waiting if the process dies without a result
+    while result is None :
+      try :
+        result = queue.get(timeout=1)
+      except Queue.Empty :
+        if not process.is_alive() and queue.empty() :
+          result = {"stage" : stage, "nBins" : nBins, "nToys" : args.nToys, \
+                    "status" : "failed (process exited with code %s)" % process.exitcode}
+  except KeyboardInterrupt :
+    process.terminate()
+    raise
+  process.join()
+  return result
+
+def GetCommit() :
+  # Commit of the checkout this script is in, if it is a git repository
+  try :
+    commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], \
+                                     cwd=os.path.dirname(os.path.abspath(__file__)), \
+                                     stderr=open(os.devnull, "w"))
+    return commit.decode().strip()
+  except (OSError, subprocess.CalledProcessError) :
+    return "unknown"
+
+def CompareResults(reference, summary, tolerance) :
+  # Print the time and memory ratio to the reference run of every stage
+  # measured in both, and return how many became slower than tolerance
+  def key(result) :
+    return (result["stage"], result["nBins"], result["nToys"])
+  old = dict((key(result), result) for result in reference["results"] if result["status"] == "ok")
+  print("Comparison with %s (commit %s)" % (reference.get("date", "?"), reference.get("commit", "?")))
+  nSlower = 0
+  for result in summary["results"] :
+    if result["status"] != "ok" or key(result) not in old :
+      continue
+    before = old[key(result)]
+    timeRatio = result["seconds"]/max(before["seconds"], 1e-9)
+    flag = ""
+    # Stages of a few milliseconds are dominated by noise
+    if timeRatio > tolerance and result["seconds"] - before["seconds"] > 0.01 :
+      flag = "  SLOWER"
+      nSlower += 1
+    print("%-10s %5d bins: time %10.4f -> %10.4f s (x%.2f), peak memory %8.1f -> %8.1f MB%s" \
+          % (result["stage"], result["nBins"], before["seconds"], result["seconds"], timeRatio, \
+             before["peakMemoryMB"], result["peakMemoryMB"], flag))
+  return nSlower
+
+# when calling this script
+if __name__ == "__main__":
+  main()
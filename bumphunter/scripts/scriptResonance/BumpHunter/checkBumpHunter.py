@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+
+# Checks that the numpy functions of hunt give the same numbers as the
+# C++ code of src/ they replace. Each C++ function is ported here line
+# by line, in plain python, and both are run over a grid of inputs;
+# a check fails if any value differs by more than the tolerance
+# (relative, plus an absolute floor for the values which the C++
+# itself computes as 1 - sum, and so only knows to about 1e-11 after
+# a few thousand terms of its recursion).
+# Where the C++ loses precision in the tail of small p-values, the
+# tail is also summed directly and compared with a relative tolerance
+# only. BumpHunterScan.doTest is compared with MjjBumpHunter::DoTest on
+# random spectra and settings: statistic, bump edges and tomography.
+#
+# Example:
+#   python checkBumpHunter.py
+#   python checkBumpHunter.py --checks poissonConvGammaPval --tolerance 1e-10
+#   python checkBumpHunter.py --checks doTest --nSpectra 1000 --seed 3
+
+from hunt.mathfunctions import poissonPval, poissonConvGammaPval
+from hunt.scanengine import BumpHunterScan
+import numpy as np
+import math
+import sys
+import argparse
+
+allChecks = ["poissonPval", "poissonConvGammaPval", "doTest"]
+
+# Constants of the Cephes functions in ROOT's SpecFuncCephes.cxx
+kMACHEP = 1.11022302462515654042363166809e-16
+kMAXLOG = 709.782712893383973096206318587
+kBig = 4.503599627370496e15
+kBiginv = 2.22044604925031308085e-16
+
+def main():
+  # User controlled arguments
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--checks", type=str, nargs="+", default=allChecks, choices=allChecks, help="Checks to run")
+  parser.add_argument("--tolerance", type=float, default=1e-8, help="Largest relative difference allowed")
+  parser.add_argument("--nSpectra", type=int, default=300, help="Number of random spectra and settings for the doTest check")
+  parser.add_argument("--seed", type=int, default=0, help="Seed of the random spectra")
+  parser.add_argument("--absTolerance", type=float, default=1e-11, help="Largest absolute difference allowed on top of the relative one")
+
+  args = parser.parse_args()
+
+  nFailed = 0
+  for check in args.checks :
+    nBad, nCompared, worst = RunCheck(check, args)
+    print("%-22s %6d compared, largest relative difference %.3g: %s" \
+          % (check, nCompared, worst, "ok" if nBad == 0 else "%d FAILED" % nBad))
+    if nBad > 0 :
+      nFailed += 1
+
+  if nFailed > 0 :
+    sys.exit(1)
+
+def RunCheck(check, args) :
+  # Number of values out of tolerance, number compared and largest
+  # relative difference
+  if check == "poissonPval" :
+    return CheckPoissonPval(args)
+  if check == "poissonConvGammaPval" :
+    return CheckPoissonConvGammaPval(args)
+  if check == "doTest" :
+    return CheckDoTest(args)
+
+def Compare(name, inputs, values, references, tolerance, absTolerance) :
+  # Print the values out of tolerance; returns their number and the
+  # largest relative difference where the relative tolerance applies
+  values = np.asarray(values, dtype=float)
+  references = np.asarray(references, dtype=float)
+  difference = np.abs(values - references)
+  bad = ~(difference <= tolerance*np.abs(references) + absTolerance)
+  # Relative differences where the relative tolerance is the larger
+  above = tolerance*np.abs(references) > absTolerance
+  relative = difference[above]/np.abs(references[above])
+  for index in np.flatnonzero(bad)[:10] :
+    print("  %s%s: %.17g, reference %.17g" % (name, inputs[index], values[index], references[index]))
+  return int(bad.sum()), float(relative.max()) if relative.size else 0.
+
+## ----------------------------------------------------
+## Checks
+
+def CheckPoissonPval(args) :
+  # Integer and effective (non-integer) counts, from empty bins to
+  # large ones where the incomplete gamma needs its asymptotic form
+  counts = [0., 0.5, 1., 2., 3., 4.7, 10., 25., 60., 99.5, 300., 1000., 4321.3, 20000., 1e5]
+  inputs = [(d, b) for d in counts for b in counts + [0.01, 0.2, 7.5, 480., 1.01e5]]
+  d, b = [np.array(column) for column in zip(*inputs)]
+
+  values = poissonPval(d, b)
+  references = [CxxPoissonPval(*point) for point in inputs]
+  nBad, worst = Compare("poissonPval", inputs, values, references, args.tolerance, args.absTolerance)
+
+  # For d < b the C++ returns 1 - TMath::Gamma(d+1,b): compare the
+  # tail Q(d+1,b) computed directly
+  tail = [index for index, point in enumerate(inputs) if point[0] < point[1]]
+  tailReferences = [CephesIgamc(inputs[index][0] + 1, inputs[index][1]) for index in tail]
+  nBadTail, worstTail = Compare("poissonPval tail", [inputs[index] for index in tail], \
+                                values[tail], tailReferences, args.tolerance, 1e-300)
+  return nBad + nBadTail, len(inputs) + len(tail), max(worst, worstTail)
+
+def CheckPoissonConvGammaPval(args) :
+  # Over data, background and relative background uncertainties wide
+  # enough to run both branches of the recursion and the plain
+  # Poisson one, far into the tail
+  inputs = []
+  for d in [0., 0.5, 1., 2., 3., 5., 10., 17.5, 30., 100., 300., 1000., 3000.] :
+    for b in [0., 0.3, 1., 2.5, 7., 20., 64.2, 150., 700., 2000.] :
+      for relErr in [0.003, 0.03, 0.1, 0.3, 1., 3.] :
+        inputs.append((d, b, relErr*b if b > 0 else 1.))
+  d, b, bErr = [np.array(column) for column in zip(*inputs)]
+
+  values = poissonConvGammaPval(d, b, bErr)
+  references = [CxxPoissonConvGammaPval(*point) for point in inputs]
+  nBad, worst = Compare("poissonConvGammaPval", inputs, values, references, args.tolerance, args.absTolerance)
+
+  # For d > b the C++ returns 1 - sum: compare the tail itself
+  tail = [index for index, point in enumerate(inputs) if point[0] > point[1]]
+  tailReferences = [PoissonConvGammaTail(*inputs[index]) for index in tail]
+  nBadTail, worstTail = Compare("poissonConvGammaPval tail", [inputs[index] for index in tail], \
+                                values[tail], tailReferences, args.tolerance, 1e-300)
+  return nBad + nBadTail, len(inputs) + len(tail), max(worst, worstTail)
+
+def CheckDoTest(args) :
+  # Random spectra, each scanned with random BumpHunter settings by
+  # BumpHunterScan.doTest and by the port of MjjBumpHunter::DoTest.
+  # The statistic, the bump edges and the whole tomography must agree.
+  randomState = np.random.RandomState(args.seed)
+  nBad = 0
+  worst = 0.
+  for spectrum in range(args.nSpectra) :
+    data, bkg, binEdges, settings, firstBinToUse, lastBinToUse = MakeRandomTest(randomState)
+
+    theBumpHunter = BumpHunterScan()
+    theBumpHunter.setMinBumpWidth(settings["minBinsInBump"])
+    theBumpHunter.setMaxBumpWidth(settings["maxBinsInBump"])
+    theBumpHunter.setUseSidebands(settings["useSidebands"])
+    theBumpHunter.setSidebandWidth(settings["nBinsInSideband"])
+    theBumpHunter.setNBinsInWindowShift(settings["nBinsInShift"])
+    theBumpHunter.allowDeficit(settings["allowDeficit"])
+    if settings["excludeWindow"] :
+      theBumpHunter.setWindowToExclude(*settings["binsToExclude"])
+    if settings["errHist"] is not None :
+      theBumpHunter.setUseError(settings["errHist"])
+    theBumpHunter.setPvalCacheSize(settings["pvalCacheSize"])
+    theBumpHunter.setUseWindowIndex(settings["useWindowIndex"])
+    theBumpHunter.doTest(data, bkg, binEdges, firstBinToUse, lastBinToUse)
+
+    reference = CxxDoTest(data, bkg, binEdges, settings, firstBinToUse, lastBinToUse)
+    inputs = ["(spectrum %d, %s, bins %d-%d)" % (spectrum, settings["name"], firstBinToUse, lastBinToUse)]
+    if len(theBumpHunter.probAllBumps) != len(reference["probAllBumps"]) :
+      print("  doTest%s: %d windows tested, C++ %d" \
+            % (inputs[0], len(theBumpHunter.probAllBumps), len(reference["probAllBumps"])))
+      nBad += 1
+      continue
+    comparisons = [("p-value", [theBumpHunter.mostInterestingP], [reference["mostInterestingP"]])]
+    # The C++ p-value of a deficit, and of any window with background
+    # errors, is 1 - sum: zero or rounding noise once below the absolute
+    # tolerance. The C++ bump is then the first such window, not the
+    # least probable one.
+    if reference["mostInterestingP"] > args.absTolerance \
+       or not (settings["allowDeficit"] or settings["errHist"] is not None) :
+      comparisons.append(("bump edges", [theBumpHunter.lowEdge, theBumpHunter.highEdge], \
+                                        [reference["lowEdge"], reference["highEdge"]]))
+    nBadHere = 0
+    for name, values, references in comparisons + [ \
+        ("tomography p-values", theBumpHunter.probAllBumps, reference["probAllBumps"]), \
+        ("tomography low edges", theBumpHunter.lowEdgesAllBumps, reference["lowEdgesAllBumps"]), \
+        ("tomography high edges", theBumpHunter.highEdgesAllBumps, reference["highEdgesAllBumps"])] :
+      nBadValues, worstValues = Compare("doTest %s" % name, inputs*len(values), values, references, \
+                                        args.tolerance, args.absTolerance)
+      nBadHere += nBadValues
+      worst = max(worst, worstValues)
+    if nBadHere > 0 :
+      nBad += 1
+  return nBad, args.nSpectra, worst
+
+def MakeRandomTest(randomState) :
+  # Falling spectrum with uneven bins, sometimes empty at the ends,
+  # sometimes with a bump or effective (non-integer) counts, and
+  # random settings covering sidebands, window exclusion, deficits,
+  # background errors and the user's bin range
+  nBins = randomState.randint(12, 60)
+  binEdges = np.cumsum(np.concatenate([[1000.], randomState.uniform(20., 80., nBins)]))
+  errorMode = randomState.rand() < 0.3
+  # Small counts in error mode keep the C++ recursion short
+  scale = 10**randomState.uniform(0., 1.3 if errorMode else 3.5)
+  bkg = scale*np.exp(-np.linspace(0., randomState.uniform(1., 6.), nBins))
+  data = randomState.poisson(bkg).astype(float)
+  if randomState.rand() < 0.5 :
+    center = randomState.randint(nBins)
+    data[max(center - 2, 0):center + 2] += randomState.poisson(3.*np.sqrt(bkg[center]) + 1., \
+                                             len(data[max(center - 2, 0):center + 2]))
+  if randomState.rand() < 0.2 :
+    data *= randomState.uniform(0.3, 1.)
+  if randomState.rand() < 0.3 :
+    data[:randomState.randint(1, 4)] = 0.
+    data[nBins - randomState.randint(1, 4):] = 0.
+
+  settings = {"minBinsInBump" : randomState.randint(0, 4),
+              "maxBinsInBump" : [100000, randomState.randint(2, 12)][randomState.randint(2)],
+              "useSidebands" : randomState.rand() < 0.4,
+              "nBinsInSideband" : randomState.randint(0, 4),
+              "nBinsInShift" : randomState.randint(0, 3),
+              "allowDeficit" : randomState.rand() < 0.3,
+              "excludeWindow" : randomState.rand() < 0.3,
+              "errHist" : None,
+              "pvalCacheSize" : [0, 100000][randomState.randint(2)],
+              "useWindowIndex" : randomState.rand() < 0.3}
+  if settings["excludeWindow"] :
+    first = randomState.randint(nBins//4, nBins//2)
+    settings["binsToExclude"] = (first, first + randomState.randint(1, nBins//4))
+  if errorMode :
+    settings["errHist"] = randomState.uniform(0.02, 0.4)*bkg
+  settings["name"] = ", ".join("%s %s" % (key, settings[key]) for key in \
+      ["minBinsInBump", "maxBinsInBump", "useSidebands", "nBinsInSideband", "nBinsInShift", \
+       "allowDeficit", "excludeWindow", "pvalCacheSize", "useWindowIndex"]) \
+      + (", binsToExclude %s" % (settings["binsToExclude"],) if settings["excludeWindow"] else "") \
+      + (", errHist" if errorMode else "")
+
+  firstBinToUse = [-1, randomState.randint(1, nBins//3 + 1)][randomState.randint(2)]
+  lastBinToUse = [-1, randomState.randint(2*nBins//3, nBins + 1)][randomState.randint(2)]
+  return data, bkg, binEdges, settings, firstBinToUse, lastBinToUse
+
+## ----------------------------------------------------
+## Port of src/MjjBumpHunter.cxx. Bins are numbered from 1, as in
+## the TH1Ds; content[bin-1] is GetBinContent(bin).
+
+def CxxDoTest(data, bkg, binEdges, settings, firstBinToUse, lastBinToUse) :
+  result = {"mostInterestingP" : 1., "lowEdge" : 0., "highEdge" : 0., \
+            "lowEdgesAllBumps" : [], "highEdgesAllBumps" : [], "probAllBumps" : []}
+
+  # MjjHistogram::GetHistOutermostBinsWithData
+  nBins = len(data)
+  firstBin = 1
+  while data[firstBin-1] == 0 and firstBin < nBins : firstBin += 1
+  lastBin = nBins
+  while data[lastBin-1] == 0 and lastBin > 1 : lastBin -= 1
+  if firstBin == nBins and lastBin == 1 :
+    firstBin, lastBin = 1, nBins
+
+  if firstBinToUse > 0 and firstBinToUse > firstBin and firstBinToUse < lastBin : firstBin = firstBinToUse
+  if lastBinToUse > firstBinToUse and lastBinToUse > 0 and lastBinToUse > firstBin and lastBinToUse < lastBin :
+    lastBin = lastBinToUse
+
+  if settings["excludeWindow"] :
+    firstBinToExclude, lastBinToExclude = settings["binsToExclude"]
+    regionsdef = [(firstBin, firstBinToExclude-1), (lastBinToExclude+1, lastBin)]
+  else :
+    regionsdef = [(firstBin, lastBin)]
+
+  for thisfirstBin, thislastBin in regionsdef :
+    regionBins = thislastBin-thisfirstBin+1
+    minWidth = max(settings["minBinsInBump"], 1)
+    maxWidth = int(min(settings["maxBinsInBump"], CxxDivide(regionBins, 2)))
+    CxxDoTestCore(data, bkg, binEdges, settings, minWidth, maxWidth, thisfirstBin, thislastBin, result)
+
+  if result["mostInterestingP"] == 0 :
+    CxxFindBumpInCaseOfIncalculable(data, bkg, binEdges, firstBin, lastBin, result)
+  return result
+
+def CxxDivide(numerator, denominator) :
+  # Integer division of C++, which truncates towards zero
+  return int(float(numerator)/denominator)
+
+def CxxDoTestCore(data, bkg, binEdges, settings, minWidth, maxWidth, firstBin, lastBin, result) :
+  probL = probC = probR = 1.
+  for width in range(minWidth, maxWidth+1) :
+    if settings["nBinsInSideband"] >= 1 : sidebandWidth = settings["nBinsInSideband"]
+    else : sidebandWidth = max(1, width//2)
+    if not settings["nBinsInShift"] < 1 : nbinsinstep = settings["nBinsInShift"]
+    else : nbinsinstep = max(1, width//2)
+
+    smallestPforWidth = 1
+    lowEdgeForWidth = 0
+    highEdgeForWidth = 0
+    if settings["useSidebands"] :
+      minBinL = firstBin + sidebandWidth
+      maxBinL = lastBin - width - sidebandWidth + 1
+    else :
+      minBinL = firstBin
+      maxBinL = lastBin - width + 1
+
+    for binL in range(minBinL, maxBinL+1, nbinsinstep) :
+      binR = binL+width-1
+      binLL = binL-sidebandWidth
+      binRR = binR+sidebandWidth
+
+      dC, deltaDC, bC, deltaBC = CxxGetEffectiveBandContentsWithError(data, bkg, settings, binL, binR)
+      if settings["useSidebands"] :
+        dL, deltaDL, bL, deltaBL = CxxGetEffectiveBandContentsWithError(data, bkg, settings, binLL, binL-1)
+        dR, deltaDR, bR, deltaBR = CxxGetEffectiveBandContentsWithError(data, bkg, settings, binR+1, binRR)
+      if not settings["allowDeficit"] :
+        if dC <= bC : continue
+
+      if settings["errHist"] is not None :
+        probC = CxxPoissonConvGammaPval(dC,bC,deltaBC)
+        if settings["useSidebands"] :
+          probL = CxxPoissonConvGammaPval(dC,bC,deltaBC)
+          probR = CxxPoissonConvGammaPval(dC,bC,deltaBC)
+      else :
+        probC = CxxPoissonPval(dC,bC)
+        if settings["useSidebands"] :
+          probL = CxxPoissonPval(dL,bL)
+          probR = CxxPoissonPval(dR,bR)
+
+      if settings["useSidebands"] :
+        if probL <= 1e-3 or probR <= 1e-3 :
+          continue
+
+      result["lowEdgesAllBumps"].append(binEdges[binL-1])
+      result["highEdgesAllBumps"].append(binEdges[binR-1] + (binEdges[binR] - binEdges[binR-1]))
+      result["probAllBumps"].append(probC)
+      if probC < smallestPforWidth :
+        smallestPforWidth = probC
+        lowEdgeForWidth = binEdges[binL-1]
+        highEdgeForWidth = binEdges[binR-1] + (binEdges[binR] - binEdges[binR-1])
+    if smallestPforWidth < result["mostInterestingP"] :
+      result["mostInterestingP"] = smallestPforWidth
+      result["lowEdge"] = lowEdgeForWidth
+      result["highEdge"] = highEdgeForWidth
+
+def CxxFindBumpInCaseOfIncalculable(data, bkg, binEdges, firstBin, lastBin, result) :
+  singlebinsinf = []
+  lastBinWasInf = False
+  allInfsConsecutive = True
+  for bin in range(firstBin, lastBin+1) :
+    D = data[bin-1]
+    B = bkg[bin-1]
+    thisbinpval = CxxPoissonPval(D,B)
+    if thisbinpval == 0 and D > B :
+      if len(singlebinsinf) > 0 and lastBinWasInf == False : allInfsConsecutive = False
+      singlebinsinf.append(bin)
+      lastBinWasInf = True
+    else :
+      lastBinWasInf = False
+  if len(singlebinsinf) > 0 and allInfsConsecutive :
+    result["mostInterestingP"] = 0
+    result["lowEdge"] = binEdges[singlebinsinf[0]-1]
+    result["highEdge"] = binEdges[singlebinsinf[-1]-1] + (binEdges[singlebinsinf[-1]] - binEdges[singlebinsinf[-1]-1])
+
+def CxxGetEffectiveBandContentsWithError(data, bkg, settings, firstBin, lastBin) :
+  # The data errors are not used by DoTestCore and not checked here
+  dataIntegral = dataError = bkgIntegral = bkgError = 0.
+  for bin in range(firstBin, lastBin+1) :
+    dataIntegral += data[bin-1]
+    bkgIntegral += bkg[bin-1]
+    if settings["errHist"] is not None :
+      bkgError += settings["errHist"][bin-1]
+  return dataIntegral, dataError, bkgIntegral, bkgError
+
+## ----------------------------------------------------
+## Ports of src/MathFunctions.cxx and the ROOT functions it calls
+
+def CephesIgam(a, x) :
+  # ROOT::Math::inc_gamma, which TMath::Gamma(a,x) calls
+  if a <= 0 : return 1.0
+  if x <= 0 : return 0.
+  if x > 1.0 and x > a : return 1.0 - CephesIgamc(a, x)
+  ax = a*math.log(x) - x - math.lgamma(a)
+  if ax < -kMAXLOG : return 0.0
+  ax = math.exp(ax)
+  r = a
+  c = 1.0
+  ans = 1.0
+  while True :
+    r += 1.0
+    c *= x/r
+    ans += c
+    if not c/ans > kMACHEP : break
+  return ans*ax/a
+
+def CephesIgamc(a, x) :
+  # ROOT::Math::inc_gamma_c
+  if a <= 0 : return 0.0
+  if x <= 0 : return 1.0
+  if x < 1.0 or x < a : return 1.0 - CephesIgam(a, x)
+  ax = a*math.log(x) - x - math.lgamma(a)
+  if ax < -kMAXLOG : return 0.0
+  ax = math.exp(ax)
+  y = 1.0 - a
+  z = x + y + 1.0
+  c = 0.0
+  pkm2 = 1.0
+  qkm2 = x
+  pkm1 = x + 1.0
+  qkm1 = z*x
+  ans = pkm1/qkm1
+  while True :
+    c += 1.0
+    y += 1.0
+    z += 2.0
+    yc = y*c
+    pk = pkm1*z - pkm2*yc
+    qk = qkm1*z - qkm2*yc
+    if qk != 0 :
+      r = pk/qk
+      t = abs((ans - r)/r)
+      ans = r
+    else :
+      t = 1.0
+    pkm2 = pkm1
+    pkm1 = pk
+    qkm2 = qkm1
+    qkm1 = qk
+    if abs(pk) > kBig :
+      pkm2 *= kBiginv
+      pkm1 *= kBiginv
+      qkm2 *= kBiginv
+      qkm1 *= kBiginv
+    if not t > kMACHEP : break
+  return ans*ax
+
+def CxxPoissonPval(d, b) :
+  if d >= b :
+    return CephesIgam(d, b)
+  return 1. - CephesIgam(d + 1, b)
+
+def CxxPoissonConvGammaPval(d, b, bErr) :
+  beta = b/(bErr*bErr)
+  alpha = b*beta
+  if alpha > 100*d :
+    return CxxPoissonPval(d, b)
+  # unsigned int: truncated, and wrapped round below zero
+  stop = int(d)
+  if d > b :
+    stop = (stop - 1) % 2**32
+  nTerms = (stop + 1) % 2**32
+  if alpha > 100 :
+    logProb = alpha*math.log(beta/(1 + beta))
+    total = math.exp(logProb)
+    for u in range(1, nTerms) :
+      logProb += math.log((alpha + u - 1)/(u*(1 + beta)))
+      total += math.exp(logProb)
+  else :
+    p0 = math.pow(beta/(1 + beta), alpha)
+    pLast = p0
+    total = p0
+    for k in range(1, nTerms) :
+      p = pLast*(alpha + k - 1)/(k*(1 + beta))
+      total += p
+      pLast = p
+  return 1 - total if d > b else total
+
+def PoissonConvGammaTail(d, b, bErr) :
+  # Sum of the terms of the C++ recursion above its stop, i.e. the
+  # p-value for d > b without the cancellation in 1 - sum. The plain
+  # Poisson p-value for d > b has no cancellation to start with.
+  beta = b/(bErr*bErr)
+  alpha = b*beta
+  if alpha > 100*d :
+    return CxxPoissonPval(d, b)
+  if alpha == 0 :
+    # All weight on n = 0
+    return 0.
+  # Log of the first term of the tail, P(start)
+  start = max(int(d), 1)
+  logProb = alpha*math.log(beta/(1 + beta))
+  for u in range(1, start + 1) :
+    logProb += math.log((alpha + u - 1)/(u*(1 + beta)))
+  # Terms rise up to the mode of the negative binomial, then fall
+  mode = (alpha - 1)/beta
+  total = 0.
+  u = start
+  while True :
+    term = math.exp(logProb)
+    total += term
+    if u > mode and term <= 1e-17*total : break
+    u += 1
+    logProb += math.log((alpha + u - 1)/(u*(1 + beta)))
+  return total
+
+# when calling this script
+if __name__ == "__main__":
+  main()
@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 
-import ROOT
+from art.lazyROOT import ROOT
 from art.morisot import Morisot
+from art.renderQueue import RenderQueue
+from art.figureManifest import FigureManifest
+from hunt.rebin import getMatchingBins
+from hunt.bumphunterresults import loadBumpHunterResults
+from hunt.rootfile import RootFileError
 from array import array
 import sys,os
 import argparse
@@ -16,31 +21,86 @@ def main():
   parser.add_argument("--signalFileName", type=str, default="", help="Signal histogram overlaid on background")
   parser.add_argument("--drawMCComparison", action='store_true', help="Draw the comparison between data and MC")
   parser.add_argument("--mcFileName", type=str, default="", help="MC File Name")
+  parser.add_argument("--jobs", type=int, default=1, help="Number of processes drawing the figures")
+  parser.add_argument("--force", action='store_true', help="Redraw all figures, also those whose inputs did not change")
+  parser.add_argument("--formats", type=str, nargs="*", default=[".pdf"], help="Formats each figure is saved in: .pdf .eps .png .root .C .json")
+  parser.add_argument("--multiPagePDF", type=str, default="", help="PDF file collecting all figures (with --jobs 1); all are redrawn then")
 
   args = parser.parse_args()
-  inFileName = args.inFileName
-  outPath = args.outPath
-  luminosity = args.lumi*1000
-  overlaidSignal = args.overlaidSignal
-  signalFileName = args.signalFileName
-  drawMCComparison = args.drawMCComparison
-  mcFileName = args.mcFileName
-    
+
   print "==================================="
-  print "inputFile       : ",inFileName
-  print "outPath       : ",outPath
+  print "inputFile       : ",args.inFileName
+  print "outPath       : ",args.outPath
   print "Luminosity       : ",args.lumi
-  print "OverlaidSignal       : ",overlaidSignal
-  print "Signal File       : ",signalFileName
-  print "drawMCComparison: ", drawMCComparison
-  print "mcFileName: ", mcFileName
+  print "OverlaidSignal       : ",args.overlaidSignal
+  print "Signal File       : ",args.signalFileName
+  print "drawMCComparison: ", args.drawMCComparison
+  print "mcFileName: ", args.mcFileName
+  print "jobs: ", args.jobs
+  print "force: ", args.force
+  print "formats: ", " ".join(args.formats)
+  print "multiPagePDF: ", args.multiPagePDF
   print "==================================="
 
+  # Checked before ROOT is loaded
+  missing = MissingInputs(args)
+  if missing :
+    for fileName in missing :
+      print fileName, " doesn't exist."
+    return
+
+  # Initialize painter. With more than one job the figures are only
+  # drawn by myPainter.render(), once all of them are defined. Figures
+  # whose inputs are unchanged since they were drawn are skipped.
+  def makePainter() :
+    return MakePainter(args.formats)
+  # A multi-page PDF has to hold all figures: none are skipped then
+  skipUnchanged = not args.force and not (args.multiPagePDF and args.jobs <= 1)
+  myPainter = RenderQueue(makePainter, args.jobs, FigureManifest() if skipUnchanged else None)
+  if args.multiPagePDF :
+    SetMultiPagePDF(myPainter, args.multiPagePDF)
+
+  summary, inputFiles = MakeFigures(args.inFileName, args.outPath, args.lumi, args.overlaidSignal, \
+                                    args.signalFileName, args.drawMCComparison, args.mcFileName, myPainter)
+
+  # Inputs have to stay open until the figures are drawn
+  failed = myPainter.render()
+  if args.multiPagePDF and args.jobs <= 1 :
+    myPainter.painter.closeMultiPagePDF()
+  for inputFile in inputFiles :
+    inputFile.Close()
+  if failed :
+    print len(failed),"figures failed, see above."
+    sys.exit(1)
+  if summary["status"] != "ok" :
+    print "Stopped:",summary["status"]
+    sys.exit(1)
+  print "Done."
+
+def MissingInputs(args) :
+  # Local input files of args which do not exist
+  fileNames = [args.inFileName]
+  if args.overlaidSignal :
+    fileNames.append(args.signalFileName)
+    if args.drawMCComparison :
+      fileNames.append(args.mcFileName)
+  return [fileName for fileName in fileNames if "://" not in fileName and not os.path.isfile(fileName)]
+
+def MakeFigures(inFileName, outPath, lumi, overlaidSignal, signalFileName, drawMCComparison, mcFileName, myPainter) :
+  # Draw the figures of one runBumpHunter output file with myPainter.
+  # Returns a summary of the results in the file, and the ROOT files
+  # opened, which have to stay open until the figures are drawn.
+  luminosity = lumi*1000
+  summary = {"inFileName" : inFileName, "status" : "ok"}
+  inputFiles = []
+
   # Get input root file
   inFile = ROOT.TFile.Open(inFileName, "READ")
   if not inFile:
     print inFileName, " doesn't exist."
-    return
+    summary["status"] = "missing input"
+    return summary, inputFiles
+  inputFiles.append(inFile)
   # make plots folder i.e. make folder extension
   if not os.path.exists(outPath):
       os.makedirs(outPath)
@@ -48,19 +108,6 @@ def main():
   # Define necessary quantities.
   Ecm = 13
   xAxisLabel = "M_{ZX} [TeV]"
-  # Initialize painter
-  myPainter = Morisot()
-  myPainter.setColourPalette("Teals")
-  myPainter.setEPS(False)
-  myPainter.setisData(False)
-  myPainter.setLabelType(2) # Sets label type i.e. Internal, Work in progress etc.
-  # 0 Just ATLAS    
-  # 1 "Preliminary"
-  # 2 "Internal"
-  # 3 "Simulation Preliminary"
-  # 4 "Simulation Internal"
-  # 5 "Simulation"
-  # 6 "Work in Progress"
 
   # Retrieve search phase inputs
   basicData = inFile.Get("basicData")
@@ -70,19 +117,30 @@ def main():
   chi2PseudoStatHist = inFile.Get("chi2StatHistNullCase")
   bumpHunterStatHist = inFile.Get("bumpHunterStatHistNullCase")
   bumpHunterTomographyPlot = inFile.Get('bumpHunterTomographyFromPseudoexperiments')
-  bumpHunterStatOfFitToData = inFile.Get('bumpHunterStatOfFitToData')
-
-  logLOfFitToDataVec = inFile.Get('logLOfFitToData')
-  chi2OfFitToDataVec = inFile.Get('chi2OfFitToData')
-  statOfFitToData = inFile.Get('bumpHunterPLowHigh')
-  logLOfFitToData = logLOfFitToDataVec[0]
-  logLPVal = logLOfFitToDataVec[1]
-  chi2OfFitToData = chi2OfFitToDataVec[0]
-  chi2PVal = chi2OfFitToDataVec[1]
-  bumpHunterStatFitToData = statOfFitToData[0]
-  bumpHunterPVal = bumpHunterStatOfFitToData[1]
-  bumpLowEdge = statOfFitToData[1]
-  bumpHighEdge = statOfFitToData[2]
+
+  # Numbers of the results, from the cached arrays when possible
+  results = LoadResults(inFileName)
+  if results :
+    logLOfFitToData, logLPVal = results.logLOfFitToDataValue, results.logLPVal
+    chi2OfFitToData, chi2PVal = results.chi2OfFitToDataValue, results.chi2PVal
+    bumpHunterStatFitToData = results.bumpHunterStatFitToData
+    bumpHunterPVal = results.bumpHunterPVal
+    bumpLowEdge, bumpHighEdge = results.bumpLowEdge, results.bumpHighEdge
+    fitRange = results.FitRange
+  else :
+    bumpHunterStatOfFitToData = inFile.Get('bumpHunterStatOfFitToData')
+    logLOfFitToDataVec = inFile.Get('logLOfFitToData')
+    chi2OfFitToDataVec = inFile.Get('chi2OfFitToData')
+    statOfFitToData = inFile.Get('bumpHunterPLowHigh')
+    logLOfFitToData = logLOfFitToDataVec[0]
+    logLPVal = logLOfFitToDataVec[1]
+    chi2OfFitToData = chi2OfFitToDataVec[0]
+    chi2PVal = chi2OfFitToDataVec[1]
+    bumpHunterStatFitToData = statOfFitToData[0]
+    bumpHunterPVal = bumpHunterStatOfFitToData[1]
+    bumpLowEdge = statOfFitToData[1]
+    bumpHighEdge = statOfFitToData[2]
+    fitRange = inFile.Get("FitRange")
 
   print "logL of fit to data is",logLOfFitToData
   print "logL pvalue is",logLPVal
@@ -92,10 +150,12 @@ def main():
   print "bumpLowEdge, bumpHighEdge are",bumpLowEdge,bumpHighEdge
   print "BumpHunter pvalue is",bumpHunterPVal
   print "which is Z value of",GetZVal(bumpHunterPVal,True)
+  summary.update({"logLPVal" : logLPVal, "chi2PVal" : chi2PVal, "bumpHunterPVal" : bumpHunterPVal, \
+                  "bumpHunterZVal" : GetZVal(bumpHunterPVal,True), "bumpLowEdge" : bumpLowEdge, \
+                  "bumpHighEdge" : bumpHighEdge})
 
   # Find range
   # Calculate from fit range
-  fitRange = inFile.Get("FitRange")
   firstBin = basicData.FindBin(fitRange[0])-1
   lastBin = basicData.FindBin(fitRange[1])
   print "firstbin, lastbin: ",firstBin,lastBin
@@ -162,7 +222,9 @@ def main():
     signalFile = ROOT.TFile.Open(signalFileName, "read")
     if not signalFile:
       print signalFileName, " doesn't exist!!!!"
-      return
+      summary["status"] = "missing signal"
+      return summary, inputFiles
+    inputFiles.append(signalFile)
 
     # setup signal information
     signalTitles = {"qStar": "#it{q}*"}
@@ -189,11 +251,7 @@ def main():
 
         sigplottev = newbasicdata.Clone()
         sigplottev.SetName("sigplot_{0}_{1}_TeV".format(signalType,mass))
-        for bins in range(sigplot.GetNbinsX()+2) :
-          for bin in range(sigplottev.GetNbinsX()+2) :
-            if sigplot.GetBinLowEdge(bins)/1000.==sigplottev.GetBinLowEdge(bin) :
-              sigplottev.SetBinContent(bin,sigplot.GetBinContent(bins))
-              sigplottev.SetBinError(bin,sigplot.GetBinError(bins))
+        CopyMatchingBins(sigplot, sigplottev, 1/1000.)
 
         sigplotforfitplusbkg = sigplottev.Clone()
         sigplotforfitplusbkg.SetDirectory(0)
@@ -260,31 +318,18 @@ def main():
         mcFile = ROOT.TFile(mcFileName, "read") ;
         if not mcFile:
           print "Can not open: ", mcFileName
-          return
+          summary["status"] = "missing MC"
+          return summary, inputFiles
+        inputFiles.append(mcFile)
         mchist_nominal = mcFile.Get("djet_mjj_nominal")
         mchist_jesup = mcFile.Get("djet_mjj_JES_up")
         mchist_jesdown = mcFile.Get("djet_mjj_JES_down")
         newmchist_nominal=ROOT.TH1D("djet_mjj_nominal_TeV","djet_mjj_nominal_TeV",len(newbins)-1,array('d',newbins))
         newmchist_jesup=ROOT.TH1D("djet_mjj_jesup_TeV","djet_mjj_jesup_TeV",len(newbins)-1,array('d',newbins))
         newmchist_jesdown=ROOT.TH1D("djet_mjj_jesdown_TeV","djet_mjj_jesdown_TeV",len(newbins)-1,array('d',newbins))
-        for iBin1 in range(1, newmchist_nominal.GetNbinsX()+1):
-          for iBin2 in range(1, mchist_nominal.GetNbinsX()+1):
-            if newmchist_nominal.GetBinLowEdge(iBin1)*1000==mchist_nominal.GetBinLowEdge(iBin2):
-              newmchist_nominal.SetBinContent(iBin1, mchist_nominal.GetBinContent(iBin2))
-              newmchist_nominal.SetBinError(iBin1, mchist_nominal.GetBinError(iBin2))
-              continue
-        for iBin1 in range(1, newmchist_jesup.GetNbinsX()+1):
-          for iBin2 in range(1, mchist_jesup.GetNbinsX()+1):
-            if newmchist_jesup.GetBinLowEdge(iBin1)*1000==mchist_jesup.GetBinLowEdge(iBin2):
-              newmchist_jesup.SetBinContent(iBin1, mchist_jesup.GetBinContent(iBin2))
-              newmchist_jesup.SetBinError(iBin1, mchist_jesup.GetBinError(iBin2))
-              continue
-        for iBin1 in range(1, newmchist_jesdown.GetNbinsX()+1):
-          for iBin2 in range(1, mchist_jesdown.GetNbinsX()+1):
-            if newmchist_jesdown.GetBinLowEdge(iBin1)*1000==mchist_jesdown.GetBinLowEdge(iBin2):
-              newmchist_jesdown.SetBinContent(iBin1, mchist_jesdown.GetBinContent(iBin2))
-              newmchist_jesdown.SetBinError(iBin1, mchist_jesdown.GetBinError(iBin2))
-              continue
+        for newmchist, mchist in [[newmchist_nominal, mchist_nominal], [newmchist_jesup, mchist_jesup], \
+                                  [newmchist_jesdown, mchist_jesdown]] :
+          CopyMatchingBins(mchist, newmchist, 1/1000.)
         tmpRatioHist = newbasicdata.Clone()
         tmpRatioHist.SetMarkerColor(ROOT.kBlack)
         tmpRatioHist.Add(newmchist_nominal,-1)
@@ -329,8 +374,41 @@ def main():
                      False,False,False, UserScaleText,True,bumpHunterPVal,True,fitRange[0],fitRange[1],\
                      newmchist_nominal,tmpRatioHist,UpDownRatioHists[0],UpDownRatioHists[1])
 
-  inFile.Close()
-  print "Done."
+  return summary, inputFiles
+
+def MakePainter(formats=[".pdf"], teardown=False) :
+  painter = Morisot()
+  painter.setColourPalette("Teals")
+  painter.setOutputFormats(formats)
+  painter.useTeardown(teardown)
+  painter.setisData(False)
+  painter.setLabelType(2) # Sets label type i.e. Internal, Work in progress etc.
+  # 0 Just ATLAS
+  # 1 "Preliminary"
+  # 2 "Internal"
+  # 3 "Simulation Preliminary"
+  # 4 "Simulation Internal"
+  # 5 "Simulation"
+  # 6 "Work in Progress"
+  return painter
+
+def SetMultiPagePDF(myPainter, fileName) :
+  # Only the painter of this process can write it
+  if myPainter.immediate :
+    myPainter.painter.setMultiPagePDF(fileName)
+  else :
+    print "Not writing",fileName,": a multi-page PDF needs --jobs 1"
+
+def LoadResults(inFileName) :
+  # BumpHunterResults of a local runBumpHunter output file, read
+  # without ROOT and cached next to it; None if ROOT has to read it
+  if "://" in inFileName :
+    return None
+  try :
+    return loadBumpHunterResults(inFileName)
+  except (RootFileError, ImportError, KeyError, ValueError) as error :
+    print "Reading the results of",inFileName,"with ROOT:",error
+    return None
 
 def GetZVal (p, excess) :
   #the function normal_quantile converts a p-value into a significance,
@@ -343,6 +421,17 @@ def GetZVal (p, excess) :
 
   return zval
 
+def CopyMatchingBins(source, target, scale=1.) :
+  # Copy contents and errors of the bins of source into the bins of
+  # target with the same low edge, after multiplying the edges of
+  # source by scale
+  sourceEdges = [source.GetBinLowEdge(bin)*scale for bin in range(1, source.GetNbinsX()+2)]
+  targetEdges = [target.GetBinLowEdge(bin) for bin in range(1, target.GetNbinsX()+2)]
+  targetBins, sourceBins = getMatchingBins(sourceEdges, targetEdges)
+  for targetBin, sourceBin in zip(targetBins.tolist(), sourceBins.tolist()) :
+    target.SetBinContent(targetBin, source.GetBinContent(sourceBin))
+    target.SetBinError(targetBin, source.GetBinError(sourceBin))
+
 def MakeHistoFromStats(statistics) :
 
   nentries = len(statistics)
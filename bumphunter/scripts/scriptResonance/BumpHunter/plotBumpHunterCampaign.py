@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+# Plot many runBumpHunter output files in one process: ROOT, the ATLAS
+# style and the painter are set up once for the whole campaign instead
+# of once per file. Files are given as globs and/or in a manifest with
+# one file per line (optionally followed by its output directory);
+# the figures of each go to <outPath>/<file name without .root>/
+# unless the manifest says otherwise. A summary table of all files is
+# printed at the end.
+#
+# Example:
+#   python plotBumpHunterCampaign.py --inFiles "results/GenericZX/*.root" --outPath plotting/GenericZX/ --lumi 140 --jobs 8
+
+from art.lazyROOT import ROOT
+from art.renderQueue import RenderQueue
+from art.figureManifest import FigureManifest
+from plotBumpHunter import MakeFigures, MakePainter, SetMultiPagePDF
+import traceback
+import glob
+import json
+import sys,os
+import time
+import argparse
+
+def main():
+  # User controlled arguments
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--inFiles", type=str, nargs="*", default=[], help="Globs of input files from runBumpHunter")
+  parser.add_argument("--manifest", type=str, default="", help="Text file listing input files, one per line, each optionally followed by its output directory")
+  parser.add_argument("--outPath", type=str, default="", help="Directory under which each input file gets a directory of plots")
+  parser.add_argument("--lumi", type=float, default=1, help="Luminosity")
+  parser.add_argument("--overlaidSignal", action='store_true', help="Overlaid Signal on Background")
+  parser.add_argument("--signalFileName", type=str, default="", help="Signal histogram overlaid on background")
+  parser.add_argument("--drawMCComparison", action='store_true', help="Draw the comparison between data and MC")
+  parser.add_argument("--mcFileName", type=str, default="", help="MC File Name")
+  parser.add_argument("--jobs", type=int, default=1, help="Number of processes drawing the figures")
+  parser.add_argument("--filesPerBatch", type=int, default=20, help="With --jobs > 1, number of input files whose figures are drawn together before the files are closed")
+  parser.add_argument("--force", action='store_true', help="Redraw all figures, also those whose inputs did not change")
+  parser.add_argument("--summaryFile", type=str, default="", help="JSON file to write the summary table to")
+  parser.add_argument("--formats", type=str, nargs="*", default=[".pdf"], help="Formats each figure is saved in: .pdf .eps .png .root .C .json")
+  parser.add_argument("--multiPagePDF", type=str, default="", help="PDF file collecting all figures (with --jobs 1); all are redrawn then")
+  parser.add_argument("--teardown", action='store_true', help="Delete the ROOT objects of each figure once it is saved, and report the memory in use after each figure (with --jobs 1)")
+
+  args = parser.parse_args()
+
+  campaign = GetCampaign(args.inFiles, args.manifest, args.outPath)
+  if not campaign :
+    print "No input files found."
+    sys.exit(1)
+  print "Plotting",len(campaign),"files on",args.jobs,"processes"
+
+  ROOT.setBatch(True)
+  # One painter (or queue of figures) for all files
+  def makePainter() :
+    return MakePainter(args.formats, args.teardown)
+  # A multi-page PDF has to hold all figures: none are skipped then
+  skipUnchanged = not args.force and not (args.multiPagePDF and args.jobs <= 1)
+  myPainter = RenderQueue(makePainter, args.jobs, FigureManifest() if skipUnchanged else None)
+  if args.multiPagePDF :
+    SetMultiPagePDF(myPainter, args.multiPagePDF)
+
+  summaries = []
+  # Files, summaries and figures of the batch not yet drawn by the pool
+  openFiles = []
+  batchSummaries = []
+  figureRanges = []
+  renderSeconds = 0.
+  for inFileName, outPath in campaign :
+    startTime = time.time()
+    firstFigure = len(myPainter.tasks)
+    try :
+      summary, inputFiles = MakeFigures(inFileName, outPath, args.lumi, args.overlaidSignal, \
+                                        args.signalFileName, args.drawMCComparison, args.mcFileName, myPainter)
+    except Exception :
+      traceback.print_exc()
+      summary, inputFiles = {"inFileName" : inFileName, "status" : "failed"}, []
+    summary["outPath"] = outPath
+    summaries.append(summary)
+    # Figures recorded for the manifest are drawn file by file, while
+    # the inputs are open; those for the pool batch by batch
+    if args.jobs <= 1 :
+      RenderFigures(myPainter, [summary], [(firstFigure, len(myPainter.tasks))])
+      CloseFiles(inputFiles)
+    else :
+      batchSummaries.append(summary)
+      figureRanges.append((firstFigure, len(myPainter.tasks)))
+      openFiles.extend(inputFiles)
+    summary["seconds"] = time.time() - startTime
+    # The pool draws the figures of a batch of files, which are then
+    # closed, so that open files and histograms do not pile up
+    if args.jobs > 1 and (len(batchSummaries) >= args.filesPerBatch or len(summaries) == len(campaign)) :
+      startTime = time.time()
+      RenderFigures(myPainter, batchSummaries, figureRanges)
+      renderSeconds += time.time() - startTime
+      CloseFiles(openFiles)
+      openFiles, batchSummaries, figureRanges = [], [], []
+
+  if args.multiPagePDF and args.jobs <= 1 :
+    myPainter.painter.closeMultiPagePDF()
+  if args.jobs > 1 :
+    print "Drew the figures in",renderSeconds,"seconds"
+
+  PrintSummary(summaries)
+  if args.teardown and args.jobs <= 1 :
+    myPainter.painter.printMemoryReport()
+  if args.summaryFile :
+    with open(args.summaryFile, "w") as summaryFile :
+      json.dump(summaries, summaryFile, indent=2, sort_keys=True)
+    print "Summary written to",args.summaryFile
+
+  nNotOk = len([summary for summary in summaries if summary["status"] != "ok"])
+  if nNotOk > 0 :
+    print nNotOk,"of",len(summaries),"files not ok, see above."
+    sys.exit(1)
+
+def GetCampaign(globs, manifestName, outPath) :
+  # List of (input file, output directory), in the order given
+  campaign = []
+  for pattern in globs :
+    matches = sorted(glob.glob(pattern))
+    if not matches :
+      print "No files match",pattern
+    for inFileName in matches :
+      campaign.append((inFileName, GetOutPath(inFileName, outPath)))
+  if manifestName :
+    with open(manifestName) as manifest :
+      for line in manifest :
+        fields = line.split("#")[0].split()
+        if not fields :
+          continue
+        if len(fields) > 1 :
+          campaign.append((fields[0], os.path.join(fields[1], "")))
+        else :
+          campaign.append((fields[0], GetOutPath(fields[0], outPath)))
+  return campaign
+
+def GetOutPath(inFileName, outPath) :
+  # Trailing separator: plotBumpHunter appends figure names directly
+  name = os.path.splitext(os.path.basename(inFileName))[0]
+  return os.path.join(outPath, name, "")
+
+def RenderFigures(myPainter, summaries, figureRanges) :
+  # Draw the recorded figures, and count those which failed in the
+  # summaries of their files
+  failed = myPainter.render()
+  for summary, (firstFigure, lastFigure) in zip(summaries, figureRanges) :
+    nFailed = len([index for index in failed if firstFigure <= index < lastFigure])
+    if nFailed > 0 and summary["status"] == "ok" :
+      summary["status"] = "%d figures failed" % nFailed
+
+def CloseFiles(inputFiles) :
+  for inputFile in inputFiles :
+    inputFile.Close()
+
+def PrintSummary(summaries) :
+  print "============================================================================================="
+  print "%-45s %-12s %10s %8s %10s %10s %14s %8s" % ("File", "Status", "BH p-value", "Z", "logL p", "chi2 p", "Bump range", "Time [s]")
+  for summary in summaries :
+    name = os.path.basename(summary["inFileName"])
+    if "bumpHunterPVal" in summary :
+      print "%-45s %-12s %10.4g %8.2f %10.4g %10.4g %6.0f-%-7.0f %8.2f" \
+            % (name, summary["status"], summary["bumpHunterPVal"], summary["bumpHunterZVal"], \
+               summary["logLPVal"], summary["chi2PVal"], summary["bumpLowEdge"], summary["bumpHighEdge"], \
+               summary["seconds"])
+    else :
+      print "%-45s %-12s %10s %8s %10s %10s %14s %8.2f" \
+            % (name, summary["status"], "-", "-", "-", "-", "-", summary["seconds"])
+  print "============================================================================================="
+
+# when calling this script
+if __name__ == "__main__":
+  main()
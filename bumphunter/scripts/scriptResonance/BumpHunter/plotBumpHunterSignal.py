@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 
-import ROOT
+from art.lazyROOT import ROOT
 from art.morisot import Morisot
+from plotBumpHunter import LoadResults
 from array import array
 import sys,os
 import argparse
@@ -27,6 +28,12 @@ def main():
   print "Signal File       : ",signalFileName
   print "==================================="
 
+  # Checked before ROOT is loaded
+  for fileName in [inFileName, signalFileName] :
+    if "://" not in fileName and not os.path.isfile(fileName) :
+      print fileName, " doesn't exist."
+      return
+
   # Get input root file
   inFile = ROOT.TFile.Open(inFileName, "READ")
   if not inFile:
@@ -60,19 +67,30 @@ def main():
   chi2PseudoStatHist = inFile.Get("chi2StatHistNullCase")
   bumpHunterStatHist = inFile.Get("bumpHunterStatHistNullCase")
   bumpHunterTomographyPlot = inFile.Get('bumpHunterTomographyFromPseudoexperiments')
-  bumpHunterStatOfFitToData = inFile.Get('bumpHunterStatOfFitToData')
-
-  logLOfFitToDataVec = inFile.Get('logLOfFitToData')
-  chi2OfFitToDataVec = inFile.Get('chi2OfFitToData')
-  statOfFitToData = inFile.Get('bumpHunterPLowHigh')
-  logLOfFitToData = logLOfFitToDataVec[0]
-  logLPVal = logLOfFitToDataVec[1]
-  chi2OfFitToData = chi2OfFitToDataVec[0]
-  chi2PVal = chi2OfFitToDataVec[1]
-  bumpHunterStatFitToData = statOfFitToData[0]
-  bumpHunterPVal = bumpHunterStatOfFitToData[1]
-  bumpLowEdge = statOfFitToData[1]
-  bumpHighEdge = statOfFitToData[2]
+
+  # Numbers of the results, from the cached arrays when possible
+  results = LoadResults(inFileName)
+  if results :
+    logLOfFitToData, logLPVal = results.logLOfFitToDataValue, results.logLPVal
+    chi2OfFitToData, chi2PVal = results.chi2OfFitToDataValue, results.chi2PVal
+    bumpHunterStatFitToData = results.bumpHunterStatFitToData
+    bumpHunterPVal = results.bumpHunterPVal
+    bumpLowEdge, bumpHighEdge = results.bumpLowEdge, results.bumpHighEdge
+    fitRange = results.FitRange
+  else :
+    bumpHunterStatOfFitToData = inFile.Get('bumpHunterStatOfFitToData')
+    logLOfFitToDataVec = inFile.Get('logLOfFitToData')
+    chi2OfFitToDataVec = inFile.Get('chi2OfFitToData')
+    statOfFitToData = inFile.Get('bumpHunterPLowHigh')
+    logLOfFitToData = logLOfFitToDataVec[0]
+    logLPVal = logLOfFitToDataVec[1]
+    chi2OfFitToData = chi2OfFitToDataVec[0]
+    chi2PVal = chi2OfFitToDataVec[1]
+    bumpHunterStatFitToData = statOfFitToData[0]
+    bumpHunterPVal = bumpHunterStatOfFitToData[1]
+    bumpLowEdge = statOfFitToData[1]
+    bumpHighEdge = statOfFitToData[2]
+    fitRange = inFile.Get("FitRange")
 
   print "logL of fit to data is",logLOfFitToData
   print "logL pvalue is",logLPVal
@@ -85,7 +103,6 @@ def main():
 
   # Find range
   # Calculate from fit range
-  fitRange = inFile.Get("FitRange")
   firstBin = basicData.FindBin(fitRange[0])-1
   lastBin = basicData.FindBin(fitRange[1])+2
   print "firstbin, lastbin: ",firstBin,lastBin
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+# Python version of runBumpHunter which spreads the pseudo-experiments
+# over all cores of the machine. The output file holds the same
+# objects as the one from runBumpHunter, so plotBumpHunter.py can be
+# run on it unchanged. With the same --seed and --blockSize the
+# results do not depend on --nJobs.
+
+import ROOT
+from hunt.spectrum import Spectrum
+from hunt.scanengine import BumpHunterScan
+from hunt.goodnessoffit import LogLikelihoodTest, Chi2Test
+from hunt.parallel import ParallelPseudoExperimenter
+from hunt.pseudoexperiments import EarlyStopping
+from hunt.mathfunctions import getFrequentistPValAndError, poissonPval
+from array import array
+import numpy as np
+import sys,os
+import time
+import argparse
+
+def main():
+  # User controlled arguments
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--inFile", type=str, default="", help="Input file with data and background histograms")
+  parser.add_argument("--outPath", type=str, default="", help="The path prefix (directory) for the output file")
+  parser.add_argument("--outFileName", type=str, default="", help="Output file name")
+  parser.add_argument("--dataHist", type=str, default="", help="Data histogram name")
+  parser.add_argument("--bkgHist", type=str, default="", help="Background prediction histogram name")
+  parser.add_argument("--minBH", type=float, default=-1, help="Minimum mass for BumpHunter")
+  parser.add_argument("--maxBH", type=float, default=-1, help="Maximum mass for BumpHunter")
+  parser.add_argument("--nPseudoExpBH", type=int, default=1000, help="Number of pseudoexperiments")
+  parser.add_argument("--nJobs", type=int, default=0, help="Number of processes (default: one per core)")
+  parser.add_argument("--seed", type=int, default=0, help="Master seed of the pseudoexperiments")
+  parser.add_argument("--blockSize", type=int, default=1000, help="Pseudoexperiments per seeded block")
+  parser.add_argument("--targetRelErr", type=float, default=-1, help="Stop once the BumpHunter p-value has this relative uncertainty")
+  parser.add_argument("--pValueThreshold", type=float, default=-1, help="Stop once the BumpHunter p-value is clearly above this")
+  parser.add_argument("--minPseudoExpBH", type=int, default=1000, help="Pseudoexperiments before stopping early is considered")
+  parser.add_argument("--checkpoint", type=str, default="", help="File to save finished pseudoexperiments to and resume from")
+  parser.add_argument("--windowIndexDir", type=str, default="", help="Directory to keep window p-value tables of each background in")
+
+  args = parser.parse_args()
+
+  startTime = time.time()
+
+  # Retrieve histograms
+  inFile = ROOT.TFile.Open(args.inFile, "READ")
+  if not inFile:
+    print args.inFile, " doesn't exist."
+    return
+  ROOT.TH1.AddDirectory(ROOT.kFALSE)
+  rawDataHisto = inFile.Get(args.dataHist)
+  if not rawDataHisto:
+    print args.dataHist, " doesn't exist."
+    return
+  rawBkgHisto = inFile.Get(args.bkgHist)
+  if not rawBkgHisto:
+    print args.bkgHist, " doesn't exist."
+    return
+  rawDataHisto.SetDirectory(0)
+  rawBkgHisto.SetDirectory(0)
+  inFile.Close()
+
+  if not os.path.exists(args.outPath):
+    os.makedirs(args.outPath)
+
+  # Effective contents are not taken from the errors, as in runBumpHunter
+  dataHistogram = Spectrum.fromTH1(rawDataHisto, False)
+  backgroundHistogram = Spectrum.fromTH1(rawBkgHisto, False)
+
+  # Range to bump hunt
+  lastBin = dataHistogram.lastBinWithData
+  firstBin = backgroundHistogram.firstBinWithData
+  if args.minBH == -1 :
+    firstBinBH = firstBin
+  else :
+    firstBinBH = rawDataHisto.FindBin(args.minBH)
+  if args.maxBH == -1 :
+    lastBinBH = lastBin
+  else :
+    lastBinBH = rawDataHisto.FindBin(args.maxBH)
+  print "Will bump hunt the spectrum in bins [",firstBinBH,"-",lastBinBH,"]"
+  print "\tcorresponding to a range [",rawDataHisto.GetBinLowEdge(firstBinBH),"-",rawDataHisto.GetBinLowEdge(lastBinBH)+rawDataHisto.GetBinWidth(lastBinBH),"]"
+
+  # Statistical tests, same settings as runBumpHunter
+  theBumpHunter = BumpHunterScan()
+  theBumpHunter.setMinBumpWidth(4)
+  theBumpHunter.setUseSidebands(False)
+  theBumpHunter.setUseWindowExclusion(False)
+  # The background is the same for every toy: tabulate its window p-values
+  theBumpHunter.setUseWindowIndex(True, 5., args.windowIndexDir if args.windowIndexDir else None)
+  theStatsTests = [LogLikelihoodTest(), Chi2Test(), theBumpHunter]
+
+  # Tomography of the data
+  theBumpHunter.doTest(dataHistogram.effectiveContent, backgroundHistogram.effectiveContent, \
+                       dataHistogram.binEdges, firstBinBH, lastBinBH)
+  tomographyX, tomographyP, tomographyXErr = theBumpHunter.getBumpHunterTomography()
+
+  thePseudinator = ParallelPseudoExperimenter(args.seed, args.nJobs, args.blockSize)
+  if args.checkpoint :
+    thePseudinator.setCheckpointFile(args.checkpoint)
+  # With either option, --nPseudoExpBH is only the maximum
+  if args.targetRelErr > 0 or args.pValueThreshold > 0 :
+    earlyStopping = EarlyStopping(args.targetRelErr if args.targetRelErr > 0 else None,\
+                                  args.pValueThreshold if args.pValueThreshold > 0 else None,\
+                                  3., args.minPseudoExpBH)
+    thePseudinator.setEarlyStopping(theBumpHunter, earlyStopping)
+  theseLogLStats, theseChi2Stats, theseBHStats = thePseudinator.getPseudoExperimentStatsOnHistogram(\
+                      backgroundHistogram, dataHistogram, theStatsTests, firstBinBH, lastBinBH, args.nPseudoExpBH)
+
+  logLPValAndErr = getFrequentistPValAndError(theseLogLStats.statisticsFromPseudoexperiments, theseLogLStats.originalStatistic)
+  chi2PValAndErr = getFrequentistPValAndError(theseChi2Stats.statisticsFromPseudoexperiments, theseChi2Stats.originalStatistic)
+  bumpHunterPValAndErr = getFrequentistPValAndError(theseBHStats.statisticsFromPseudoexperiments, theseBHStats.originalStatistic)
+  lowEdgeOfBump, highEdgeOfBump = theseBHStats.originalFurtherInformation
+
+  print "******************************************"
+  print "*** Final values "
+  print "*** BH p-value = ",bumpHunterPValAndErr[0]
+  print "*** BH test statistic value = ",theseBHStats.originalStatistic
+  print "*** Selected most discrepant range = ",lowEdgeOfBump,"-",highEdgeOfBump
+  print "******************************************"
+
+  # Save to out file
+  outFile = ROOT.TFile(args.outPath+args.outFileName, "recreate")
+
+  fitRange = ROOT.TVectorD(2)
+  fitRange[0] = rawBkgHisto.GetBinLowEdge(firstBinBH)
+  fitRange[1] = rawBkgHisto.GetBinLowEdge(lastBinBH)+rawBkgHisto.GetBinWidth(lastBinBH)
+  fitRange.Write("FitRange")
+
+  rawDataHisto.SetName("basicData")
+  rawDataHisto.Write()
+  rawBkgHisto.SetName("basicBkg")
+  rawBkgHisto.Write()
+  residualHist = GetResidual(dataHistogram, backgroundHistogram, rawBkgHisto, firstBinBH, lastBinBH)
+  residualHist.SetName("residualHist")
+  residualHist.Write()
+
+  for stats, pValAndErr, histName, vectorName in [[theseLogLStats, logLPValAndErr, "logLikelihoodStatHistNullCase", "logLOfFitToData"],\
+                                                  [theseChi2Stats, chi2PValAndErr, "chi2StatHistNullCase", "chi2OfFitToData"],\
+                                                  [theseBHStats, bumpHunterPValAndErr, "bumpHunterStatHistNullCase", "bumpHunterStatOfFitToData"]] :
+    statHist = MakeHistoFromBundle(stats)
+    statHist.SetName(histName)
+    statHist.Write()
+    statPValErrOfFitToData = ROOT.TVectorD(3)
+    statPValErrOfFitToData[0] = stats.originalStatistic
+    statPValErrOfFitToData[1] = pValAndErr[0]
+    statPValErrOfFitToData[2] = pValAndErr[1]
+    statPValErrOfFitToData.Write(vectorName)
+
+  bumpHunterTomography = ROOT.TGraphErrors(len(tomographyX), array('d',tomographyX), array('d',tomographyP),\
+                                           array('d',tomographyXErr), array('d',np.zeros(len(tomographyX))))
+  bumpHunterTomography.SetName("bumpHunterTomographyFromPseudoexperiments")
+  bumpHunterTomography.Write()
+
+  bumpHunterStatLowHigh = ROOT.TVectorD(3)
+  bumpHunterStatLowHigh[0] = theseBHStats.originalStatistic
+  bumpHunterStatLowHigh[1] = lowEdgeOfBump
+  bumpHunterStatLowHigh[2] = highEdgeOfBump
+  bumpHunterStatLowHigh.Write("bumpHunterPLowHigh")
+  outFile.Close()
+
+  print "Process ran in",time.time()-startTime,"seconds."
+
+def MakeHistoFromBundle(bundle) :
+  # TH1D of the numpy histogram made by the statistics bundle
+  counts, edges = bundle.statisticsFromPseudoexperimentsHist
+  statPlot = ROOT.TH1D("statPlot","",len(counts),edges[0],edges[-1])
+  for bin in range(len(counts)) :
+    statPlot.SetBinContent(bin+1,counts[bin])
+  statPlot.SetEntries(counts.sum())
+  return statPlot
+
+def GetResidual(dataHistogram, backgroundHistogram, rawBkgHisto, firstBin, lastBin) :
+  # Signed significance per bin, as MjjSignificanceTests::GetResidual
+  result = rawBkgHisto.Clone("residualHist")
+  result.Reset()
+  data = dataHistogram.effectiveContent
+  bkg = backgroundHistogram.effectiveContent
+  pVals = poissonPval(data, bkg)
+  for bin in range(firstBin, lastBin+1) :
+    if data[bin-1] == 0 :
+      continue
+    valToUse = 1-2*pVals[bin-1]
+    if valToUse > -1 and valToUse < 1 :
+      frac = np.sqrt(2.0)*ROOT.TMath.ErfInverse(valToUse)
+    elif valToUse == 1 :
+      frac = sys.float_info.max
+    else :
+      frac = -sys.float_info.max
+    # Trim to a reasonable size for display
+    if frac > 100 : frac = 20
+    if frac < 0. : frac = 0.
+    if data[bin-1] < bkg[bin-1] : frac *= -1
+    result.SetBinContent(bin,frac)
+    result.SetBinError(bin,0)
+  return result
+
+# when calling this script
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 #
 # Python ATLAS Style: Based on ATLAS Style
 
-import ROOT
+from lazyROOT import ROOT
 import array
 
 def ATLAS_LABEL(x, y, color=1, label = "Internal"):
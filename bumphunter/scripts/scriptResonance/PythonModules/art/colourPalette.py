@@ -1,4 +1,4 @@
-import ROOT
+from lazyROOT import ROOT
 
 class ColourPalette(object) :
 
@@ -17,15 +17,26 @@ class ColourPalette(object) :
 
   def setColourPalette(self, colourPalette) :
     self.palette = colourPalette
-    if self.palette == "ATLAS" :
+    # The colours are ROOT objects: made once ROOT is loaded
+    ROOT.whenLoaded(lambda : self.applyColourPalette(colourPalette))
+
+  def applyColourPalette(self, colourPalette) :
+    if colourPalette == "ATLAS" :
       self.setATLASColours()
-    elif self.palette == "Oxford" :
+    elif colourPalette == "Oxford" :
       self.setOxfordColours()
-    elif self.palette == "Teals" :
+    elif colourPalette == "Teals" :
       self.setTealColours()
-    elif self.palette == "Tropical" :
+    elif colourPalette == "Tropical" :
       self.setTropicalColours()
 
+  def __getattr__(self, name) :
+    # A colour not set yet: load ROOT, which applies the palettes
+    if name.startswith("__") or ROOT.isLoaded() :
+      raise AttributeError(name)
+    ROOT.load()
+    return getattr(self, name)
+
   def getColourPalette(self) :
     return self.palette
 
@@ -0,0 +1,154 @@
+# Record of the inputs of drawn figures, for redrawing only the ones
+# whose inputs changed. The key of a figure is a hash of the painter
+# method, all its arguments (histogram and graph contents, errors,
+# binning and style included) and the source code of the painter.
+# The formats the figure is saved in go into the key too. Keys are
+# kept in a figureManifest.json in each output directory; a figure is
+# up to date if its key is unchanged and its file of every format
+# still exists.
+
+import hashlib
+import inspect
+import json
+import sys,os
+
+manifestFileName = "figureManifest.json"
+
+
+def getCallArguments(method, args, kwargs) :
+  '''Arguments of a call of the bound method by parameter name,
+  defaults included.'''
+  try :
+    signature = inspect.signature(method)
+  except AttributeError :
+    # Python 2
+    arguments = inspect.getcallargs(method, *args, **kwargs)
+    arguments.pop("self", None)
+    return arguments
+  bound = signature.bind(*args, **kwargs)
+  for parameter in signature.parameters.values() :
+    if parameter.name not in bound.arguments and parameter.default is not parameter.empty :
+      bound.arguments[parameter.name] = parameter.default
+  return dict(bound.arguments)
+
+
+def updateHash(hasher, value) :
+  '''Feed value to hasher: containers item by item, ROOT histograms
+  and graphs by content. Other objects go by repr, which for unknown
+  ROOT objects holds their address, so that such figures are always
+  redrawn.'''
+  if isinstance(value, (list, tuple)) :
+    hasher.update(("%s%d[" % (type(value).__name__, len(value))).encode())
+    for item in value :
+      updateHash(hasher, item)
+    hasher.update(b"]")
+  elif isinstance(value, dict) :
+    hasher.update(("dict%d{" % len(value)).encode())
+    for name in sorted(value) :
+      updateHash(hasher, name)
+      updateHash(hasher, value[name])
+    hasher.update(b"}")
+  elif hasattr(value, "GetNbinsX") and hasattr(value, "GetBinContent") :
+    nBins = value.GetNbinsX()
+    values = [value.ClassName(), value.GetName(), value.GetTitle(), nBins]
+    values += [value.GetBinLowEdge(bin) for bin in range(1, nBins + 2)]
+    values += [value.GetBinContent(bin) for bin in range(nBins + 2)]
+    values += [value.GetBinError(bin) for bin in range(nBins + 2)]
+    values += getStyle(value)
+    hasher.update(repr(values).encode())
+  elif hasattr(value, "GetN") and hasattr(value, "GetX") :
+    nPoints = value.GetN()
+    x, y = value.GetX(), value.GetY()
+    values = [value.ClassName(), value.GetName(), value.GetTitle(), nPoints]
+    values += [(x[point], y[point], value.GetErrorX(point), value.GetErrorY(point)) for point in range(nPoints)]
+    values += getStyle(value)
+    hasher.update(repr(values).encode())
+  else :
+    hasher.update(repr(value).encode())
+
+
+def getStyle(rootObject) :
+  style = []
+  for getter in ("GetLineColor", "GetLineStyle", "GetLineWidth", "GetFillColor", "GetFillStyle", \
+                 "GetMarkerColor", "GetMarkerStyle", "GetMarkerSize") :
+    if hasattr(rootObject, getter) :
+      style.append(getattr(rootObject, getter)())
+  return style
+
+
+def getCodeKey(functions) :
+  '''Hash of the source files defining functions (or classes) and of
+  all loaded modules of the art package.'''
+  fileNames = set()
+  for function in functions :
+    try :
+      fileNames.add(inspect.getsourcefile(function))
+    except TypeError :
+      pass
+  for name, module in list(sys.modules.items()) :
+    if module is not None and (name == "art" or name.startswith("art.")) and hasattr(module, "__file__") :
+      fileNames.add(os.path.splitext(module.__file__)[0] + ".py")
+  hasher = hashlib.md5()
+  for fileName in sorted(name for name in fileNames if name and os.path.exists(name)) :
+    with open(fileName, "rb") as sourceFile :
+      hasher.update(sourceFile.read())
+  return hasher.hexdigest()
+
+
+def getFigureKey(methodName, arguments, codeKey, outputFormats=(".pdf",)) :
+  hasher = hashlib.md5()
+  hasher.update(("%s %s %s" % (methodName, codeKey, " ".join(outputFormats))).encode())
+  updateHash(hasher, arguments)
+  return hasher.hexdigest()
+
+
+class FigureManifest(object) :
+
+  def __init__(self) :
+    # Entries of each output directory, read when first needed
+    self.directories = {}
+    self.changed = set()
+
+  ## ----------------------------------------------------
+  ## Getters
+
+  def isUpToDate(self, figureName, key, outputFormats=(".pdf",)) :
+    directory, name = os.path.split(figureName)
+    if self.getEntries(directory).get(name) != key :
+      return False
+    return all(os.path.exists(figureName + extension) for extension in outputFormats)
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  def update(self, figureName, key) :
+    directory, name = os.path.split(figureName)
+    self.getEntries(directory)[name] = key
+    self.changed.add(directory)
+
+  def save(self) :
+    '''Write the manifests of the directories with new entries.'''
+    for directory in self.changed :
+      fileName = os.path.join(directory, manifestFileName)
+      # Written under a temporary name, so an interrupted run leaves no partial manifest
+      temporaryName = fileName + ".tmp"
+      with open(temporaryName, "w") as manifest :
+        json.dump(self.directories[directory], manifest, indent=1, sort_keys=True)
+      os.rename(temporaryName, fileName)
+    self.changed = set()
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def getEntries(self, directory) :
+    if directory not in self.directories :
+      entries = {}
+      fileName = os.path.join(directory, manifestFileName)
+      if os.path.exists(fileName) :
+        try :
+          with open(fileName) as manifest :
+            entries = json.load(manifest)
+        except ValueError :
+          print("Ignoring unreadable %s" % fileName)
+      self.directories[directory] = entries
+    return self.directories[directory]
@@ -0,0 +1,77 @@
+# Stand-in for the ROOT module which imports PyROOT only when it is
+# first needed, so that scripts can parse their arguments, print
+# --help and check their inputs without paying for it:
+#
+#   from art.lazyROOT import ROOT
+#
+# The basic colours (ROOT.kRed, ...) are served without importing
+# ROOT, since their values are fixed by ROOT's EColor enum. Anything
+# else imports ROOT, in batch mode and without letting it parse the
+# command line unless setBatch(False) was called, and then runs the
+# functions registered with whenLoaded, in the order they came.
+
+# Values of EColor in Rtypes.h
+colours = {"kWhite" : 0, "kBlack" : 1, "kGray" : 920, "kRed" : 632, "kGreen" : 416, \
+           "kBlue" : 600, "kYellow" : 400, "kMagenta" : 616, "kCyan" : 432, "kOrange" : 800, \
+           "kSpring" : 820, "kTeal" : 840, "kAzure" : 860, "kViolet" : 880, "kPink" : 900}
+
+
+class LazyROOT(object) :
+
+  def __init__(self) :
+    object.__setattr__(self, "_module", None)
+    object.__setattr__(self, "_batch", True)
+    object.__setattr__(self, "_hooks", [])
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  def setBatch(self, batch=True) :
+    '''Whether ROOT runs without graphics (default). Applies when ROOT
+    is loaded, or straight away if it is already.'''
+    object.__setattr__(self, "_batch", batch)
+    if self._module is not None :
+      self._module.gROOT.SetBatch(batch)
+
+  def whenLoaded(self, function) :
+    '''Call function once ROOT is loaded (now, if it is already).'''
+    if self._module is not None :
+      function()
+    else :
+      self._hooks.append(function)
+
+  ## ----------------------------------------------------
+  ## Getters
+
+  def isLoaded(self) :
+    return self._module is not None
+
+  def load(self) :
+    '''The real ROOT module, imported on the first call.'''
+    if self._module is None :
+      import ROOT as module
+      if self._batch :
+        # Before the first use of ROOT: no graphics, and sys.argv left to argparse
+        module.PyConfig.IgnoreCommandLineOptions = True
+        module.PyConfig.StartGraphics = False
+        module.gROOT.SetBatch(True)
+      object.__setattr__(self, "_module", module)
+      hooks = self._hooks
+      object.__setattr__(self, "_hooks", [])
+      for function in hooks :
+        function()
+    return self._module
+
+  def __getattr__(self, name) :
+    # Only called for names which are not attributes of the stand-in
+    if self._module is None and name in colours :
+      return colours[name]
+    if name.startswith("__") :
+      raise AttributeError(name)
+    return getattr(self.load(), name)
+
+  def __setattr__(self, name, value) :
+    setattr(self.load(), name, value)
+
+
+ROOT = LazyROOT()
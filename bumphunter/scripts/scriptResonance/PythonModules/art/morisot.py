@@ -2,12 +2,14 @@
 # analyses. Will assist in maintaining consistent style
 # and comparable plots.
 
-import sys
-import ROOT
+import sys,os
+import json
+from lazyROOT import ROOT
 import AtlasStyle
 #import AtlasUtils
 import math
 import time
+import numpy as np
 from array import array
 from colourPalette import ColourPalette
 
@@ -27,25 +29,24 @@ class Morisot(object) :
 
   def __init__(self) :
 
-    # Set up style
-    AtlasStyle.SetAtlasStyle()
-    ROOT.gROOT.ForceStyle()
+    # Set up style, and everything else needing ROOT, once ROOT is
+    # loaded: by the first draw
+    ROOT.whenLoaded(self.setUpROOT)
     global nsigfigs
     nsigfigs = 0 # for setting number of significant figures in lumi
 
     # Lydia configurable
-    global epsorpdf
-    epsorpdf = '.pdf'
     global doLumiInPb
     doLumiInPb = False
     global dodrawUsersText # Add text that the user would like to the plot
     dodrawUsersText = False # Turn to false for official plots
-    global saveCfile # Option to save a .C version of all the plots
-    saveCfile = False
-    global saveRfile # Option to save a .root version of all the plots
-    saveRfile = False
-    global saveEfile # Option to save a .eps version of all the plots
-    saveEfile = False
+
+    # Formats every figure is saved in: any of .pdf, .eps, .png, .root,
+    # .C and .json (the plotted histograms and graphs as arrays)
+    self.outputFormats = ['.pdf']
+    # PDF collecting all figures, if set
+    self.multiPagePDF = ""
+    self.multiPagePDFOpen = False
 
     self.cutstring = ""
 
@@ -66,6 +67,41 @@ class Morisot(object) :
                      ROOT.kRed,ROOT.kRed+1,ROOT.kRed+2,ROOT.kOrange+9,ROOT.kOrange+10,\
                      ROOT.kOrange+7,ROOT.kOrange,ROOT.kYellow]
 
+    self.isData = False
+    self.labeltype = 2 # ATLAS internal
+
+#    self.set2DPalette()
+
+    # 1 "Preliminary"
+    # 2 "Internal"
+    # 3 "Simulation Preliminary"
+    # 4 "Simulation Internal"
+    # 5 "Simulation"
+    # 6 "Work in Progress"
+
+    self.doAxisTeV = False # Use histogram's natural units
+
+    # Canvases are kept for reuse by size, and legends for reuse once
+    # the canvas they were drawn on is reused
+    self.doPooling = True
+    self.canvasPool = {}
+    self.canvasLegends = {}
+    self.legendPool = []
+
+    # Objects made for the figure being drawn, deleted once it is saved
+    # in teardown mode, and the memory in use after each figure
+    self.doTeardown = False
+    self.figureObjects = []
+    self.memoryReport = []
+
+    # Bin contents of the histograms of the figure being drawn
+    self.binContents = {}
+
+  def setUpROOT(self) :
+
+    AtlasStyle.SetAtlasStyle()
+    ROOT.gROOT.ForceStyle()
+
     self.myLatex = ROOT.TLatex()
     self.myLatex.SetTextColor(ROOT.kBlack)
     self.myLatex.SetNDC()
@@ -80,19 +116,15 @@ class Morisot(object) :
 
     self.line = ROOT.TLine()
 
-    self.isData = False
-    self.labeltype = 2 # ATLAS internal
-
-#    self.set2DPalette()
-
-    # 1 "Preliminary"
-    # 2 "Internal"
-    # 3 "Simulation Preliminary"
-    # 4 "Simulation Internal"
-    # 5 "Simulation"
-    # 6 "Work in Progress"
+    # For text at any place, drawn as copies
+    self.textLatex = ROOT.TLatex()
 
-    self.doAxisTeV = False # Use histogram's natural units
+  def __getattr__(self, name) :
+    # Attributes made by setUpROOT, before ROOT was loaded
+    if name.startswith("__") or ROOT.isLoaded() :
+      raise AttributeError(name)
+    ROOT.load()
+    return getattr(self, name)
 
   def setColourPalette(self,palette) :
     self.colourpalette.setColourPalette(palette)
@@ -104,8 +136,39 @@ class Morisot(object) :
     self.doAxisTeV = dotev
 
   def setEPS(self,doEPS=False) :
-    if doEPS :
-      self.epsorpdf = ".eps"
+    # EPS instead of PDF, or back
+    old,new = (".pdf",".eps") if doEPS else (".eps",".pdf")
+    self.outputFormats = [new if outputFormat == old else outputFormat for outputFormat in self.outputFormats]
+
+  def setOutputFormats(self,formats) :
+    self.outputFormats = list(formats)
+
+  def setMultiPagePDF(self,fileName) :
+    self.closeMultiPagePDF()
+    self.multiPagePDF = fileName
+
+  def closeMultiPagePDF(self) :
+    # Needs a canvas, though nothing is drawn
+    if self.multiPagePDFOpen :
+      c = ROOT.TCanvas("morisot_close",'',0,0,100,100)
+      c.Print(self.multiPagePDF+"]")
+      self.multiPagePDFOpen = False
+
+  def usePooling(self,doPool=True) :
+    if not doPool :
+      self.clearPools()
+    self.doPooling = doPool
+
+  def useTeardown(self,doTeardown=True) :
+    self.doTeardown = doTeardown
+
+  def clearPools(self) :
+    '''Delete the pooled canvases and legends, with everything drawn on them.'''
+    for canvas in self.canvasPool.values() :
+      canvas.Clear()
+    self.canvasPool = {}
+    self.canvasLegends = {}
+    self.legendPool = []
 
   def setisData(self, isData=False) :
     if isData :
@@ -155,13 +218,6 @@ class Morisot(object) :
   def drawBasicDataPlot(self,dataHist,luminosity,CME,xname,yname,legendlines,name,binlow=-1,binhigh=-1,doLogY=False,doLogX=False,doRectangular=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Eoutputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
@@ -205,25 +261,12 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawBasicHistogram(self,hist,binlow,binhigh,xname,yname,name="",makeCanvas=True,doLogY=False,doLogX=False,doErrors=False,fillColour = ROOT.kRed,doRectangular = False) :
 
     if makeCanvas :
       canvasname = name+'_cv'
-      outputname = name+epsorpdf
-      if saveCfile:
-        Coutputname = name+'.C'
-      if saveRfile:
-        Routputname = name+'.root'
-      if saveEfile:
-        Eoutputname = name+'.eps'
       c = self.makeCanvas(canvasname,doRectangular)
       c.SetLogx(doLogX)
       c.SetLogy(doLogY)
@@ -256,23 +299,10 @@ class Morisot(object) :
     if makeCanvas :
       c.RedrawAxis()
       c.Update()
-      c.SaveAs(outputname)
-      if saveCfile:
-        c.SaveSource(Coutputname)
-      if saveRfile:
-        c.SaveSource(Routputname)
-      if saveEfile:
-        c.SaveAs(Eoutputname)
+      self.saveFigure(c,name)
 
   def drawBasicMatrix(self,matrix,xname,yname,name) :
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False)
     c.SetLogx(1)
     c.SetLogy(1)
@@ -287,25 +317,12 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawDataWithFitAsFunction(self,dataHist,function,luminosity,CME,xname,yname,legendlines,name,binlow=-1,binhigh=-1,doLogY=False,doLogX=False,doRectangular=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
@@ -350,24 +367,11 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawDataWithFitAsHistogram(self,dataHist,fitHist,luminosity,CME,xname,yname,legendlines,name,drawError=False,errors = [],binlow=-1,binhigh=-1,doLogY=False,doLogX=False,drawAsSmoothCurve=False,doRectangular=False,doLegTopRight=True,doLabels=True,doEndLines=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
@@ -422,24 +426,11 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawDataOnPrediction(self,sigHist,predHist,xname,yname,legendlines,name,binlow=-1,binhigh=-1,ylow=-1,yhigh=-1,doLabels=False,luminosity=-1,CME=-1,doLogX=False,doLogY=False,doRectangular=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
@@ -485,33 +476,20 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawDataWithFitAsHistogramAndResidual(self,dataHist,fitHist,luminosity,CME,xname,yname,legendlines,name,drawError=False,errors = [],residualList = [],binlow=-1,binhigh=-1,doLogY=False,doLogX=False,drawAsSmoothCurve=False,doRectangular=False,doLegTopRight=True,doLabels=True,doEndLines=False,writeOnpval = False, pval = -999, writeOnFit = False, FitMin =-999,FitMax =-999) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.3,1,1) # For main histo
-    pad2 = ROOT.TPad("pad2","pad2",0,0,1,0.3) # For residuals histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.3,1,1)) # For main histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0,0,1,0.3)) # For residuals histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -686,42 +664,29 @@ class Morisot(object) :
     pad2.Update()
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawDataWithFitAsHistogramAndResidualPaper(self,dataHist,fitHist,luminosity,CME,xname,yname,legendlines,name,drawError=False,errors = [],residualList = [],binlow=-1,binhigh=-1,doLogY=False,doLogX=False,drawAsSmoothCurve=False,doRectangular=False,doLegTopRight=True,doLabels=True,doEndLines=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
     pads = []
     padsize = 0.2
     topOfSubplots = 0.1 + padsize
     for ipad in range(2) :
       padname = "pad_{0}".format(ipad)
       if ipad == 0 :
-        pad = ROOT.TPad(padname,padname,0,topOfSubplots,1,1) # for main histo
+        pad = self.track(ROOT.TPad(padname,padname,0,topOfSubplots,1,1)) # for main histo
       elif ipad!= len(residualList) :
-        pad = ROOT.TPad(padname,padname,0,topOfSubplots - ipad*padsize, 1, topOfSubplots - (ipad-1)*padsize)
+        pad = self.track(ROOT.TPad(padname,padname,0,topOfSubplots - ipad*padsize, 1, topOfSubplots - (ipad-1)*padsize))
       else :
-        pad = ROOT.TPad(padname,padname,0, 0, 1, topOfSubplots - (ipad-1)*padsize)
+        pad = self.track(ROOT.TPad(padname,padname,0, 0, 1, topOfSubplots - (ipad-1)*padsize))
       pads.append(pad)
 
     # Set up to draw in right orientations
@@ -870,24 +835,11 @@ class Morisot(object) :
     pads[1].Update()
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawSignificanceHistAlone(self,significance,xname,yname,name,doLogX=False,doErrors=False,doRectangular=False,firstBin=None,lastBin=None) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(0)
@@ -905,23 +857,10 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawStackedHistograms(self,histograms,names,xname,yname,name,xmin,xmax,ymin,ymax,doRectangular=False) :
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(0)
     c.SetLogy(1)
@@ -930,7 +869,7 @@ class Morisot(object) :
 
     goodcolours = self.getGoodColours(len(histograms))
 
-    stack = ROOT.THStack("stack","stacked histograms")
+    stack = self.track(ROOT.THStack("stack","stacked histograms"))
     for histogram in histograms :
       index = histograms.index(histogram)
       histogram.SetLineColor(goodcolours[index])
@@ -950,13 +889,7 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawManyOverlaidHistograms(self,histograms,names,xname,yname,name,xmin,xmax,ymin,ymax,extraLegendLines = [],doLogX=False,doLogY=True,doErrors=False,doRectangular=False,doLegend=True,doLegendLow=True,doLegendLocation="Left",doLegendOutsidePlot=False,doATLASLabel="Low",pairNeighbouringLines=False,dotLines = [],addHorizontalLines=[]) :
@@ -968,13 +901,6 @@ class Morisot(object) :
          hist.Print("all")
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     if doLegendOutsidePlot :
       if len(histograms)> 12 :
         c = self.makeCanvas(canvasname,doRectangular,2.0,1.0)
@@ -986,13 +912,13 @@ class Morisot(object) :
     c.SetLogy(doLogY)
 
     if doLegendOutsidePlot :
-      outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
+      outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
       if len(histograms) > 12 :
-        pad1 = ROOT.TPad("pad1","pad1",0,0,0.5,1) # For main histo
-        pad2 = ROOT.TPad("pad2","pad2",0.5,0,1,1) # For signal significance histo
+        pad1 = self.track(ROOT.TPad("pad1","pad1",0,0,0.5,1)) # For main histo
+        pad2 = self.track(ROOT.TPad("pad2","pad2",0.5,0,1,1)) # For signal significance histo
       else :
-        pad1 = ROOT.TPad("pad1","pad1",0,0,0.66,1) # For main histo
-        pad2 = ROOT.TPad("pad2","pad2",0.66,0,1,1) # For signal significance histo
+        pad1 = self.track(ROOT.TPad("pad1","pad1",0,0,0.66,1)) # For main histo
+        pad2 = self.track(ROOT.TPad("pad2","pad2",0.66,0,1,1)) # For signal significance histo
 
       # Set up to draw in right orientations
       outpad.SetFillStyle(4000) #transparent
@@ -1183,7 +1109,7 @@ class Morisot(object) :
 
     if addHorizontalLines != [] :
       for val in addHorizontalLines :
-        line = ROOT.TLine(histograms[0].GetBinLowEdge(minX), val, histograms[0].GetBinLowEdge(maxX+6), val)
+        line = self.track(ROOT.TLine(histograms[0].GetBinLowEdge(minX), val, histograms[0].GetBinLowEdge(maxX+6), val))
         line.SetLineColor(ROOT.kBlack)
         line.SetLineStyle(2)
         line.Draw("SAME")
@@ -1192,23 +1118,10 @@ class Morisot(object) :
       pad1.RedrawAxis()
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawTwoHistsDifferentYAxes(self,hist1,hist2,xname,yname1,yname2,name,doRectangular=False) :
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(0)
     c.SetLogy(1)
@@ -1254,25 +1167,12 @@ class Morisot(object) :
       legend.Draw()
 
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawPseudoExperimentsWithObservedStat(self,pseudoStatHist,observedStat,pval,pvalerr,luminosity,CME,xname,yname,name,doRectangular=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(0)
     c.SetLogy(1)
@@ -1288,7 +1188,7 @@ class Morisot(object) :
     pseudoStatHist.GetYaxis().SetTitle(yname)
 
     # Draw arrow to observed stat
-    arrow = ROOT.TArrow()
+    arrow = self.track(ROOT.TArrow())
     arrow.SetLineColor(self.colourpalette.statisticalTestArrowColour)
     arrow.SetFillColor(self.colourpalette.statisticalTestArrowColour)
     arrow.SetLineWidth(2)
@@ -1317,23 +1217,10 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawBumpHunterTomographyPlot(self,tomographyGraph,name) :
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False)
     c.SetLogx(1)
     c.SetLogy(1)
@@ -1360,24 +1247,11 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawDataAndFitOverSignificanceHist(self,dataHist,fitHist,significance,x,datay,sigy,name,luminosity,CME,FitMin,FitMax,firstBin=-1,lastBin=-1,doBumpLimits=False,bumpLow=0,bumpHigh=0,extraLegendLines=[],doLogX=True,doRectangular=False,setYRange=[],writeOnpval = False, pval = -999,doWindowLimits=False,windowLow=0,windowHigh=0) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False)
     c.SetLogx(1)
     c.SetLogy(doLogX)
@@ -1385,9 +1259,9 @@ class Morisot(object) :
     c.SetGridy(0)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.33,1,1) # For main histo
-    pad2 = ROOT.TPad("pad2","pad2",0,0,1,0.33) # For residuals histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.33,1,1)) # For main histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0,0,1,0.33)) # For residuals histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -1432,14 +1306,14 @@ class Morisot(object) :
     c.Update()
 
     # in place of ROOT.TLine()
-    line1 = self.line.Clone("line1"); line1lims = []
-    line2 = self.line.Clone("line2"); line2lims = []
-    line3 = self.line.Clone("line3"); line3lims = []
-    line4 = self.line.Clone("line4"); line4lims = []
-    line5 = self.line.Clone("line5"); line1lims = []
-    line6 = self.line.Clone("line6"); line2lims = []
-    line7 = self.line.Clone("line7"); line3lims = []
-    line8 = self.line.Clone("line8"); line4lims = []
+    line1 = self.track(self.line.Clone("line1")); line1lims = []
+    line2 = self.track(self.line.Clone("line2")); line2lims = []
+    line3 = self.track(self.line.Clone("line3")); line3lims = []
+    line4 = self.track(self.line.Clone("line4")); line4lims = []
+    line5 = self.track(self.line.Clone("line5")); line1lims = []
+    line6 = self.track(self.line.Clone("line6")); line2lims = []
+    line7 = self.track(self.line.Clone("line7")); line3lims = []
+    line8 = self.track(self.line.Clone("line8")); line4lims = []
 
     if doBumpLimits :
       heightLowEdge=0
@@ -1585,25 +1459,12 @@ class Morisot(object) :
     pad2.RedrawAxis()
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def compareDataToLimit(self,dataHist,fitHist,significance,observedLimit,x,datay,sigy,name,luminosity,CME,firstBin=-1,lastBin=-1,doBumpLimits=False,bumpLow=0,bumpHigh=0,extraLegendLines=[],doLogX=True,doRectangular=False,setYRange=[],writeOnpval = False, pval = -999) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False)
     c.SetLogx(1)
     c.SetLogy(doLogX)
@@ -1611,9 +1472,9 @@ class Morisot(object) :
     c.SetGridy(0)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.27,1,1) # For main histo
-    pad2 = ROOT.TPad("pad2","pad2",0,0,1,0.27) # For residuals histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.27,1,1)) # For main histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0,0,1,0.27)) # For residuals histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -1661,10 +1522,10 @@ class Morisot(object) :
     c.Update()
 
     # in place of ROOT.TLine()
-    line1 = self.line.Clone("line1"); line1lims = []
-    line2 = self.line.Clone("line2"); line2lims = []
-    line3 = self.line.Clone("line3"); line3lims = []
-    line4 = self.line.Clone("line4"); line4lims = []
+    line1 = self.track(self.line.Clone("line1")); line1lims = []
+    line2 = self.track(self.line.Clone("line2")); line2lims = []
+    line3 = self.track(self.line.Clone("line3")); line3lims = []
+    line4 = self.track(self.line.Clone("line4")); line4lims = []
     if doBumpLimits :
       heightLowEdge=0
       heightHighEdge=0
@@ -1746,25 +1607,12 @@ class Morisot(object) :
     pad2.RedrawAxis()
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawHistsOverSignificanceHists(self,histograms,names,significancehists,xname,yname,sigy,name,luminosity,CME,xmin,xmax,ymin,ymax,doLogX=True,doLogY=True,doRectangular=False,doErrMain=False,doErrSig=False,sigHistRange=[]) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False)
     c.SetLogx(1)
     c.SetLogy(doLogX)
@@ -1772,9 +1620,9 @@ class Morisot(object) :
     c.SetGridy(0)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.33,1,1) # For main histo
-    pad2 = ROOT.TPad("pad2","pad2",0,0,1,0.33) # For residuals histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.33,1,1)) # For main histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0,0,1,0.33)) # For residuals histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -1952,34 +1800,21 @@ class Morisot(object) :
     pad2.RedrawAxis()
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawDataAndFitWithSignalsOverSignificancesWithMCRatio(self,dataHist,fitHist,signalsignificance,residual,signalsForSpec,signalsForSig,signalmasses,legendlist,x,datay,sigy,residy,name,luminosity,CME,firstBin=-1,lastBin=-1,doBumpLimits=False,bumpLow=0,bumpHigh=0,doLogX=True,doRectangular=False,rightLegend=False, UserScaleText = "",writeOnpval = False, pval = -999, writeOnFit = False, FitMin =-999,FitMax =-999,mcHist=None,mcratioHist=None,mcupratioHist=None,mcdownratioHist=None) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False,1,1.15)
 
     c.SetLogx(1)
     c.SetGridx(0)
     c.SetGridy(0)
 
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.36,1,1) # For main histo
-    pad2 = ROOT.TPad("pad2","pad2",0,0.23,1,0.36) # For residuals histo
-    pad3 = ROOT.TPad("pad3","pad3",0,0,1,0.23) # For MC comparison histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.36,1,1)) # For main histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0,0.23,1,0.36)) # For residuals histo
+    pad3 = self.track(ROOT.TPad("pad3","pad3",0,0,1,0.23)) # For MC comparison histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -2056,10 +1891,10 @@ class Morisot(object) :
           self.drawUsersText(0.15,0.2,"#splitline{"+UserScaleText+"}{#it{p}-value = "+str(round(pval,2))+"}",0.06)
     pad1.Update()
 
-    line1 = self.line.Clone("line1"); line1lims = []
-    line2 = self.line.Clone("line2"); line2lims = []
-    line3 = self.line.Clone("line3"); line3lims = []
-    line4 = self.line.Clone("line4"); line4lims = []
+    line1 = self.track(self.line.Clone("line1")); line1lims = []
+    line2 = self.track(self.line.Clone("line2")); line2lims = []
+    line3 = self.track(self.line.Clone("line3")); line3lims = []
+    line4 = self.track(self.line.Clone("line4")); line4lims = []
 
     if doBumpLimits :
       heightLowEdge=0
@@ -2193,25 +2028,12 @@ class Morisot(object) :
     c.Update()
     ROOT.gPad.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawDataAndFitWithSignalsOverSignificances(self,dataHist,fitHist,signalsignificance,residual,signalsForSpec,signalsForSig,signalmasses,legendlist,x,datay,sigy,residy,name,luminosity,CME,firstBin=-1,lastBin=-1,doBumpLimits=False,bumpLow=0,bumpHigh=0,doLogX=True,doRectangular=False,rightLegend=False, UserScaleText = "",writeOnpval = False, pval = -999, writeOnFit = False, FitMin =-999,FitMax =-999,mcHist=None) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False)
     c.SetLogx(1)
     c.SetGridx(0)
@@ -2222,9 +2044,9 @@ class Morisot(object) :
       drawMC=True
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.3,1,1) # For main histo
-    pad3 = ROOT.TPad("pad3","pad3",0,0,1,0.30) # For residuals histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.3,1,1)) # For main histo
+    pad3 = self.track(ROOT.TPad("pad3","pad3",0,0,1,0.30)) # For residuals histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -2288,10 +2110,10 @@ class Morisot(object) :
           self.drawUsersText(0.23,0.84,"#splitline{"+UserScaleText+"}{"+"{0}}".format(self.cutstring),0.055)
     pad1.Update()
 
-    line1 = self.line.Clone("line1"); line1lims = []
-    line2 = self.line.Clone("line2"); line2lims = []
-    line3 = self.line.Clone("line3"); line3lims = []
-    line4 = self.line.Clone("line4"); line4lims = []
+    line1 = self.track(self.line.Clone("line1")); line1lims = []
+    line2 = self.track(self.line.Clone("line2")); line2lims = []
+    line3 = self.track(self.line.Clone("line3")); line3lims = []
+    line4 = self.track(self.line.Clone("line4")); line4lims = []
 
     if doBumpLimits :
       heightLowEdge=0
@@ -2410,24 +2232,11 @@ class Morisot(object) :
     c.Update()
     ROOT.gPad.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawMultipleFitsAndResiduals(self,dataHist,fitHistList,residualList,legendlist,x,datay,residyList,name,luminosity,CME,firstBin=-1,lastBin=-1,doBumpLimits=False,bumpLow=0,bumpHigh=0,doLogX=True,doRectangular=False,notLogY=False,lowY=11,highY=-1) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False)
     c.SetLogx(1)
 
@@ -2437,7 +2246,7 @@ class Morisot(object) :
     c.SetGridy(0)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
     pads = []
     if len(residualList) == 1 :
       padsize = 0.2
@@ -2451,11 +2260,11 @@ class Morisot(object) :
     for ipad in range(len(residualList)+1) :
       padname = "pad_{0}".format(ipad)
       if ipad == 0 :
-        pad = ROOT.TPad(padname,padname,0,topOfSubplots,1,1) # for main histo
+        pad = self.track(ROOT.TPad(padname,padname,0,topOfSubplots,1,1)) # for main histo
       elif ipad!= len(residualList) :
-        pad = ROOT.TPad(padname,padname,0,topOfSubplots - ipad*padsize, 1, topOfSubplots - (ipad-1)*padsize)
+        pad = self.track(ROOT.TPad(padname,padname,0,topOfSubplots - ipad*padsize, 1, topOfSubplots - (ipad-1)*padsize))
       else :
-        pad = ROOT.TPad(padname,padname,0, 0, 1, topOfSubplots - (ipad-1)*padsize)
+        pad = self.track(ROOT.TPad(padname,padname,0, 0, 1, topOfSubplots - (ipad-1)*padsize))
       pads.append(pad)
 
     # Set up to draw in right orientations
@@ -2561,13 +2370,7 @@ class Morisot(object) :
     for pad in pads :
       pad.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   # Emma's version ;)
   def drawLimitSettingPlotObservedExpected(self,observed,expected, expected1sigma,expected2sigma,signals,signalslegend,name,nameX,nameY,luminosity,CME,xmin,xmax,ymin,ymax,doRectangular=False,drawExistingLimit = False, ExistingLimit = 0, ExistingLimitName = "",doCanvas = True,lineWidth = 3) :
@@ -2578,10 +2381,6 @@ class Morisot(object) :
 
     if doCanvas :
       canvasname = name+'_cv'
-      outputname = name+epsorpdf
-      if saveCfile: Coutputname = name+'.C'
-      if saveRfile: Routputname = name+'.root'
-      if saveEfile: Eoutputname = name+'.eps'
       c = self.makeCanvas(canvasname,doRectangular)
       (c.SetLogx(0),c.SetLogy(1),c.SetGridx(0),c.SetGridy(0))
 
@@ -2701,7 +2500,7 @@ class Morisot(object) :
 
     # Draw arrow to existing limit
     if drawExistingLimit:
-      arrow = ROOT.TArrow()
+      arrow = self.track(ROOT.TArrow())
       arrow.SetLineColor(ROOT.kRed)
       arrow.SetFillColor(ROOT.kRed)
       arrow.SetLineWidth(2)
@@ -2729,7 +2528,7 @@ class Morisot(object) :
       self.drawATLASLabels(0.58,0.88)
       self.persistentlegend.Draw()
 
-      shadeBox = ROOT.TBox()
+      shadeBox = self.track(ROOT.TBox())
 
       # Legend in bottom left-hand corner
       boxX1 = minX + (maxX - minX)*0.045#25#3#2 #21
@@ -2762,14 +2561,7 @@ class Morisot(object) :
     if doCanvas :
       c.RedrawAxis()
       c.Update()
-      c.SaveAs(outputname)
-      c.SaveAs(name+".png")
-      if saveCfile:
-        c.SaveSource(Coutputname)
-      if saveRfile:
-        c.SaveSource(Routputname)
-      if saveEfile:
-        c.SaveAs(Eoutputname)
+      self.saveFigure(c,name,[".png"])
 
     if len(signals)==0:
       return [None, None]
@@ -2794,13 +2586,6 @@ class Morisot(object) :
 
     if doCanvas :
       canvasname = name+'_cv'
-      outputname = name+epsorpdf
-      if saveCfile:
-        Coutputname = name+'.C'
-      if saveRfile:
-        Routputname = name+'.root'
-      if saveEfile:
-        Eoutputname = name+'.eps'
       c = self.makeCanvas(canvasname,doRectangular)
       c.SetLogx(0)
       c.SetLogy(1)
@@ -2934,7 +2719,7 @@ class Morisot(object) :
 
     # Draw arrow to existing limit
     if drawExistingLimit:
-      arrow = ROOT.TArrow()
+      arrow = self.track(ROOT.TArrow())
       arrow.SetLineColor(ROOT.kRed)
       arrow.SetFillColor(ROOT.kRed)
       arrow.SetLineWidth(2)
@@ -2962,7 +2747,7 @@ class Morisot(object) :
       self.drawATLASLabels(0.58,0.88)
       self.persistentlegend.Draw()
 
-      shadeBox = ROOT.TBox()
+      shadeBox = self.track(ROOT.TBox())
 
       # Legend in bottom left-hand corner
       boxX1 = minX + (maxX - minX)*0.045#25#3#2 #21
@@ -2994,13 +2779,7 @@ class Morisot(object) :
     if doCanvas :
       c.RedrawAxis()
       c.Update()
-      c.SaveAs(outputname)
-      if saveCfile:
-        c.SaveSource(Coutputname)
-      if saveRfile:
-        c.SaveSource(Routputname)
-      if saveEfile:
-        c.SaveAs(Eoutputname)
+      self.saveFigure(c,name)
 
     if len(signals)==0:
       return
@@ -3021,13 +2800,6 @@ class Morisot(object) :
   def drawFourLimitPlots_Grid(self,plot1Materials,plot2Materials,plot3Materials,plot4Materials,name,nameX,nameY,luminosity,CME,xmin1,xmax1,xmin2,xmax2,ymin1,ymax1,ymin2,ymax2) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     #c = self.makeCanvas(canvasname,False,2,2.5)
     c = self.makeCanvas(canvasname,False,2,2)
     c.SetLogx(0)
@@ -3036,12 +2808,12 @@ class Morisot(object) :
     c.SetGridy(0)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.52,0.525,0.97) # For first histo
-    pad2 = ROOT.TPad("pad2","pad2",0.525,0.52,1,0.97) # For second histo
-    pad3 = ROOT.TPad("pad3","pad3",0,0,0.525,0.52) # For third histo
-    pad4 = ROOT.TPad("pad4","pad4",0.525,0,1,0.52) # For fourth histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.52,0.525,0.97)) # For first histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0.525,0.52,1,0.97)) # For second histo
+    pad3 = self.track(ROOT.TPad("pad3","pad3",0,0,0.525,0.52)) # For third histo
+    pad4 = self.track(ROOT.TPad("pad4","pad4",0.525,0,1,0.52)) # For fourth histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -3116,7 +2888,7 @@ class Morisot(object) :
 
 
     # Legend in centre bottom of pad2 set coordinates using outpad though!
-    shadeBox = ROOT.TBox()
+    shadeBox = self.track(ROOT.TBox())
     outpad.cd()
 
     boxX1 = 0.56#leftOfLegend#0.207 #21
@@ -3148,25 +2920,12 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawThreePlusOneLimitPlots_Grid(self,plot1Materials,plot2Materials,plot3Materials,TwoDPlotMaterials,name,nameX,nameY,luminosity,CME,xmin1,xmax1,xmin2,xmax2,ymin1,ymax1,ymin2,ymax2) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     # For right aligned
     c = self.makeCanvas(canvasname,False,2,2)
     # For not right aligned
@@ -3177,11 +2936,11 @@ class Morisot(object) :
     c.SetGridy(0)
 
     # Dimensions: xlow, ylow, xup, yup for right-hand stuff aligned
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0.5,0.525,1) # For first histo
-    pad2 = ROOT.TPad("pad2","pad2",0.525,0.445,1,1) # For second histo
-    pad3 = ROOT.TPad("pad3","pad3",0,0,0.525,0.5) # For third histo
-    pad4 = ROOT.TPad("pad4","pad4",0.525,0,1,0.445) # For fourth histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0.5,0.525,1)) # For first histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0.525,0.445,1,1)) # For second histo
+    pad3 = self.track(ROOT.TPad("pad3","pad3",0,0,0.525,0.5)) # For third histo
+    pad4 = self.track(ROOT.TPad("pad4","pad4",0.525,0,1,0.445)) # For fourth histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -3274,7 +3033,7 @@ class Morisot(object) :
     savelegend5.SetMargin(0.15)
     savelegend5.Draw()
 
-    shadeBox = ROOT.TBox()
+    shadeBox = self.track(ROOT.TBox())
 
     # Legend in top right-hand corner
     boxX1 = xmin2 + (xmax2 - xmin2)*leftOfLegend + 0.15 #0.35
@@ -3312,25 +3071,12 @@ class Morisot(object) :
     # Add lumi etc
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   def drawFourLimitPlots_Line(self,plot1Materials,plot2Materials,plot3Materials,plot4Materials,name,nameY,luminosity,CME,xmin1,xmax1,xmin2,xmax2,xmin3,xmax3,xmin4,xmax4,ymin,ymax) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,False,4,1.2)
     c.SetLogx(0)
     c.SetLogy(1)
@@ -3338,11 +3084,11 @@ class Morisot(object) :
     c.SetGridy(0)
 
     # Dimensions: xlow, ylow, xup, yup
-    outpad = ROOT.TPad("extpad","extpad",0,0,1,1) # For marking outermost dimensions
-    pad1 = ROOT.TPad("pad1","pad1",0,0,0.27,1) # For first histo
-    pad2 = ROOT.TPad("pad2","pad2",0.27,0,0.27+0.73/3.0,1) # For second histo
-    pad3 = ROOT.TPad("pad3","pad3",0.27+0.73/3.0,0,0.27+(2.0*0.73)/3.0,1) # For third histo
-    pad4 = ROOT.TPad("pad4","pad4",0.27+(2.0*0.73)/3.0,0,1,1) # For fourth histo
+    outpad = self.track(ROOT.TPad("extpad","extpad",0,0,1,1)) # For marking outermost dimensions
+    pad1 = self.track(ROOT.TPad("pad1","pad1",0,0,0.27,1)) # For first histo
+    pad2 = self.track(ROOT.TPad("pad2","pad2",0.27,0,0.27+0.73/3.0,1)) # For second histo
+    pad3 = self.track(ROOT.TPad("pad3","pad3",0.27+0.73/3.0,0,0.27+(2.0*0.73)/3.0,1)) # For third histo
+    pad4 = self.track(ROOT.TPad("pad4","pad4",0.27+(2.0*0.73)/3.0,0,1,1)) # For fourth histo
 
     # Set up to draw in right orientations
     outpad.SetFillStyle(4000) #transparent
@@ -3409,7 +3155,7 @@ class Morisot(object) :
     savelegend5.AddEntry( "NULL" , "68% and 95% bands","")
     savelegend5.Draw()
 
-    shadeBox = ROOT.TBox()
+    shadeBox = self.track(ROOT.TBox())
 
     # Legend in top right-hand corner
     boxX1 = xmin4 + (xmax4 - xmin4)*leftOfLegend + 0.18 #0.18
@@ -3441,24 +3187,11 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def draw2DLimit(self,hist,name,xAxisName,xlow,xhigh,yAxisName,ylow,yhigh,zAxisName,luminosity=-1,CME=-1,doRectangular=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular,1.2)
     c.SetLogx(0)
     c.SetLogy(0)
@@ -3492,24 +3225,11 @@ class Morisot(object) :
       self.drawUsersText(0.165,0.695,self.cutstring,0.039)
 
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawOverlaid2DPlots(self,histBase,histsTop,name,xAxisName,xlow,xhigh,yAxisName,ylow,yhigh,zAxisName,luminosity=-1,CME=-1,doRectangular=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular,1.2)
     c.SetLogx(0)
     c.SetLogy(0)
@@ -3537,24 +3257,11 @@ class Morisot(object) :
       histContour.Draw("CONT1 SAME")
 
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawSeveralObservedAndExpected(self,observeds,expecteds1sigma,expecteds2sigma,legendnames,name,nameX,nameY,luminosity,CME,xmin,xmax,ymin,ymax,doRectangular=False) :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(0)
     c.SetLogy(1)
@@ -3660,7 +3367,7 @@ class Morisot(object) :
     self.drawATLASLabels(0.20,0.20)
     legend.Draw()
 
-    shadeBox = ROOT.TBox()
+    shadeBox = self.track(ROOT.TBox())
     boxX1 = minX + (maxX - minX)*0.19 #21
     boxX2 = boxX1 + (maxX - minX)*0.125 # 135
     boxY1 = math.exp(math.log(minY) + (math.log(maxY) - math.log(minY))*(0.665-0.06*(len(observeds)-1))) #0.66
@@ -3678,25 +3385,12 @@ class Morisot(object) :
 
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   def drawSignalOverlaidOnBkgPlot(self,bkgPlot,signalPlots,signalMasses,legendlist,lumi,CME,yname,name,firstBin=-1,lastBin=-1,doLogY=False,FixY=False,printCanvas=True,doRectangular=False) :
 
     if (printCanvas) :
       canvasname = name+'_cv'
-      outputname = name+epsorpdf
-      if saveCfile:
-        Coutputname = name+'.C'
-      if saveRfile:
-        Routputname = name+'.root'
-      if saveEfile:
-        Eoutputname = name+'.eps'
       c = self.makeCanvas(canvasname,doRectangular)
       c.SetLogx(1)
       c.SetLogy(doLogY)
@@ -3781,7 +3475,7 @@ class Morisot(object) :
       index = signalPlots.index(observed)
       mass = signalMasses[index]
       newname = observed.GetName()+"_graph"
-      plot = ROOT.TGraph()
+      plot = self.track(ROOT.TGraph())
       plot.SetName(newname)
       pointn = 0
 
@@ -3821,25 +3515,12 @@ class Morisot(object) :
 
       c.RedrawAxis()
       c.Update()
-      c.SaveAs(outputname)
-      if saveCfile:
-        c.SaveSource(Coutputname)
-      if saveRfile:
-        c.SaveSource(Routputname)
-      if saveEfile:
-        c.SaveAs(Eoutputname)
+      self.saveFigure(c,name)
 
   def drawSignalOverlaidOnDataAndFit(self,dataHist,fitHist,signalPlots,signalMasses,legendlist,lumi,CME,yname,name,firstBin=-1,lastBin=-1,doLogX=False,doLogY=True,printCanvas=True,doRectangular=False,nPads = 1,mcHist=None) :
 
     if (printCanvas) :
       canvasname = name+'_cv'
-      outputname = name+epsorpdf
-      if saveCfile:
-        Coutputname = name+'.C'
-      if saveRfile:
-        Routputname = name+'.root'
-      if saveEfile:
-        Eoutputname = name+'.eps'
       c = self.makeCanvas(canvasname,doRectangular)
       c.SetLogx(doLogX)
       c.SetLogy(doLogY)
@@ -3889,7 +3570,7 @@ class Morisot(object) :
 
       mass = signalMasses[index]
       newname = observed.GetName()+"_graph_2"
-      plot = ROOT.TGraph()
+      plot = self.track(ROOT.TGraph())
       plot.SetName(newname)
       pointn = 0
 
@@ -3939,26 +3620,13 @@ class Morisot(object) :
 
       c.RedrawAxis()
       c.Update()
-      c.SaveAs(outputname)
-      if saveCfile:
-        c.SaveSource(Coutputname)
-      if saveRfile:
-        c.SaveSource(Routputname)
-      if saveEfile:
-        c.SaveAs(Eoutputname)
+      self.saveFigure(c,name)
 
   def drawSeveralObservedLimits(self,observedlist,signallegendlist,name,nameX,nameY,luminosity,CME,xmin,xmax,ymin,ymax,extraLegendLines = [], doLogY=True,doLogX=False,doRectangular=False,doLegendLocation="Right",ATLASLabelLocation="BottomL",isTomBeingDumb=False,addHorizontalLines=[],pairNeighbouringLines=False,cutLocation="Right") :
 
     # LegendLocation should be "Right","Left", or "Wide"
     # ATLASLabelLocation should be "BottomL", "BottomR", "byLegend", or "None"
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
@@ -4093,7 +3761,7 @@ class Morisot(object) :
 
     if addHorizontalLines != [] :
       for val in addHorizontalLines :
-        line = ROOT.TLine(minX, val, maxX, val)
+        line = self.track(ROOT.TLine(minX, val, maxX, val))
         line.SetLineColor(ROOT.kBlack)
         line.SetLineStyle(2)
         line.Draw("SAME")
@@ -4141,13 +3809,7 @@ class Morisot(object) :
     # Should have draw-box for the bands
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
   # Emma's version ;)
   def drawSeveralObservedExpectedLimits(self,observedlist,expectedlist,expected1list,expected2list,signallegendlist,name,nameX,nameY,luminosity,CME,xmin,xmax,ymin,ymax,extraLegendLines = [], doLogY=True,doLogX=False,doRectangular=False,doLegendLocation="Left",ATLASLabelLocation="BottomL",addHorizontalLines=[],cutLocation="Right",labels=[]) :
@@ -4155,13 +3817,6 @@ class Morisot(object) :
     # LegendLocation should be "Right","Left", or "Wide"
     # ATLASLabelLocation should be "BottomL", "BottomR", "byLegend", or "None"
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(doLogX)
     c.SetLogy(doLogY)
@@ -4367,7 +4022,7 @@ class Morisot(object) :
         legend.AddEntry(expected, "Expected 95% CL Upper Limit (#pm 1-2#sigma)","L")
       #legend.AddEntry( "NULL" , "68% and 95% bands","")
 
-      fill_line = ROOT.TLine()
+      fill_line = self.track(ROOT.TLine())
       fill_line.SetNDC()
       fill_line.SetLineColor(self.colourpalette.twoSigmaBandColour)
       fill_line.SetLineWidth(20)
@@ -4377,7 +4032,7 @@ class Morisot(object) :
       fill_line.SetLineWidth(10)
       fill_line.DrawLineNDC(leftOfAll+0.01, 0.745 + offset, leftOfAll + 0.065, 0.745+offset)
     else:
-      fill_line = ROOT.TLine()
+      fill_line = self.track(ROOT.TLine())
       fill_line.SetNDC()
       fill_line.SetLineColor(ROOT.TColor.GetColor("#D1DCFF"))
       fill_line.SetLineWidth(20)
@@ -4400,7 +4055,7 @@ class Morisot(object) :
 
     if addHorizontalLines != [] :
       for val in addHorizontalLines :
-        line = ROOT.TLine(minX, val, maxX, val)
+        line = self.track(ROOT.TLine(minX, val, maxX, val))
         line.SetLineColor(ROOT.kBlack)
         line.SetLineStyle(2)
         line.Draw("SAME")
@@ -4441,25 +4096,11 @@ class Morisot(object) :
     # Should have draw-box for the bands
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    c.SaveAs(name + '.png')
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name,[".png"])
 
   def drawPosteriorsWithCLs(self,posteriorsandclslist,legendlist,luminosity,CME,name,align=2,central=True,drawAsHist=False,addlinestolegend=False,doLogY=False,drawPriors=[],doRectangular=False,newxname="",newyname="") :
 
     canvasname = name+'_cv'
-    outputname = name+epsorpdf
-    if saveCfile:
-      Coutputname = name+'.C'
-    if saveRfile:
-      Routputname = name+'.root'
-    if saveEfile:
-      Eoutputname = name+'.eps'
     c = self.makeCanvas(canvasname,doRectangular)
     c.SetLogx(0)
     c.SetLogy(doLogY)
@@ -4537,7 +4178,7 @@ class Morisot(object) :
         posterior.Draw("C SAME")
 
       # Draw line for CL in matching colour :
-      clLine = ROOT.TLine()
+      clLine = self.track(ROOT.TLine())
       clLine.SetLineColor(colour)
       if len(posteriorsandclslist) + len(drawPriors) < 3 :
        clLine.SetLineColor(1000)
@@ -4581,13 +4222,7 @@ class Morisot(object) :
     # Should have draw-box for the bands
     c.RedrawAxis()
     c.Update()
-    c.SaveAs(outputname)
-    if saveCfile:
-      c.SaveSource(Coutputname)
-    if saveRfile:
-      c.SaveSource(Routputname)
-    if saveEfile:
-      c.SaveAs(Eoutputname)
+    self.saveFigure(c,name)
 
 
   ## ----------------------------------------------------
@@ -4595,15 +4230,54 @@ class Morisot(object) :
 
   def makeCanvas(self,canvasname,doRectangular,scaleX=1.0,scaleY=1.0) :
 
+    # A new figure: histograms may have changed since the last one
+    self.binContents = {}
+
     if doRectangular :
       dim = int(800*scaleX),int(600*scaleY)
     else :
       dim = int(600*scaleX),int(600*scaleY)
-    return ROOT.TCanvas(canvasname,'',0,0,dim[0],dim[1])
+    if not self.doPooling :
+      return self.track(ROOT.TCanvas(canvasname,'',0,0,dim[0],dim[1]))
+
+    if dim in self.canvasPool :
+      # Previous figure of this size is saved: clear it, which deletes the
+      # copies drawn on it, and return it to the style of a new canvas
+      c = self.canvasPool[dim]
+      c.Clear()
+      c.UseCurrentStyle()
+      c.SetLogx(0)
+      c.SetLogy(0)
+      c.SetLogz(0)
+      c.cd()
+      self.legendPool.extend(self.canvasLegends[dim])
+    else :
+      # Named by size: a canvas made with the name of another deletes it
+      c = ROOT.TCanvas("morisot_{0}x{1}".format(*dim),'',0,0,dim[0],dim[1])
+      self.canvasPool[dim] = c
+    self.canvasLegends[dim] = []
+    c.SetName(canvasname)
+    return c
 
   def makeLegend(self,legX1,legY1,legX2,legY2,fontSize = 0.04) :
 
-    legend = ROOT.TLegend(legX1,legY1,legX2,legY2)
+    dim = self.getPooledCanvas()
+    if dim is not None and self.legendPool :
+      legend = self.legendPool.pop()
+      legend.Clear()
+      legend.SetX1NDC(legX1)
+      legend.SetY1NDC(legY1)
+      legend.SetX2NDC(legX2)
+      legend.SetY2NDC(legY2)
+      legend.SetNColumns(1)
+      legend.SetMargin(0.25)
+      legend.SetEntrySeparation(0.1)
+    else :
+      legend = ROOT.TLegend(legX1,legY1,legX2,legY2)
+    if dim is not None :
+      self.canvasLegends[dim].append(legend)
+    else :
+      self.track(legend)
     legend.SetTextFont(42)
     legend.SetTextSize(fontSize)
     legend.SetBorderSize(0)
@@ -4614,33 +4288,150 @@ class Morisot(object) :
     legend.SetFillStyle(0)#1001)
     return legend
 
+  def getPooledCanvas(self) :
+    # Size of the pooled canvas being drawn on, if any
+    if not self.canvasPool or not ROOT.gPad :
+      return None
+    canvas = ROOT.gPad.GetCanvas()
+    for dim, pooled in self.canvasPool.items() :
+      if canvas == pooled :
+        return dim
+    return None
+
+  def track(self,rootObject) :
+    # Made for the current figure only: in teardown mode kept out of
+    # gDirectory and deleted once the figure is saved
+    if self.doTeardown :
+      if hasattr(rootObject,"SetDirectory") :
+        rootObject.SetDirectory(0)
+      self.figureObjects.append(rootObject)
+    return rootObject
+
+  def saveFigure(self,c,name,extraFormats=[]) :
+    '''Write the figure in all output formats, add it to the multi-page
+    PDF and finish it.'''
+    formats = []
+    for outputFormat in self.outputFormats + extraFormats :
+      if outputFormat not in formats :
+        formats.append(outputFormat)
+    for outputFormat in formats :
+      if outputFormat == ".C" :
+        c.SaveSource(name+outputFormat)
+      elif outputFormat == ".json" :
+        self.saveArrays(c,name+outputFormat)
+      else :
+        c.SaveAs(name+outputFormat)
+    if self.multiPagePDF :
+      if not self.multiPagePDFOpen :
+        c.Print(self.multiPagePDF+"[")
+        self.multiPagePDFOpen = True
+      c.Print(self.multiPagePDF,"Title:"+os.path.basename(name))
+    self.finishFigure(c,name)
+
+  def saveArrays(self,c,fileName) :
+    arrays = {}
+    self.getPlottedArrays(c,arrays)
+    with open(fileName,"w") as arrayFile :
+      json.dump(arrays,arrayFile,indent=1,sort_keys=True)
+
+  def getPlottedArrays(self,pad,arrays,prefix="") :
+    # 1D histograms and graphs drawn on pad and its subpads, by
+    # pad/object name
+    for primitive in pad.GetListOfPrimitives() :
+      key = prefix+primitive.GetName()
+      while key in arrays :
+        key = key+"+"
+      if primitive.InheritsFrom("TPad") :
+        self.getPlottedArrays(primitive,arrays,key+"/")
+      elif primitive.InheritsFrom("THStack") :
+        for hist in primitive.GetHists() :
+          arrays[key+"/"+hist.GetName()] = self.getHistArrays(hist)
+      elif primitive.InheritsFrom("TH1") and primitive.GetDimension() == 1 :
+        arrays[key] = self.getHistArrays(primitive)
+      elif primitive.InheritsFrom("TGraph") :
+        points = range(primitive.GetN())
+        arrays[key] = {"x" : [primitive.GetX()[i] for i in points],
+                       "y" : [primitive.GetY()[i] for i in points],
+                       "errorXLow" : [primitive.GetErrorXlow(i) for i in points],
+                       "errorXHigh" : [primitive.GetErrorXhigh(i) for i in points],
+                       "errorYLow" : [primitive.GetErrorYlow(i) for i in points],
+                       "errorYHigh" : [primitive.GetErrorYhigh(i) for i in points]}
+
+  def getHistArrays(self,hist) :
+    bins = range(1,hist.GetNbinsX()+1)
+    return {"edges" : [hist.GetBinLowEdge(bin) for bin in bins]+[hist.GetXaxis().GetBinUpEdge(hist.GetNbinsX())],
+            "content" : [hist.GetBinContent(bin) for bin in bins],
+            "errors" : [hist.GetBinError(bin) for bin in bins]}
+
+  def finishFigure(self,c,name) :
+    '''In teardown mode, delete the objects of the figure just saved and
+    record the memory in use.'''
+    self.binContents = {}
+    if not self.doTeardown :
+      return
+    # Deletes the copies drawn on the canvas and its pads
+    c.Clear()
+    nObjects = len(self.figureObjects)
+    # Newest first, so that pads go before the canvas holding them
+    for rootObject in reversed(self.figureObjects) :
+      # Null if already deleted with its pad
+      if not rootObject == None :
+        ROOT.SetOwnership(rootObject,False)
+        rootObject.IsA().Destructor(rootObject)
+    self.figureObjects = []
+    self.memoryReport.append((name,nObjects,self.getResidentMemory()))
+
+  def getResidentMemory(self) :
+    # In MB
+    info = ROOT.ProcInfo_t()
+    ROOT.gSystem.GetProcInfo(info)
+    return info.fMemResident/1024.
+
+  def printMemoryReport(self) :
+    if not self.memoryReport :
+      return
+    print "%-60s %8s %12s %12s" % ("Figure","Objects","Memory [MB]","Change [MB]")
+    previous = self.memoryReport[0][2]
+    for name,nObjects,memory in self.memoryReport :
+      print "%-60s %8d %12.1f %+12.1f" % (name[-60:],nObjects,memory,memory-previous)
+      previous = memory
+    first,last = self.memoryReport[0][2],self.memoryReport[-1][2]
+    print "Memory grew by %.1f MB over %d figures (%.3f MB per figure)" \
+          % (last-first,len(self.memoryReport),(last-first)/max(len(self.memoryReport)-1,1))
+
   def getAxisRangeFromHist(self,hist) :
-    # Axis range should be decided by data hist
-    firstBin =0
-    while (hist.GetBinContent(firstBin+1)==0 and firstBin < hist.GetNbinsX()) :
-      firstBin+=1
-    lastBin = hist.GetNbinsX()+1
-    while (hist.GetBinContent(lastBin-1)==0 and lastBin > 0) :
-      lastBin-=1
+    # Axis range should be decided by data hist: from the bin before
+    # the first filled one to the bin after the last
+    contents = self.getBinContents(hist)
+    nBins = len(contents)-2
+    filled = np.flatnonzero(contents[:nBins+1] != 0)
+    inner = filled[filled >= 1]
+    firstBin = int(inner[0])-1 if len(inner) > 0 else nBins
+    lastBin = int(filled[-1])+1 if len(filled) > 0 else 0
     if (firstBin > lastBin) :
       firstBin=1
-      lastBin = hist.GetNbinsX()
+      lastBin = nBins
     return firstBin,lastBin
 
   def getYRangeFromHist(self,hist) :
-    lowyval = 1E10
-    lownonzero = 1E10
-    highyval = -1E10
     lowbin,highbin = self.getAxisRangeFromHist(hist)
-    for bin in range(lowbin,highbin) :
-      if hist.GetBinContent(bin) < lowyval :
-        lowyval = hist.GetBinContent(bin)
-      if hist.GetBinContent(bin) < lownonzero and hist.GetBinContent(bin) > 0 :
-        lownonzero = hist.GetBinContent(bin)
-      if hist.GetBinContent(bin) > highyval :
-        highyval = hist.GetBinContent(bin)
+    contents = self.getBinContents(hist)[lowbin:highbin]
+    contents = contents[~np.isnan(contents)]
+    positive = contents[contents > 0]
+    lowyval = min(1E10,float(contents.min())) if len(contents) > 0 else 1E10
+    lownonzero = min(1E10,float(positive.min())) if len(positive) > 0 else 1E10
+    highyval = max(-1E10,float(contents.max())) if len(contents) > 0 else -1E10
     return lowyval,lownonzero,highyval
 
+  def getBinContents(self,hist) :
+    # Contents of all bins, under- and overflow included, read once per
+    # figure. The histogram is kept with them so that its id stays unique.
+    key = id(hist)
+    if key not in self.binContents :
+      contents = np.array([hist.GetBinContent(bin) for bin in range(hist.GetNbinsX()+2)],dtype=float)
+      self.binContents[key] = (hist,contents)
+    return self.binContents[key][1]
+
   def getGoodColours(self, ncolours) :
     if ncolours < 4 :
       return self.colourpalette.shortGoodColours
@@ -4791,7 +4582,7 @@ class Morisot(object) :
 
 
     # To get line on top need to redraw
-    persistent = fitHist.Clone("newone")
+    persistent = self.track(fitHist.Clone("newone"))
     persistent.SetFillStyle(0)
     if useError :
       persistent.SetLineColor(lineColor)
@@ -5025,112 +4816,98 @@ class Morisot(object) :
       mytext = "{0}={1} TeV, {2} {3}".format(mysqrt,CME,lumitext,myfb)
       #self.whitebox.AddText(0.04,1.0/8.0,"{0}={1} TeV, {2} {3}".format(mysqrt,CME,lumiInFb,myfb))
     #self.whitebox.Draw()
-    newtext = ROOT.TLatex()
-    newtext.SetNDC()
-    newtext.SetTextSize(fontsize)
-    newtext.SetTextFont(42)
-    newtext.SetTextAlign(11)
-    newtext.DrawLatex(xstart,ystart,"{0}".format(mytext)) 
+    self.drawText(xstart,ystart,mytext,fontsize)
     return
 
   def drawXAxisInTeV(self,xmin,xmax,ymin,ymax,ndiv=510) :
-    axisfunc = ROOT.TF1("axisfunc","x",float(xmin)/1000.0,float(xmax)/1000.0)
-    newaxis = ROOT.TGaxis(xmin,ymin,xmax,ymax,"axisfunc",ndiv)
+    axisfunc = self.track(ROOT.TF1("axisfunc","x",float(xmin)/1000.0,float(xmax)/1000.0))
+    newaxis = self.track(ROOT.TGaxis(xmin,ymin,xmax,ymax,"axisfunc",ndiv))
     return newaxis,axisfunc
 
   # Generic function to add text to plot e.g. to write a value on it
   def drawUsersText(self,xstart,ystart,text,fontsize=0.06) :
 
-    newtext = ROOT.TLatex()
-    newtext.SetNDC()
-    newtext.SetTextSize(fontsize)
-    newtext.SetTextFont(42)
-    newtext.SetTextAlign(11)
-    newtext.DrawLatex(xstart,ystart,"{0}".format(text)) 
+    self.drawText(xstart,ystart,text,fontsize)
     return
 
-  def calculateIntersectionOfGraphs(self, graph1, graph2, doLogGraph1=False, doLogGraph2=False) :
-
-    crossings = []
-
-    for point in range(graph1.GetN()-1) :
-      graph1HigherAtLeft=False
-      graph1HigherAtRight=False
-      thisX1 = graph1.GetX()[point]
-      thisX2 = graph1.GetX()[point+1]
+  def drawText(self,xstart,ystart,text,fontsize) :
+    # DrawLatex draws a copy, so one TLatex serves all text
+    self.textLatex.SetNDC()
+    self.textLatex.SetTextSize(fontsize)
+    self.textLatex.SetTextFont(42)
+    self.textLatex.SetTextAlign(11)
+    self.textLatex.DrawLatex(xstart,ystart,"{0}".format(text))
 
-      if graph1.Eval(thisX1) <= 0 or graph2.Eval(thisX1) <= 0 \
-           or graph2.GetX()[0] > thisX1 or graph2.GetX()[graph2.GetN()-1] < thisX2 :
-        continue
-
-      graph1y1 = graph1.GetY()[point]
-      graph1y2 = graph1.GetY()[point+1]
-      if doLogGraph2 :
-        graph2y1 = self.getGraphAtXWithLog(graph2,thisX1)
-        graph2y2 = self.getGraphAtXWithLog(graph2,thisX2)
-      else :
-        graph2y1 = graph2.Eval(thisX1)
-        graph2y2 = graph2.Eval(thisX2)
-
-      if (graph1y1 > graph2y1) :
-        graph1HigherAtLeft = True
-      if (graph1y2 > graph2y2) :
-        graph1HigherAtRight = True
-
-      # If no crossing in this interval carry on
-      if (graph1HigherAtLeft == graph1HigherAtRight) :
-        continue
-
-      # Otherwise, figure out where and keep it
-      xtest = 0.5*(thisX1+thisX2)
-      while(abs(thisX1-thisX2) > 0.001) :
-
-        if doLogGraph1 :
-          graph1y1 = self.getGraphAtXWithLog(graph1,thisX1)
-          graph1y2 = self.getGraphAtXWithLog(graph1,thisX2)
-          graph1ytest = self.getGraphAtXWithLog(graph1,xtest)
-        else :
-          graph1y1 = graph1.Eval(thisX1)
-          graph1y2 = graph1.Eval(thisX2)
-          graph1ytest = graph1.Eval(xtest)
-        if doLogGraph2 :
-          graph2y1 = self.getGraphAtXWithLog(graph2,thisX1)
-          graph2y2 = self.getGraphAtXWithLog(graph2,thisX2)
-          graph2ytest = self.getGraphAtXWithLog(graph2,xtest)
-        else :
-          graph2y1 = graph2.Eval(thisX1)
-          graph2y2 = graph2.Eval(thisX2)
-          graph2ytest = graph2.Eval(xtest)
-
-        if ((graph1y1 >= graph2y1) and (graph1y2 <= graph2y2)) :
-          if graph1ytest > graph2ytest :
-            thisX1 = xtest
-          else :
-            thisX2 = xtest
+  def calculateIntersectionOfGraphs(self, graph1, graph2, doLogGraph1=False, doLogGraph2=False) :
 
-        elif ((graph1y1 <= graph2y1) and (graph1y2 >= graph2y2)) :
-          if graph1ytest > graph2ytest :
-            thisX2 = xtest
-          else :
-            thisX1 = xtest
+    x1,y1 = self.getGraphArrays(graph1)
+    x2,y2 = self.getGraphArrays(graph2)
+    if len(x1) < 2 or len(x2) < 2 :
+      return []
+
+    # Logs of non-positive values only reach comparisons, which are then false
+    with np.errstate(divide="ignore",invalid="ignore") :
+      # Segments of graph1 inside graph2, with both positive at the left
+      left = x1[:-1]
+      right = x1[1:]
+      inside = (y1[:-1] > 0) & (self.interpolateGraph(x2,y2,left) > 0) \
+               & (x2[0] <= left) & (x2[-1] >= right)
+      # Crossed where graph1 goes from above graph2 to below, or back
+      graph1Higher = y1 > self.interpolateGraph(x2,y2,x1,doLogGraph2)
+      crossed = inside & (graph1Higher[:-1] != graph1Higher[1:])
+      thisX1 = left[crossed]
+      thisX2 = right[crossed]
+
+      # Bisect all crossed segments together, each down to 0.001 in x
+      active = np.abs(thisX1-thisX2) > 0.001
+      while np.any(active) :
         xtest = 0.5*(thisX1+thisX2)
+        diff1 = self.interpolateGraph(x1,y1,thisX1,doLogGraph1) - self.interpolateGraph(x2,y2,thisX1,doLogGraph2)
+        diff2 = self.interpolateGraph(x1,y1,thisX2,doLogGraph1) - self.interpolateGraph(x2,y2,thisX2,doLogGraph2)
+        difftest = self.interpolateGraph(x1,y1,xtest,doLogGraph1) - self.interpolateGraph(x2,y2,xtest,doLogGraph2)
+        falling = (diff1 >= 0) & (diff2 <= 0)
+        rising = ~falling & (diff1 <= 0) & (diff2 >= 0)
+        moveLeft = active & ((falling & (difftest > 0)) | (rising & ~(difftest > 0)))
+        moveRight = active & ((falling & ~(difftest > 0)) | (rising & (difftest > 0)))
+        # Segments where the ends do not bracket a crossing stay as they are
+        if not np.any(moveLeft | moveRight) :
+          break
+        thisX1 = np.where(moveLeft,xtest,thisX1)
+        thisX2 = np.where(moveRight,xtest,thisX2)
+        active = np.abs(thisX1-thisX2) > 0.001
 
-      crossings.append(xtest)
-
+    crossings = [float(xtest) for xtest in 0.5*(thisX1+thisX2)]
     return crossings
 
   def getGraphAtXWithLog(self, graph, x) :
 
-    for point in range(graph.GetN()-1) :
-      thisX1 = graph.GetX()[point]
-      thisX2 = graph.GetX()[point+1]
-      if thisX1 > x or thisX2 < x :
-        continue
-      thisY1 = graph.GetY()[point]
-      thisY2 = graph.GetY()[point+1]
-      m = (math.log(thisY2) - math.log(thisY1))/(thisX2 - thisX1)
-      lny = math.log(thisY1) + m*(x-thisX1)
-    return math.exp(lny)
+    graphX,graphY = self.getGraphArrays(graph)
+    return float(self.interpolateGraph(graphX,graphY,np.asarray(x,dtype=float),True))
+
+  def getGraphArrays(self, graph) :
+    # Points of graph as arrays, in increasing x
+    n = graph.GetN()
+    graphX = graph.GetX()
+    graphY = graph.GetY()
+    x = np.array([graphX[point] for point in range(n)],dtype=float)
+    y = np.array([graphY[point] for point in range(n)],dtype=float)
+    order = np.argsort(x,kind="mergesort")
+    return x[order],y[order]
+
+  def interpolateGraph(self, x, y, at, doLog=False) :
+    # Graph of points x,y at the values at: linear between the points
+    # around each (as TGraph.Eval), or linear in log(y)
+    segment = np.clip(np.searchsorted(x,at,side="right")-1,0,len(x)-2)
+    thisX1 = x[segment]
+    thisX2 = x[segment+1]
+    if doLog :
+      lny1 = np.log(y[segment])
+      lny2 = np.log(y[segment+1])
+      m = (lny2 - lny1)/(thisX2 - thisX1)
+      return np.exp(lny1 + m*(at-thisX1))
+    thisY1 = y[segment]
+    thisY2 = y[segment+1]
+    return thisY1 + (at-thisX1)*(thisY2-thisY1)/(thisX2-thisX1)
 
   def fixTheBloodyTickMarks(self, pad, hist, x1, x2, y1, y2) :
 
@@ -5142,7 +4919,7 @@ class Morisot(object) :
     if x2/x1 > 100 or x2/x1 < 10:
       return
 
-    tick = ROOT.TLine()
+    tick = self.track(ROOT.TLine())
 
     tick.SetLineWidth(1)
     tick.SetLineColor(1)
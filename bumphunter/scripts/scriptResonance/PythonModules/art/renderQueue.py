@@ -0,0 +1,137 @@
+# Stand-in for a Morisot painter which can render figures in parallel.
+# With one job every draw call goes straight to the painter. With more,
+# calls are recorded and, on render(), handed out to a pool of worker
+# processes forked from the caller, so that they inherit the histograms
+# of the recorded calls. Each worker runs ROOT in batch mode with a
+# painter of its own made by makePainter, and writes the same files
+# as the sequential calls would.
+#
+# Given a FigureManifest, figures whose inputs are the same as when
+# they were last drawn are skipped, in either mode. Calls are then
+# recorded in both modes and drawn by render(): the painter changes
+# the style of the histograms it draws, so the keys of all figures
+# are taken before any of them is drawn, or a figure's key would
+# depend on whether the figures sharing its histograms were drawn.
+
+import multiprocessing
+import traceback
+
+from art.figureManifest import getCallArguments, getCodeKey, getFigureKey
+
+# Set before the pool is forked, read by the workers
+_makePainter = None
+_tasks = []
+_painter = None
+
+
+def _initWorker() :
+  global _painter
+  import ROOT
+  ROOT.gROOT.SetBatch(True)
+  _painter = _makePainter()
+
+
+def _renderTask(index) :
+  methodName, args, kwargs = _tasks[index]
+  try :
+    getattr(_painter, methodName)(*args, **kwargs)
+    return index, None
+  except Exception :
+    return index, traceback.format_exc()
+
+
+class RenderQueue(object) :
+
+  def __init__(self, makePainter, nJobs=1, manifest=None) :
+    self.makePainter = makePainter
+    self.nJobs = nJobs
+    self.manifest = manifest
+    self.tasks = []
+    # Figure name and key of each task, for the manifest
+    self.taskFigures = []
+    self.nSkipped = 0
+    self.immediate = nJobs <= 1
+    # Without a manifest the recorded calls need no painter here
+    self.painter = makePainter() if self.immediate or manifest is not None else None
+    if manifest is not None :
+      self.codeKey = getCodeKey([makePainter, type(self.painter)])
+
+  def __getattr__(self, methodName) :
+    # Only called for names which are not attributes of the queue
+    if self.manifest is None :
+      if self.immediate :
+        return getattr(self.painter, methodName)
+      def record(*args, **kwargs) :
+        self.tasks.append((methodName, args, kwargs))
+      return record
+
+    method = getattr(self.painter, methodName)
+    def drawIfChanged(*args, **kwargs) :
+      arguments = getCallArguments(method, args, kwargs)
+      if "name" not in arguments :
+        # Not a figure
+        self.tasks.append((methodName, args, kwargs))
+        self.taskFigures.append(None)
+        return
+      outputFormats = getattr(self.painter, "outputFormats", [".pdf"])
+      key = getFigureKey(methodName, arguments, self.codeKey, outputFormats)
+      if self.manifest.isUpToDate(arguments["name"], key, outputFormats) :
+        self.nSkipped += 1
+        return
+      self.tasks.append((methodName, args, kwargs))
+      self.taskFigures.append((arguments["name"], key))
+    return drawIfChanged
+
+  ## ----------------------------------------------------
+  ## Main function
+
+  def render(self) :
+    '''Draw the recorded figures on nJobs processes. Returns the
+    indices (in order of recording) of the figures which failed.'''
+    global _makePainter, _tasks
+    if self.nSkipped > 0 :
+      print("Skipped %d figures with unchanged inputs" % self.nSkipped)
+      self.nSkipped = 0
+    if not self.tasks :
+      self.saveManifest([])
+      return []
+    failed = []
+    if self.immediate :
+      # Recorded only for the manifest: drawn here, in order
+      for index, (methodName, args, kwargs) in enumerate(self.tasks) :
+        try :
+          getattr(self.painter, methodName)(*args, **kwargs)
+        except Exception :
+          failed.append(index)
+          print("Figure %d (%s) failed:\n%s" % (index, methodName, traceback.format_exc()))
+      self.saveManifest(failed)
+      self.tasks = []
+      return failed
+
+    _makePainter, _tasks = self.makePainter, self.tasks
+    print("Rendering %d figures on %d processes" % (len(self.tasks), self.nJobs))
+
+    pool = multiprocessing.Pool(min(self.nJobs, len(self.tasks)), _initWorker)
+    try :
+      for index, error in pool.imap_unordered(_renderTask, range(len(self.tasks))) :
+        if error is not None :
+          failed.append(index)
+          print("Figure %d (%s) failed:\n%s" % (index, self.tasks[index][0], error))
+    finally :
+      pool.close()
+      pool.join()
+    self.saveManifest(failed)
+    self.tasks = []
+    return sorted(failed)
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def saveManifest(self, failed) :
+    if self.manifest is None :
+      return
+    for index, figure in enumerate(self.taskFigures) :
+      if figure is not None and index not in failed :
+        self.manifest.update(*figure)
+    self.taskFigures = []
+    self.manifest.save()
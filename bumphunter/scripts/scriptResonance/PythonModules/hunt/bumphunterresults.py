@@ -0,0 +1,146 @@
+# Contents of a runBumpHunter (or runBumpHunterParallel.py) output
+# file as numpy arrays, read without PyROOT through hunt.rootfile.
+#
+# Reading is cached in a .npz sidecar next to the ROOT file
+# (<file>.root.npz) which records the modification time and size of
+# the ROOT file it was made from; it is used instead of the ROOT file
+# for as long as both are unchanged.
+
+import os
+import numpy as np
+
+from hunt.rootfile import RootFile
+
+histogramNames = ["basicData", "basicBkg", "residualHist", "logLikelihoodStatHistNullCase", \
+                  "chi2StatHistNullCase", "bumpHunterStatHistNullCase"]
+vectorNames = ["FitRange", "logLOfFitToData", "chi2OfFitToData", "bumpHunterStatOfFitToData", \
+               "bumpHunterPLowHigh"]
+graphNames = ["bumpHunterTomographyFromPseudoexperiments"]
+
+
+class Histogram(object) :
+  '''A TH1 as arrays. content and errors include under- and overflow,
+  so that content[bin] is GetBinContent(bin).'''
+
+  def __init__(self, name, content, errors, binEdges) :
+    self.name = name
+    self.content = np.asarray(content, dtype=float)
+    self.errors = np.asarray(errors, dtype=float)
+    self.binEdges = np.asarray(binEdges, dtype=float)
+
+  def getNbins(self) :
+    return len(self.binEdges) - 1
+
+  def findBin(self, x) :
+    '''Bin number of x as TH1::FindBin: 0 below, nBins+1 above the axis.'''
+    return int(np.searchsorted(self.binEdges, x, side="right"))
+
+  def getBinLowEdge(self, bin) :
+    return self.binEdges[bin-1]
+
+  def getBinWidth(self, bin) :
+    return self.binEdges[bin] - self.binEdges[bin-1]
+
+
+class Graph(object) :
+
+  def __init__(self, name, x, y, ex, ey) :
+    self.name = name
+    self.x = np.asarray(x, dtype=float)
+    self.y = np.asarray(y, dtype=float)
+    self.ex = np.asarray(ex, dtype=float)
+    self.ey = np.asarray(ey, dtype=float)
+
+
+class BumpHunterResults(object) :
+  '''Objects of a runBumpHunter output file, as attributes named like
+  the keys in the file, plus the numbers plotBumpHunter prints.'''
+
+  def __init__(self, histograms, vectors, graphs) :
+    for name, histogram in histograms.items() :
+      setattr(self, name, histogram)
+    for name, vector in vectors.items() :
+      setattr(self, name, vector)
+    for name, graph in graphs.items() :
+      setattr(self, name, graph)
+
+    self.logLOfFitToDataValue, self.logLPVal = self.logLOfFitToData[0], self.logLOfFitToData[1]
+    self.chi2OfFitToDataValue, self.chi2PVal = self.chi2OfFitToData[0], self.chi2OfFitToData[1]
+    self.bumpHunterStatFitToData = self.bumpHunterPLowHigh[0]
+    self.bumpLowEdge, self.bumpHighEdge = self.bumpHunterPLowHigh[1], self.bumpHunterPLowHigh[2]
+    self.bumpHunterPVal = self.bumpHunterStatOfFitToData[1]
+    self.bumpHunterPValErr = self.bumpHunterStatOfFitToData[2]
+
+  @classmethod
+  def fromRootFile(cls, fileName) :
+    inFile = RootFile(fileName)
+    histograms, vectors, graphs = {}, {}, {}
+    for name in histogramNames :
+      stored = inFile.get(name)
+      histograms[name] = Histogram(name, stored["content"], stored["errors"], stored["binEdges"])
+    for name in vectorNames :
+      vectors[name] = inFile.get(name)
+    for name in graphNames :
+      stored = inFile.get(name)
+      graphs[name] = Graph(name, stored["x"], stored["y"], stored["ex"], stored["ey"])
+    return cls(histograms, vectors, graphs)
+
+  @classmethod
+  def fromArrays(cls, arrays) :
+    histograms = dict((name, Histogram(name, arrays[name + ".content"], arrays[name + ".errors"], \
+                                       arrays[name + ".binEdges"])) for name in histogramNames)
+    vectors = dict((name, arrays[name]) for name in vectorNames)
+    graphs = dict((name, Graph(name, arrays[name + ".x"], arrays[name + ".y"], \
+                               arrays[name + ".ex"], arrays[name + ".ey"])) for name in graphNames)
+    return cls(histograms, vectors, graphs)
+
+  def toArrays(self) :
+    '''Flat dictionary of arrays, as stored in the sidecar.'''
+    arrays = {}
+    for name in histogramNames :
+      histogram = getattr(self, name)
+      for field in ("content", "errors", "binEdges") :
+        arrays[name + "." + field] = getattr(histogram, field)
+    for name in vectorNames :
+      arrays[name] = getattr(self, name)
+    for name in graphNames :
+      graph = getattr(self, name)
+      for field in ("x", "y", "ex", "ey") :
+        arrays[name + "." + field] = getattr(graph, field)
+    return arrays
+
+
+def getSidecarName(fileName) :
+  return fileName + ".npz"
+
+
+def getFileStamp(fileName) :
+  status = os.stat(fileName)
+  return np.array([status.st_mtime, status.st_size], dtype=float)
+
+
+def loadBumpHunterResults(fileName, useCache=True) :
+  '''BumpHunterResults of a runBumpHunter output file, from its
+  sidecar if that was made from the file as it is now.'''
+  if not useCache :
+    return BumpHunterResults.fromRootFile(fileName)
+
+  stamp = getFileStamp(fileName)
+  sidecarName = getSidecarName(fileName)
+  if os.path.exists(sidecarName) :
+    try :
+      with np.load(sidecarName) as stored :
+        if np.array_equal(stored["fileStamp"], stamp) :
+          return BumpHunterResults.fromArrays(stored)
+    except (IOError, KeyError, ValueError) :
+      pass
+
+  results = BumpHunterResults.fromRootFile(fileName)
+  # Written under a temporary name, so that readers never see half a sidecar
+  temporaryName = sidecarName + ".tmp.npz"
+  try :
+    np.savez(temporaryName, fileStamp=stamp, **results.toArrays())
+    os.rename(temporaryName, sidecarName)
+  except (IOError, OSError) :
+    print("Cannot write %s, reading %s without cache" % (sidecarName, fileName))
+  return results
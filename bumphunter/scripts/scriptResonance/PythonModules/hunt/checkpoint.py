@@ -0,0 +1,74 @@
+# Append-only checkpoint of completed pseudo-experiment blocks.
+#
+# The file is a header record followed by one pickled record per
+# finished block. Each record is flushed and synced as soon as the
+# block is done, so a job killed at any point loses at most the
+# blocks that were running. Since block i always draws its toys
+# from the generator seeded with (masterSeed, i), the header
+# settings together with the list of finished blocks are the full
+# generator state needed to carry on.
+
+import hashlib
+import os
+import pickle
+import numpy as np
+
+
+def getCampaignHeader(templateHist, theStatTests, firstBinToUse, lastBinToUse, masterSeed, blockSize, chunkSize) :
+  '''Everything that must match for stored blocks to be reused.'''
+  template = hashlib.md5(np.ascontiguousarray(templateHist.effectiveContent).tobytes())
+  template.update(np.ascontiguousarray(templateHist.effectiveErrors).tobytes())
+  return {"template" : template.hexdigest(),
+          "tests" : [(test.__class__.__name__, test.getConfiguration()) for test in theStatTests],
+          "binRange" : (firstBinToUse, lastBinToUse),
+          "masterSeed" : masterSeed,
+          "blockSize" : blockSize,
+          "chunkSize" : chunkSize}
+
+
+class CheckpointFile(object) :
+
+  def __init__(self, fileName, header) :
+    self.fileName = fileName
+    self.header = header
+
+  def load(self) :
+    '''Finished blocks as {(blockIndex, nToys) : (statistics, furtherInformation)}.
+    Creates the file if it does not exist yet.'''
+    if not os.path.exists(self.fileName) or os.path.getsize(self.fileName) == 0 :
+      with open(self.fileName, "wb") as checkpoint :
+        self.writeRecord(checkpoint, self.header)
+      return {}
+
+    blocks = {}
+    with open(self.fileName, "rb") as checkpoint :
+      header = pickle.load(checkpoint)
+      if header != self.header :
+        raise ValueError("Checkpoint %s was made with different settings: %s" % (self.fileName, header))
+      goodSize = checkpoint.tell()
+      while True :
+        try :
+          (blockIndex, nToys), result = pickle.load(checkpoint)
+        # A record cut off part way can fail to unpickle in many ways
+        except Exception :
+          break
+        blocks[(blockIndex, nToys)] = result
+        goodSize = checkpoint.tell()
+
+    # Drop a record which was cut off when the job was killed
+    if goodSize < os.path.getsize(self.fileName) :
+      print("Discarding incomplete record at the end of %s" % self.fileName)
+      with open(self.fileName, "r+b") as checkpoint :
+        checkpoint.truncate(goodSize)
+
+    print("Resuming from %s: %d blocks done" % (self.fileName, len(blocks)))
+    return blocks
+
+  def append(self, block, result) :
+    with open(self.fileName, "ab") as checkpoint :
+      self.writeRecord(checkpoint, (block, result))
+
+  def writeRecord(self, checkpoint, record) :
+    pickle.dump(record, checkpoint, pickle.HIGHEST_PROTOCOL)
+    checkpoint.flush()
+    os.fsync(checkpoint.fileno())
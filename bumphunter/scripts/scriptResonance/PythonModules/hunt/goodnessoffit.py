@@ -0,0 +1,97 @@
+# Python counterparts of MjjLogLikelihoodTest and MjjChi2Test.
+#
+# Besides the single-spectrum doTest, each test has a doTestBatch
+# which scores a whole (nToys x nBins) matrix of effective contents
+# against one template Spectrum in a single array pass. This is
+# the interface used by hunt.pseudoexperiments.
+
+import sys
+import numpy as np
+
+from hunt.mathfunctions import logGamma
+from hunt.statisticaltest import StatisticalTest, getOutermostBinsWithDataBatch
+
+
+def getBinRangesBatch(dataMatrix, firstBinToUse=-1, lastBinToUse=-1) :
+  '''Per-row first and last bins compared by the log-likelihood
+  and chi2 tests: the user's bins if valid, else the outermost
+  bins with data in that row. Underflow and overflow are not
+  stored, so the user's bins are clipped to 1..N.'''
+  nToys, nBins = dataMatrix.shape
+  firstWithData, lastWithData = getOutermostBinsWithDataBatch(dataMatrix)
+  if firstBinToUse < 0 or firstBinToUse > nBins + 1 :
+    firstBins = firstWithData
+  else :
+    firstBins = np.full(nToys, max(firstBinToUse, 1), dtype=int)
+  if lastBinToUse < 0 or lastBinToUse > nBins + 1 or lastBinToUse < firstBinToUse :
+    lastBins = lastWithData
+  else :
+    lastBins = np.full(nToys, min(lastBinToUse, nBins), dtype=int)
+  return firstBins, lastBins
+
+
+class BinByBinTest(StatisticalTest) :
+  '''A statistic which is a sum of independent per-bin terms.'''
+
+  def binTerms(self, dataMatrix, template) :
+    raise NotImplementedError
+
+  def doTestBatch(self, dataMatrix, template, firstBinToUse=-1, lastBinToUse=-1) :
+    '''Statistic for each row of dataMatrix against the template.
+    Returns (statistics, further information per row).'''
+    dataMatrix = np.atleast_2d(np.asarray(dataMatrix, dtype=float))
+    firstBins, lastBins = getBinRangesBatch(dataMatrix, firstBinToUse, lastBinToUse)
+    bins = np.arange(1, dataMatrix.shape[1] + 1)
+    use = (bins[np.newaxis,:] >= firstBins[:,np.newaxis]) & (bins[np.newaxis,:] <= lastBins[:,np.newaxis])
+    if self.excludeWindow :
+      use &= (bins < self.firstBinToExclude) | (bins > self.lastBinToExclude)
+    terms = self.binTerms(dataMatrix, template)
+    statistics = np.where(use, terms, 0.).sum(axis=1)
+    return statistics, np.zeros((len(statistics), 0))
+
+
+class LogLikelihoodTest(BinByBinTest) :
+
+  def logLikelihood(self, d, b) :
+    '''-log(TMath::PoissonI(d,b)), capped where the probability underflows.'''
+    d = np.floor(np.asarray(d, dtype=float))
+    b = np.asarray(b, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore') :
+      logPoisson = np.where(d == 0, -b, d*np.log(b) - b - logGamma(np.maximum(d, 0) + 1.))
+      prob = np.where(d < 0, 0., np.exp(logPoisson))
+      return np.where(prob == 0, -np.log(sys.float_info.min), -np.log(prob))
+
+  def binTerms(self, dataMatrix, template) :
+    return self.logLikelihood(dataMatrix, template.effectiveContent[np.newaxis,:])
+
+  def doTest(self, data, bkg, firstBinToUse=-1, lastBinToUse=-1) :
+    '''Sum over bins of -log(Poisson(d,b)).'''
+    data = np.asarray(data, dtype=float)[np.newaxis,:]
+    firstBins, lastBins = getBinRangesBatch(data, firstBinToUse, lastBinToUse)
+    bins = np.arange(firstBins[0], lastBins[0] + 1)
+    if self.excludeWindow :
+      bins = bins[(bins < self.firstBinToExclude) | (bins > self.lastBinToExclude)]
+    return float(self.logLikelihood(data[0,bins - 1], np.asarray(bkg, dtype=float)[bins - 1]).sum())
+
+
+class Chi2Test(BinByBinTest) :
+
+  def chi2Terms(self, d, b, deltaB) :
+    '''(d-b)^2/(b+deltaB^2), skipping empty data bins.'''
+    with np.errstate(divide='ignore', invalid='ignore') :
+      terms = (d - b)**2/(b + deltaB**2)
+    return np.where(d == 0, 0., terms)
+
+  def binTerms(self, dataMatrix, template) :
+    return self.chi2Terms(dataMatrix, template.effectiveContent[np.newaxis,:], \
+                          template.effectiveErrors[np.newaxis,:])
+
+  def doTest(self, data, bkg, bkgErr, firstBinToUse=-1, lastBinToUse=-1) :
+    '''Sum over populated bins of (d-b)^2/(b+deltaB^2).'''
+    data = np.asarray(data, dtype=float)[np.newaxis,:]
+    firstBins, lastBins = getBinRangesBatch(data, firstBinToUse, lastBinToUse)
+    bins = np.arange(firstBins[0], lastBins[0] + 1)
+    if self.excludeWindow :
+      bins = bins[(bins < self.firstBinToExclude) | (bins > self.lastBinToExclude)]
+    return float(self.chi2Terms(data[0,bins - 1], np.asarray(bkg, dtype=float)[bins - 1], \
+                                np.asarray(bkgErr, dtype=float)[bins - 1]).sum())
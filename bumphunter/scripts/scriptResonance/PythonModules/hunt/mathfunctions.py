@@ -0,0 +1,300 @@
+# Vectorised versions of the functions in src/MathFunctions.cxx
+# which are needed to run the statistical tests from python.
+#
+# Every function here accepts scalars or numpy arrays and
+# broadcasts like a numpy ufunc. Conventions (including the
+# corner cases) follow the C++ versions, which in turn follow
+# TMath, so that results can be compared number by number.
+
+import math
+import numpy as np
+
+# Lanczos approximation, g=7, n=9
+_lanczosG = 7.
+_lanczosCoefficients = [0.99999999999980993, 676.5203681218851, -1259.1392167224028,
+                        771.32342877765313, -176.61502916214059, 12.507343278686905,
+                        -0.13857109526572012, 9.9843695780195716e-6, 1.5056327351493116e-7]
+
+_epsilon = 1e-15
+_tiny = 1e-300
+_maxIterations = 1000
+
+# Above this a, and within this fraction of a from it, x is handled
+# by the asymptotic expansion rather than the series
+_asymptoticMinA = 500.
+_asymptoticBand = 0.3
+
+
+def logGamma(x) :
+  '''ln(Gamma(x)) for x > 0.'''
+  x = np.asarray(x, dtype=float)
+  # Stirling's series keeps full relative precision for large x
+  large = x >= 10.
+  xL = np.where(large, x, 10.)
+  stirling = (xL - 0.5)*np.log(xL) - xL + 0.5*math.log(2*math.pi) \
+             + 1./(12.*xL) - 1./(360.*xL**3) + 1./(1260.*xL**5) - 1./(1680.*xL**7)
+  # Lanczos below, shifting small arguments up by one
+  xS = np.where(large, 1., x)
+  small = xS < 0.5
+  z = np.where(small, xS + 1., xS) - 1.
+  series = np.full(z.shape, _lanczosCoefficients[0])
+  for index in range(1, len(_lanczosCoefficients)) :
+    series = series + _lanczosCoefficients[index]/(z + index)
+  t = z + _lanczosG + 0.5
+  lanczos = 0.5*math.log(2*math.pi) + (z + 0.5)*np.log(t) - t + np.log(series)
+  lanczos = np.where(small, lanczos - np.log(np.where(small, xS, 1.)), lanczos)
+  return np.where(large, stirling, lanczos)
+
+
+def _logGammaPrefactor(a, x) :
+  '''ln(x^a exp(-x) / Gamma(a)). For large a, Stirling's series is
+  used so that the large terms cancel analytically.'''
+  large = a >= 10.
+  answer = np.empty(a.shape)
+  if (~large).any() :
+    answer[~large] = -x[~large] + a[~large]*np.log(x[~large]) - logGamma(a[~large])
+  if large.any() :
+    aL = a[large]
+    mu = x[large]/aL - 1.
+    stirling = 1./(12.*aL) - 1./(360.*aL**3) + 1./(1260.*aL**5) - 1./(1680.*aL**7)
+    answer[large] = -aL*(mu - np.log1p(mu)) + 0.5*np.log(aL/(2.*math.pi)) - stirling
+  return answer
+
+
+def _gammaSeries(a, x) :
+  '''Lower regularized incomplete gamma by series. Use for x < a+1.'''
+  result = np.empty(a.shape)
+  prefactor = np.exp(_logGammaPrefactor(a, x))
+  index = np.arange(a.size)
+  total = 1./a
+  term = total.copy()
+  ap = a.copy()
+  for iteration in range(_maxIterations) :
+    ap += 1.
+    term *= x/ap
+    total += term
+    done = np.abs(term) < np.abs(total)*_epsilon
+    if done.any() :
+      result[index[done]] = total[done]
+      index, x, term, total, ap = [item[~done] for item in (index, x, term, total, ap)]
+      if index.size == 0 : break
+  result[index] = total
+  return result*prefactor
+
+
+def _gammaContinuedFraction(a, x) :
+  '''Upper regularized incomplete gamma by continued fraction
+  (modified Lentz). Use for x >= a+1.'''
+  result = np.empty(a.shape)
+  prefactor = np.exp(_logGammaPrefactor(a, x))
+  index = np.arange(a.size)
+  b = x + 1. - a
+  c = np.full(a.shape, 1./_tiny)
+  d = 1./b
+  h = d.copy()
+  for i in range(1, _maxIterations) :
+    an = -i*(i - a)
+    b += 2.
+    d = an*d + b
+    d[np.abs(d) < _tiny] = _tiny
+    c = b + an/c
+    c[np.abs(c) < _tiny] = _tiny
+    d = 1./d
+    delta = d*c
+    h *= delta
+    done = np.abs(delta - 1.) < _epsilon
+    if done.any() :
+      result[index[done]] = h[done]
+      index, a, b, c, d, h = [item[~done] for item in (index, a, b, c, d, h)]
+      if index.size == 0 : break
+  result[index] = h
+  return result*prefactor
+
+
+def _gammaUniformAsymptotic(a, x) :
+  '''Lower and upper regularized incomplete gamma for large a with x
+  close to a, from Temme's uniform asymptotic expansion (DLMF 8.12),
+  keeping the first two coefficients. Both series above need
+  O(sqrt(a)) terms in this region.'''
+  mu = x/a - 1.
+  eta = np.sign(mu)*np.sqrt(2.*(mu - np.log1p(mu)))
+  # Coefficients c0, c1 of the expansion. Closed forms cancel near eta=0,
+  # so use their Taylor series there.
+  small = np.abs(eta) < 0.1
+  safeMu = np.where(small, 1., mu)
+  safeEta = np.where(small, 1., eta)
+  c0 = np.where(small, -1./3. + eta/12. - 2.*eta**2/135. + eta**3/864. + eta**4/2835. \
+                       - 139.*eta**5/777600., \
+                1./safeMu - 1./safeEta)
+  c1 = np.where(small, -1./540. - eta/288. + eta**2/378., \
+                1./safeEta**3 - 1./safeMu**3 - 1./safeMu**2 - 1./(12.*safeMu))
+  remainder = np.exp(-0.5*a*eta**2)/np.sqrt(2.*math.pi*a)*(c0 + c1/a)
+  # erfc(z) = Q(1/2, z^2) for z >= 0
+  z = eta*np.sqrt(a/2.)
+  erfLower, erfUpper = incompleteGamma(0.5, z**2)
+  erfcPositive = np.where(z >= 0, erfUpper, 1. + erfLower)
+  erfcNegative = np.where(z >= 0, 1. + erfLower, erfUpper)
+  upper = 0.5*erfcPositive + remainder
+  lower = 0.5*erfcNegative - remainder
+  return lower, upper
+
+
+def incompleteGamma(a, x) :
+  '''Regularized lower and upper incomplete gamma functions P(a,x), Q(a,x).
+  As TMath::Gamma(a,x) in ROOT 6, P is one if a <= 0, else zero
+  if x <= 0.
+  Whichever of the two is small is calculated directly, so
+  that it keeps its relative precision far into the tail.'''
+  a, x = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(x, dtype=float))
+  lower = np.where(a <= 0, 1., 0.)
+  upper = 1. - lower
+  valid = (a > 0) & (x > 0)
+  asymptotic = valid & (a > _asymptoticMinA) & (np.abs(x - a) < _asymptoticBand*a)
+  series = valid & ~asymptotic & (x < a + 1.)
+  fraction = valid & ~asymptotic & ~series
+  if asymptotic.any() :
+    lower[asymptotic], upper[asymptotic] = _gammaUniformAsymptotic(a[asymptotic], x[asymptotic])
+  if series.any() :
+    lower[series] = _gammaSeries(a[series], x[series])
+    upper[series] = 1. - lower[series]
+  if fraction.any() :
+    upper[fraction] = _gammaContinuedFraction(a[fraction], x[fraction])
+    lower[fraction] = 1. - upper[fraction]
+  return lower, upper
+
+
+def poissonPval(d, b) :
+  '''Probability of observing a value at least as extreme as d
+  given expectation b. Same as PoissonPval in MathFunctions.cxx:
+  for d >= b this is TMath::Gamma(d,b), else 1 - TMath::Gamma(d+1,b).'''
+  d, b = np.broadcast_arrays(np.asarray(d, dtype=float), np.asarray(b, dtype=float))
+  upwards = d >= b
+  # Sum upwards: P(d,b). Sum downwards: Q(d+1,b).
+  lower, upper = incompleteGamma(np.where(upwards, d, d + 1.), b)
+  return np.where(upwards, lower, upper)
+
+
+def _betaContinuedFraction(a, b, x) :
+  '''Continued fraction of the incomplete beta function (modified
+  Lentz). Converges quickly for x < (a+1)/(a+b+2).'''
+  result = np.empty(a.shape)
+  index = np.arange(a.size)
+  c = np.ones(a.shape)
+  d = 1. - (a + b)*x/(a + 1.)
+  d[np.abs(d) < _tiny] = _tiny
+  d = 1./d
+  h = d.copy()
+  for m in range(1, _maxIterations) :
+    # Even step
+    an = m*(b - m)*x/((a + 2*m - 1.)*(a + 2*m))
+    d = 1. + an*d
+    d[np.abs(d) < _tiny] = _tiny
+    c = 1. + an/c
+    c[np.abs(c) < _tiny] = _tiny
+    d = 1./d
+    h *= d*c
+    # Odd step
+    an = -(a + m)*(a + b + m)*x/((a + 2*m)*(a + 2*m + 1.))
+    d = 1. + an*d
+    d[np.abs(d) < _tiny] = _tiny
+    c = 1. + an/c
+    c[np.abs(c) < _tiny] = _tiny
+    d = 1./d
+    delta = d*c
+    h *= delta
+    done = np.abs(delta - 1.) < _epsilon
+    if done.any() :
+      result[index[done]] = h[done]
+      index, a, b, x, c, d, h = [item[~done] for item in (index, a, b, x, c, d, h)]
+      if index.size == 0 : break
+  result[index] = h
+  return result
+
+
+def incompleteBeta(a, b, x, y=None) :
+  '''Regularized incomplete beta function I_x(a,b) and its
+  complement 1 - I_x(a,b) = I_y(b,a), for a, b > 0. y = 1-x can be
+  passed separately when it is known more precisely than 1-x.
+  As for incompleteGamma, the smaller of the two is calculated
+  directly.'''
+  if y is None :
+    y = 1. - np.asarray(x, dtype=float)
+  a, b, x, y = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float), \
+                                   np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+  lower = np.where(x >= 1., 1., 0.)
+  upper = 1. - lower
+  inside = (x > 0) & (y > 0)
+  if inside.any() :
+    aI, bI, xI, yI = a[inside], b[inside], x[inside], y[inside]
+    # x^a y^b / (a B(a,b)), common to both sides
+    logFront = aI*np.log(xI) + bI*np.log(yI) - logGamma(aI) - logGamma(bI) + logGamma(aI + bI)
+    direct = xI < (aI + 1.)/(aI + bI + 2.)
+    lowerI = np.empty(aI.shape)
+    upperI = np.empty(aI.shape)
+    if direct.any() :
+      lowerI[direct] = np.exp(logFront[direct])*_betaContinuedFraction(aI[direct], bI[direct], xI[direct])/aI[direct]
+      upperI[direct] = 1. - lowerI[direct]
+    if (~direct).any() :
+      upperI[~direct] = np.exp(logFront[~direct])*_betaContinuedFraction(bI[~direct], aI[~direct], yI[~direct])/bI[~direct]
+      lowerI[~direct] = 1. - upperI[~direct]
+    lower[inside] = lowerI
+    upper[inside] = upperI
+  return lower, upper
+
+
+def poissonConvGammaPval(d, b, bErr) :
+  '''Poisson p-value for d when the expectation b has a gamma-distributed
+  uncertainty bErr, as PoissonConvGammaPval in MathFunctions.cxx.
+  Marginalising over the gamma density turns the Poisson into a
+  negative binomial, whose cumulative sum up to n, which the C++
+  builds term by term, is I_x(alpha, n+1) with x = beta/(1+beta).'''
+  d, b, bErr = np.broadcast_arrays(np.asarray(d, dtype=float), \
+                 np.asarray(b, dtype=float), np.asarray(bErr, dtype=float))
+  with np.errstate(divide='ignore', invalid='ignore') :
+    beta = b/(bErr*bErr)
+    alpha = b*beta
+  answer = np.empty(d.shape)
+
+  # If the error is small enough don't bother with all this nonsense
+  poisson = alpha > 100*d
+  if poisson.any() :
+    answer[poisson] = poissonPval(d[poisson], b[poisson])
+
+  convolve = ~poisson
+  if convolve.any() :
+    dC, bC, alphaC, betaC = d[convolve], b[convolve], alpha[convolve], beta[convolve]
+    # Sum of P(n) for n = 0..stop. For 0 < d < 1 the C++ stop, an
+    # unsigned int, wraps round to sum P(0) only: P(n >= 1) remains.
+    upwards = dC > bC
+    stop = np.maximum(np.floor(dC) - upwards, 0)
+    sumBelow, sumAbove = incompleteBeta(alphaC, stop + 1., betaC/(1. + betaC), 1./(1. + betaC))
+    # A gamma density with zero mean: all weight on n = 0
+    sumBelow = np.where(alphaC == 0, 1., sumBelow)
+    sumAbove = np.where(alphaC == 0, 0., sumAbove)
+    answer[convolve] = np.where(upwards, sumAbove, sumBelow)
+
+  return answer
+
+
+def makeHistoFromStats(statistics) :
+  '''Histogram of a set of statistics as in MakeHistoFromStats:
+  one bin per ten entries, range padded by 5% on both sides.
+  Returns (counts, binEdges).'''
+  statistics = np.asarray(statistics, dtype=float)
+  nBins = max(int(len(statistics)/10.), 1)
+  maxVal = statistics.max()
+  minVal = statistics.min()
+  axisRange = maxVal - minVal
+  return np.histogram(statistics, bins=nBins, \
+                      range=(minVal - 0.05*axisRange, maxVal + 0.05*axisRange))
+
+
+def getFrequentistPValAndError(pseudoExpStatistics, observedStatistic) :
+  '''Fraction of pseudo-experiment statistics strictly above the
+  observed one, and its binomial uncertainty.'''
+  pseudoExpStatistics = np.asarray(pseudoExpStatistics, dtype=float)
+  trials = len(pseudoExpStatistics)
+  successes = np.count_nonzero(pseudoExpStatistics > observedStatistic)
+  pVal = float(successes)/trials
+  pValErr = math.sqrt(pVal*(1. - pVal))/math.sqrt(trials)
+  return pVal, pValErr
@@ -0,0 +1,135 @@
+# Pseudo-experiments sharded over a process pool.
+#
+# The toys are split into fixed-size blocks and block i draws its
+# toys from a generator seeded with (masterSeed, i). Which worker
+# runs a block, and how many workers there are, therefore has no
+# effect on the result: the merged statistics are identical to
+# those from a single process with the same masterSeed and
+# blockSize.
+
+import multiprocessing
+import os
+import numpy as np
+
+from hunt.pseudoexperiments import PseudoExperimenter
+from hunt.checkpoint import CheckpointFile, getCampaignHeader
+
+# Set in each worker by _initWorker, so that the template and tests
+# are sent once per worker rather than once per block
+_workerSetup = None
+
+
+def _initWorker(setup) :
+  global _workerSetup
+  _workerSetup = setup
+
+
+def _runBlock(block) :
+  templateHist, theStatTests, firstBinToUse, lastBinToUse, masterSeed, chunkSize = _workerSetup
+  blockIndex, nToys = block
+  experimenter = PseudoExperimenter(getBlockSeed(masterSeed, blockIndex))
+  experimenter.setChunkSize(chunkSize)
+  experimenter.setVerbose(False)
+  return block, experimenter.getPseudoExperimentStats(templateHist, theStatTests, \
+                                                      firstBinToUse, lastBinToUse, nToys)
+
+
+def getBlockSeed(masterSeed, blockIndex) :
+  '''Seed of the toy generator for one block.'''
+  return [masterSeed, blockIndex]
+
+
+def getBlocks(nExperiments, blockSize) :
+  '''(blockIndex, nToys) for each block covering nExperiments toys.'''
+  return [(index, min(blockSize, nExperiments - start)) \
+          for index, start in enumerate(range(0, nExperiments, blockSize))]
+
+
+class ParallelPseudoExperimenter(PseudoExperimenter) :
+
+  ## ----------------------------------------------------
+  ## Initialisers
+
+  def __init__(self, masterSeed=None, nWorkers=None, blockSize=1000) :
+    PseudoExperimenter.__init__(self, masterSeed)
+    if masterSeed is None :
+      masterSeed = int(np.random.RandomState().randint(2**31))
+      print("No seed given: using master seed %d" % masterSeed)
+    self.masterSeed = masterSeed
+    self.nWorkers = nWorkers if nWorkers else multiprocessing.cpu_count()
+    self.blockSize = blockSize
+    self.checkpointFileName = None
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  def setNWorkers(self, nWorkers) :
+    self.nWorkers = max(1, nWorkers)
+
+  # Changing the block size changes which toys are drawn
+  def setBlockSize(self, blockSize) :
+    self.blockSize = max(1, blockSize)
+
+  # Finished blocks are appended to this file, and read back
+  # instead of being rerun when the campaign is restarted
+  def setCheckpointFile(self, fileName) :
+    self.checkpointFileName = fileName
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def getPseudoExperimentStats(self, templateHist, theStatTests, firstBinToUse, lastBinToUse, nExperiments, \
+                               stopCondition=None) :
+    '''As PseudoExperimenter.getPseudoExperimentStats, with the toys
+    split into blocks which are run on nWorkers processes and merged
+    in block order. stopCondition is checked after each block, in
+    block order, so early stopping is reproducible as well.'''
+
+    setup = (templateHist, theStatTests, firstBinToUse, lastBinToUse, self.masterSeed, self.chunkSize)
+    blocks = getBlocks(nExperiments, self.blockSize)
+
+    # Blocks already finished by an earlier run of the same campaign
+    checkpoint = None
+    finished = {}
+    if self.checkpointFileName is not None :
+      checkpoint = CheckpointFile(self.checkpointFileName, \
+                     getCampaignHeader(templateHist, theStatTests, firstBinToUse, lastBinToUse, \
+                                       self.masterSeed, self.blockSize, self.chunkSize))
+      finished = checkpoint.load()
+
+    blocksToRun = [block for block in blocks if block not in finished]
+    nWorkers = min(self.nWorkers, len(blocksToRun))
+    pool = None
+    if nWorkers <= 1 :
+      _initWorker(setup)
+      newResults = (_runBlock(block) for block in blocksToRun)
+    else :
+      print("Running %d pseudoexperiments in %d blocks on %d processes (pid %d)" \
+            % (sum(block[1] for block in blocksToRun), len(blocksToRun), nWorkers, os.getpid()))
+      pool = multiprocessing.Pool(nWorkers, _initWorker, (setup,))
+      # Unordered, so that every block is checkpointed as soon as it is done
+      newResults = pool.imap_unordered(_runBlock, blocksToRun)
+
+    results = []
+    try :
+      for block in blocks :
+        while block not in finished :
+          doneBlock, result = next(newResults)
+          if checkpoint is not None :
+            checkpoint.append(doneBlock, result)
+          finished[doneBlock] = result
+        results.append(finished[block])
+        if self.verbose :
+          print("on PE %d" % (block[0]*self.blockSize + block[1]))
+        if stopCondition is not None and stopCondition(results[-1][0]) :
+          break
+    finally :
+      # Blocks still running after an early stop are not needed
+      if pool is not None :
+        pool.terminate()
+        pool.join()
+
+    nTests = len(theStatTests)
+    statistics = [np.concatenate([result[0][index] for result in results]) for index in range(nTests)]
+    furtherInformation = [np.concatenate([result[1][index] for result in results]) for index in range(nTests)]
+    return statistics, furtherInformation
@@ -0,0 +1,189 @@
+# Batched pseudo-experiments, the python counterpart of
+# MjjPseudoExperimenter::GetPseudoExperimentStatsOnHistogram.
+#
+# Toys are drawn as an (nToys x nBins) Poisson matrix of effective
+# contents and every statistical test scores the whole matrix at
+# once through its doTestBatch, instead of building and testing
+# one histogram per toy. Toys are processed in chunks to bound
+# memory.
+
+import math
+import numpy as np
+
+from hunt.mathfunctions import makeHistoFromStats
+
+
+class StatisticsBundle(object) :
+  '''Equivalent of MjjStatisticsBundle for one statistical test.'''
+
+  def __init__(self, originalStatistic, originalFurtherInformation, \
+               statisticsFromPseudoexperiments, furtherInformationFromPseudoexperiments) :
+    self.originalStatistic = originalStatistic
+    self.originalFurtherInformation = originalFurtherInformation
+    self.statisticsFromPseudoexperiments = statisticsFromPseudoexperiments
+    self.furtherInformationFromPseudoexperiments = furtherInformationFromPseudoexperiments
+    # (counts, binEdges)
+    self.statisticsFromPseudoexperimentsHist = makeHistoFromStats(statisticsFromPseudoexperiments)
+
+
+class RunningPValue(object) :
+  '''getFrequentistPValAndError updated chunk by chunk, without
+  keeping the statistics.'''
+
+  def __init__(self, observedStatistic) :
+    self.observedStatistic = observedStatistic
+    self.successes = 0
+    self.trials = 0
+
+  def update(self, pseudoExpStatistics) :
+    self.successes += int(np.count_nonzero(np.asarray(pseudoExpStatistics) > self.observedStatistic))
+    self.trials += len(pseudoExpStatistics)
+
+  def getPValAndError(self) :
+    if self.trials == 0 : return 0., 0.
+    pVal = float(self.successes)/self.trials
+    return pVal, math.sqrt(pVal*(1. - pVal))/math.sqrt(self.trials)
+
+
+class EarlyStopping(object) :
+  '''When to stop generating toys: once the relative uncertainty on
+  the p-value is below targetRelativeError, or once the p-value is
+  more than nSigma uncertainties above pValueThreshold. Neither is
+  checked before minExperiments toys.'''
+
+  def __init__(self, targetRelativeError=0.05, pValueThreshold=0.1, nSigma=3., minExperiments=500) :
+    self.targetRelativeError = targetRelativeError
+    self.pValueThreshold = pValueThreshold
+    self.nSigma = nSigma
+    self.minExperiments = minExperiments
+
+  def isDone(self, runningPValue) :
+    if runningPValue.trials < self.minExperiments : return False
+    pVal, pValErr = runningPValue.getPValAndError()
+    # No successes yet: the uncertainty is not meaningful
+    if runningPValue.successes == 0 : return False
+    if self.targetRelativeError is not None and pValErr <= self.targetRelativeError*pVal :
+      return True
+    if self.pValueThreshold is not None and pVal - self.nSigma*pValErr > self.pValueThreshold :
+      return True
+    return False
+
+
+class PseudoExperimenter(object) :
+
+  ## ----------------------------------------------------
+  ## Initialisers
+
+  def __init__(self, seed=None) :
+    self.randomState = np.random.RandomState(seed)
+    self.chunkSize = 1000
+    self.verbose = True
+    self.earlyStopping = None
+    self.monitoredTest = None
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  # Number of toys drawn and tested together
+  def setChunkSize(self, chunkSize) :
+    self.chunkSize = max(1, chunkSize)
+
+  def setVerbose(self, verbose) :
+    self.verbose = verbose
+
+  # Stop before nExperiments toys once the p-value of monitoredTest
+  # satisfies earlyStopping (default settings if not given).
+  # A monitoredTest of None switches this off.
+  def setEarlyStopping(self, monitoredTest, earlyStopping=None) :
+    if monitoredTest is None :
+      earlyStopping = None
+    elif earlyStopping is None :
+      earlyStopping = EarlyStopping()
+    self.monitoredTest = monitoredTest
+    self.earlyStopping = earlyStopping
+
+  ## ----------------------------------------------------
+  ## Main function
+
+  def getPseudoExperimentStatsOnHistogram(self, templateHist, observedHist, theStatTests, \
+                                          firstBinToUse=1, lastBinToUse=1000, nExperiments=1000) :
+    '''Test nExperiments toys drawn from the templateHist Spectrum,
+    and the observedHist Spectrum, against templateHist with each
+    test in theStatTests. Returns a StatisticsBundle per test in the
+    same order, or a single one if a single test was passed.'''
+
+    singleTest = not isinstance(theStatTests, (list, tuple))
+    if singleTest :
+      theStatTests = [theStatTests]
+
+    lastBinToUse = min(lastBinToUse, templateHist.getNbins() + 1)
+
+    # Basic statistic between templateHist and observedHist
+    originals = [test.doTestBatch(observedHist.effectiveContent, templateHist, firstBinToUse, lastBinToUse) \
+                 for test in theStatTests]
+
+    stopCondition = None
+    if self.earlyStopping is not None :
+      monitoredIndex = theStatTests.index(self.monitoredTest)
+      runningPValue = RunningPValue(float(originals[monitoredIndex][0][0]))
+      def stopCondition(chunkStatistics) :
+        runningPValue.update(chunkStatistics[monitoredIndex])
+        if not self.earlyStopping.isDone(runningPValue) : return False
+        print("Stopping after %d pseudoexperiments: p-value %g +- %g" \
+              % ((runningPValue.trials,) + runningPValue.getPValAndError()))
+        return True
+
+    statistics, furtherInformation = self.getPseudoExperimentStats(templateHist, theStatTests, \
+                                       firstBinToUse, lastBinToUse, nExperiments, stopCondition)
+
+    resultVector = []
+    for index in range(len(theStatTests)) :
+      resultVector.append(StatisticsBundle(float(originals[index][0][0]), originals[index][1][0].tolist(), \
+                          statistics[index], furtherInformation[index]))
+
+    if singleTest : return resultVector[0]
+    return resultVector
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def getPseudoExperimentStats(self, templateHist, theStatTests, firstBinToUse, lastBinToUse, nExperiments, \
+                               stopCondition=None) :
+    '''Statistics and further information of each test in
+    theStatTests on nExperiments toys drawn from templateHist.
+    Returns two lists with one array per test. stopCondition, if
+    given, is called with the statistics of each new chunk and
+    ends the loop early by returning True.'''
+
+    statistics = [[] for test in theStatTests]
+    furtherInformation = [[] for test in theStatTests]
+    nAccepted = 0
+    while nAccepted < nExperiments :
+      toys = self.getToys(templateHist, min(self.chunkSize, nExperiments - nAccepted))
+      results = [test.doTestBatch(toys, templateHist, firstBinToUse, lastBinToUse) \
+                 for test in theStatTests]
+
+      # Protect against unphysical values: if any test returns nan or inf, drop the toy
+      good = np.ones(len(toys), dtype=bool)
+      for thisStatistics, thisFurtherInformation in results :
+        good &= np.isfinite(thisStatistics)
+      if not good.all() :
+        print("Dropping %d pseudoexperiments with invalid statistics" % (~good).sum())
+
+      for index, (thisStatistics, thisFurtherInformation) in enumerate(results) :
+        statistics[index].append(thisStatistics[good])
+        furtherInformation[index].append(thisFurtherInformation[good])
+      nAccepted += good.sum()
+      if self.verbose :
+        print("on PE %d" % nAccepted)
+      if stopCondition is not None and stopCondition([item[-1] for item in statistics]) :
+        break
+
+    return [np.concatenate(item) for item in statistics], \
+           [np.concatenate(item) for item in furtherInformation]
+
+  def getToys(self, templateHist, nToys) :
+    '''Effective contents of nToys toys, each bin Poisson-fluctuated
+    independently as in MjjHistogram::PoissonFluctuateBinByBin.'''
+    return self.randomState.poisson(templateHist.effectiveContent, \
+                                    size=(nToys, templateHist.getNbins())).astype(float)
@@ -0,0 +1,107 @@
+# Memoized window p-values, the python counterpart of MjjPvalCache.
+#
+# The background template is the same for every pseudo-experiment,
+# so each window always has the same background sum and toys keep
+# asking for the p-value of the same integer count in it. Requests
+# arrive as arrays: repeated (d, b, bErr) keys within an array are
+# computed once, keys seen in earlier arrays are taken from an LRU
+# store, and only the rest go to poissonPval or poissonConvGammaPval.
+
+from collections import OrderedDict
+import numpy as np
+
+from hunt.mathfunctions import poissonPval, poissonConvGammaPval
+
+
+class PvalCache(object) :
+
+  def __init__(self, maxEntries=1000000) :
+    self.maxEntries = maxEntries
+    self.clear()
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  # Zero switches caching off
+  def setMaxEntries(self, maxEntries) :
+    self.maxEntries = maxEntries
+    self.evict()
+
+  def clear(self) :
+    '''Forget all stored p-values and reset the counters.'''
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  ## ----------------------------------------------------
+  ## Getters
+
+  def getHitRate(self) :
+    '''Fraction of look-ups answered without computing.'''
+    total = self.hits + self.misses
+    if total == 0 : return 0.
+    return float(self.hits)/total
+
+  def printStatistics(self) :
+    print("P-value cache: %d entries, %d hits, %d misses, hit rate %g" \
+          % (len(self.entries), self.hits, self.misses, self.getHitRate()))
+
+  def poissonPval(self, d, b) :
+    '''poissonPval(d, b) for arrays, from the cache where possible.'''
+    return self.lookup(d, b, None)
+
+  def poissonConvGammaPval(self, d, b, bErr) :
+    '''poissonConvGammaPval(d, b, bErr) for arrays, from the cache where possible.'''
+    return self.lookup(d, b, bErr)
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def lookup(self, d, b, bErr) :
+    if bErr is None :
+      d, b = np.broadcast_arrays(np.asarray(d, dtype=float), np.asarray(b, dtype=float))
+      calculate = lambda keys : poissonPval(keys[:,0], keys[:,1])
+      keys = np.stack([d.ravel(), b.ravel()], axis=1)
+    else :
+      d, b, bErr = np.broadcast_arrays(np.asarray(d, dtype=float), np.asarray(b, dtype=float), \
+                                       np.asarray(bErr, dtype=float))
+      calculate = lambda keys : poissonConvGammaPval(keys[:,0], keys[:,1], keys[:,2])
+      keys = np.stack([d.ravel(), b.ravel(), bErr.ravel()], axis=1)
+    shape = d.shape
+    if keys.shape[0] == 0 :
+      return np.zeros(shape)
+    if self.maxEntries == 0 :
+      self.misses += keys.shape[0]
+      return calculate(keys).reshape(shape)
+
+    # One row of bytes per key, so that numpy can find the distinct ones
+    keys = np.ascontiguousarray(keys)
+    rowKeys = keys.view(np.dtype((np.void, keys.dtype.itemsize*keys.shape[1]))).ravel()
+    uniqueKeys, firstIndex, inverse = np.unique(rowKeys, return_index=True, return_inverse=True)
+
+    uniqueP = np.empty(len(uniqueKeys))
+    missing = []
+    for index, key in enumerate(uniqueKeys.tolist()) :
+      value = self.entries.pop(key, None)
+      if value is None :
+        missing.append(index)
+      else :
+        # Re-inserted as the most recently used
+        self.entries[key] = value
+        uniqueP[index] = value
+    missing = np.array(missing, dtype=int)
+
+    if len(missing) > 0 :
+      uniqueP[missing] = calculate(keys[firstIndex[missing]])
+      for key, value in zip(uniqueKeys[missing].tolist(), uniqueP[missing].tolist()) :
+        self.entries[key] = value
+      self.evict()
+
+    self.misses += len(missing)
+    self.hits += len(rowKeys) - len(missing)
+    return uniqueP[inverse.ravel()].reshape(shape)
+
+  def evict(self) :
+    '''Drop least recently used entries beyond maxEntries.'''
+    while len(self.entries) > self.maxEntries :
+      self.entries.popitem(last=False)
@@ -0,0 +1,28 @@
+# Matching of the bins of two histograms with (partly) common bin
+# edges, e.g. a signal template in GeV copied into the TeV binning of
+# the data. Edges are matched through a sorted search with a
+# tolerance rather than by float equality, so 1.2*1000 finds 1200.
+
+import numpy as np
+
+
+def getMatchingBins(sourceEdges, targetEdges, tolerance=1e-6) :
+  '''ROOT bin numbers (targetBins, sourceBins) of the bins whose low
+  edges agree to tolerance times the narrowest target bin. Edges are
+  the nBins+1 bin boundaries; under- and overflow are not matched.'''
+  sourceEdges = np.asarray(sourceEdges, dtype=float)
+  targetEdges = np.asarray(targetEdges, dtype=float)
+  if len(sourceEdges) == 0 or len(targetEdges) == 0 :
+    return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+  margin = tolerance*np.min(np.diff(targetEdges)) if len(targetEdges) > 1 else tolerance
+
+  # Nearest source edge of every target edge
+  above = np.clip(np.searchsorted(sourceEdges, targetEdges), 0, len(sourceEdges) - 1)
+  below = np.clip(above - 1, 0, len(sourceEdges) - 1)
+  nearest = np.where(np.abs(sourceEdges[below] - targetEdges) <= np.abs(sourceEdges[above] - targetEdges), \
+                     below, above)
+  matched = np.abs(sourceEdges[nearest] - targetEdges) <= margin
+  # The last boundary is the low edge of no bin
+  matched[-1] = False
+  matched &= nearest < len(sourceEdges) - 1
+  return np.nonzero(matched)[0] + 1, nearest[matched] + 1
@@ -0,0 +1,263 @@
+# Minimal reader of ROOT files in pure python, for the few classes
+# runBumpHunter writes: TH1F/TH1D/TH1I, TVectorT<double> (TVectorD)
+# and TGraph/TGraphErrors. It follows the key list of the top
+# directory and decodes the streamed members needed for plotting,
+# skipping everything else with the byte counts ROOT stores in front
+# of each class. Importing PyROOT is not needed.
+#
+# Only zlib compression is always available; LZ4 and ZSTD need the
+# lz4 and zstandard modules.
+
+import struct
+import zlib
+import numpy as np
+
+kByteCountMask = 0x40000000
+kIsReferenced = 1 << 4
+
+
+class RootFileError(Exception) :
+  pass
+
+
+class Cursor(object) :
+  '''Position in a big-endian buffer, as TBufferFile reads it.'''
+
+  def __init__(self, data, index=0) :
+    self.data = data
+    self.index = index
+
+  def unpack(self, fmt) :
+    size = struct.calcsize(fmt)
+    values = struct.unpack(fmt, self.data[self.index:self.index + size])
+    self.index += size
+    return values if len(values) > 1 else values[0]
+
+  def readString(self) :
+    length = self.unpack(">B")
+    if length == 255 :
+      length = self.unpack(">i")
+    value = self.data[self.index:self.index + length]
+    self.index += length
+    return value.decode("latin-1") if isinstance(value, bytes) and str is not bytes else value
+
+  def readArray(self, dtype, n) :
+    values = np.frombuffer(self.data, dtype=dtype, count=n, offset=self.index).astype(float)
+    self.index += n*np.dtype(dtype).itemsize
+    return values
+
+  def readVersion(self) :
+    '''Class version and end of the class record (None without byte count).'''
+    first = self.unpack(">I")
+    if first & kByteCountMask :
+      end = self.index + (first & ~kByteCountMask)
+      return self.unpack(">h"), end
+    # Older records have the version only
+    self.index -= 4
+    return self.unpack(">h"), None
+
+  def skipRecord(self) :
+    version, end = self.readVersion()
+    if end is None :
+      raise RootFileError("cannot skip a record without byte count")
+    self.index = end
+
+  def readTObject(self) :
+    self.unpack(">h")
+    uniqueID, bits = self.unpack(">II")
+    if bits & kIsReferenced :
+      self.index += 2
+
+  def readTNamed(self) :
+    version, end = self.readVersion()
+    self.readTObject()
+    name = self.readString()
+    title = self.readString()
+    if end is not None : self.index = end
+    return name, title
+
+
+class RootFile(object) :
+
+  def __init__(self, fileName) :
+    self.fileName = fileName
+    with open(fileName, "rb") as inFile :
+      self.data = inFile.read()
+    if self.data[:4] != b"root" :
+      raise RootFileError("%s is not a ROOT file" % fileName)
+    self.keys = self.readKeys()
+
+  ## ----------------------------------------------------
+  ## Getters
+
+  def getKeyNames(self) :
+    return [key["name"] for key in self.keys]
+
+  def getClassName(self, name) :
+    return self.getKey(name)["className"]
+
+  def get(self, name) :
+    '''Contents of object name, highest cycle, as numpy arrays:
+    a dict for histograms and graphs, an array for vectors.'''
+    key = self.getKey(name)
+    className = key["className"]
+    cursor = Cursor(self.readObjectBuffer(key))
+    if className in ("TH1F", "TH1D", "TH1I") :
+      return readTH1(cursor, className)
+    if className in ("TVectorT<double>", "TVectorD") :
+      return readTVectorD(cursor)
+    if className in ("TGraph", "TGraphErrors") :
+      return readTGraph(cursor, className)
+    raise RootFileError("reading %s objects is not supported" % className)
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def getKey(self, name) :
+    matching = [key for key in self.keys if key["name"] == name]
+    if not matching :
+      raise KeyError(name)
+    return max(matching, key=lambda key : key["cycle"])
+
+  def readKeys(self) :
+    header = Cursor(self.data, 4)
+    version, begin = header.unpack(">ii")
+    # Top directory record follows the key and TNamed of the file itself
+    cursor = Cursor(self.data, begin)
+    self.readKeyHeader(cursor)
+    cursor.readString()
+    cursor.readString()
+    directoryVersion = cursor.unpack(">h")
+    cursor.index += 4*4
+    if directoryVersion > 1000 :
+      seekDir, seekParent, seekKeys = cursor.unpack(">qqq")
+    else :
+      seekDir, seekParent, seekKeys = cursor.unpack(">iii")
+
+    cursor = Cursor(self.data, seekKeys)
+    self.readKeyHeader(cursor)
+    nKeys = cursor.unpack(">i")
+    return [self.readKeyHeader(cursor) for index in range(nKeys)]
+
+  def readKeyHeader(self, cursor) :
+    nBytes, version, objLen, datime, keyLen, cycle = cursor.unpack(">ihiIhh")
+    if version > 1000 :
+      seekKey, seekPdir = cursor.unpack(">qq")
+    else :
+      seekKey, seekPdir = cursor.unpack(">ii")
+    className = cursor.readString()
+    name = cursor.readString()
+    title = cursor.readString()
+    return {"nBytes" : nBytes, "objLen" : objLen, "keyLen" : keyLen, "cycle" : cycle, \
+            "seekKey" : seekKey, "className" : className, "name" : name, "title" : title}
+
+  def readObjectBuffer(self, key) :
+    start = key["seekKey"] + key["keyLen"]
+    stored = self.data[start:key["seekKey"] + key["nBytes"]]
+    if key["objLen"] == len(stored) :
+      return stored
+    # Compressed in blocks, each with a 9 byte header
+    pieces = []
+    index = 0
+    while index < len(stored) :
+      algorithm = stored[index:index + 2]
+      sizes = struct.unpack("<6B", stored[index + 3:index + 9])
+      compressedSize = sizes[0] | (sizes[1] << 8) | (sizes[2] << 16)
+      block = stored[index + 9:index + 9 + compressedSize]
+      uncompressedSize = sizes[3] | (sizes[4] << 8) | (sizes[5] << 16)
+      pieces.append(decompressBlock(algorithm, block, uncompressedSize))
+      index += 9 + compressedSize
+    return b"".join(pieces)
+
+
+def decompressBlock(algorithm, block, uncompressedSize) :
+  if algorithm == b"ZL" :
+    return zlib.decompress(block)
+  if algorithm == b"L4" :
+    import lz4.block
+    # 8 byte checksum in front of the LZ4 block
+    return lz4.block.decompress(block[8:], uncompressed_size=uncompressedSize)
+  if algorithm == b"ZS" :
+    import zstandard
+    return zstandard.ZstdDecompressor().decompress(block)
+  raise RootFileError("unsupported compression %r" % algorithm)
+
+
+def readTArray(cursor, dtype) :
+  n = cursor.unpack(">i")
+  return cursor.readArray(dtype, n)
+
+
+def readTAxis(cursor) :
+  version, end = cursor.readVersion()
+  cursor.readTNamed()
+  cursor.skipRecord() # TAttAxis
+  nBins = cursor.unpack(">i")
+  xMin, xMax = cursor.unpack(">dd")
+  xBins = readTArray(cursor, ">f8")
+  cursor.index = end
+  if len(xBins) == 0 :
+    xBins = np.linspace(xMin, xMax, nBins + 1)
+  return xBins
+
+
+def readTH1(cursor, className) :
+  '''Name, title, bin contents and errors (under- and overflow
+  included, so index = ROOT bin number) and bin edges.'''
+  version, end = cursor.readVersion()
+  hVersion, hEnd = cursor.readVersion()
+  name, title = cursor.readTNamed()
+  for attribute in range(3) :
+    cursor.skipRecord() # TAttLine, TAttFill, TAttMarker
+  cursor.unpack(">i") # fNcells
+  binEdges = readTAxis(cursor)
+  cursor.skipRecord() # fYaxis
+  cursor.skipRecord() # fZaxis
+  cursor.index += 2*2
+  entries = cursor.unpack(">d")
+  cursor.index += 7*8
+  readTArray(cursor, ">f8") # fContour
+  sumw2 = readTArray(cursor, ">f8")
+  cursor.index = hEnd
+  dtype = {"TH1F" : ">f4", "TH1D" : ">f8", "TH1I" : ">i4"}[className]
+  content = readTArray(cursor, dtype)
+  if len(sumw2) == len(content) :
+    errors = np.sqrt(sumw2)
+  else :
+    errors = np.sqrt(np.abs(content))
+  return {"name" : name, "title" : title, "content" : content, "errors" : errors, \
+          "binEdges" : binEdges, "entries" : entries}
+
+
+def readTVectorD(cursor) :
+  version, end = cursor.readVersion()
+  cursor.readTObject()
+  nRows, rowLowerBound = cursor.unpack(">ii")
+  # Pointer to array member: one byte flag in front of the elements
+  cursor.index += 1
+  return cursor.readArray(">f8", nRows)
+
+
+def readTGraph(cursor, className) :
+  '''Name, title, x and y of the points, and their errors for
+  TGraphErrors (zeros for TGraph).'''
+  if className == "TGraphErrors" :
+    version, end = cursor.readVersion()
+  gVersion, gEnd = cursor.readVersion()
+  name, title = cursor.readTNamed()
+  for attribute in range(3) :
+    cursor.skipRecord()
+  nPoints = cursor.unpack(">i")
+  cursor.index += 1
+  x = cursor.readArray(">f8", nPoints)
+  cursor.index += 1
+  y = cursor.readArray(">f8", nPoints)
+  cursor.index = gEnd
+  if className == "TGraphErrors" :
+    cursor.index += 1
+    ex = cursor.readArray(">f8", nPoints)
+    cursor.index += 1
+    ey = cursor.readArray(">f8", nPoints)
+  else :
+    ex, ey = np.zeros(nPoints), np.zeros(nPoints)
+  return {"name" : name, "title" : title, "x" : x, "y" : y, "ex" : ex, "ey" : ey}
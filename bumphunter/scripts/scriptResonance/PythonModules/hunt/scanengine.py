@@ -0,0 +1,389 @@
+# BumpHunter window scan on numpy arrays.
+#
+# Implements the same test as MjjBumpHunter (arXiv:1101.0390v2)
+# and gives the same statistic, bump edges and tomography.
+# Instead of re-summing every window bin by bin, cumulative sums
+# of data, background and background error are built once per
+# spectrum, and the window contents for all (binL, width) pairs
+# come from a single pair of lookups into them. The list of
+# windows only depends on the bin range, so it is built once
+# and reused for every spectrum scanned over that range.
+
+import hashlib
+import math
+import numpy as np
+
+from hunt.mathfunctions import poissonPval
+from hunt.pvalcache import PvalCache
+from hunt.windowindex import getWindowIndex
+from hunt.statisticaltest import StatisticalTest, getOutermostBinsWithData, \
+                                 getOutermostBinsWithDataBatch
+
+
+class ScanWindows(object) :
+  '''All windows tested in one bin range, in the order
+  MjjBumpHunter::DoTestCore visits them: by increasing width,
+  then by increasing left edge. Bins are numbered from 1.'''
+
+  def __init__(self, firstBin, lastBin, minWidth, maxWidth, nBinsInShift=1, \
+               useSidebands=False, nBinsInSideband=1) :
+
+    widths = np.arange(minWidth, maxWidth + 1)
+
+    # User's sideband width and shift if reasonable, else width/2 to a minimum of 1
+    if nBinsInSideband >= 1 :
+      sidebandWidths = np.full(widths.shape, nBinsInSideband, dtype=int)
+    else :
+      sidebandWidths = np.maximum(1, widths//2)
+    if nBinsInShift >= 1 :
+      steps = np.full(widths.shape, nBinsInShift, dtype=int)
+    else :
+      steps = np.maximum(1, widths//2)
+
+    if useSidebands :
+      minBinL = firstBin + sidebandWidths
+      maxBinL = lastBin - widths - sidebandWidths + 1
+    else :
+      minBinL = np.full(widths.shape, firstBin, dtype=int)
+      maxBinL = lastBin - widths + 1
+
+    # (width, binL) grid; row-major nonzero keeps the C++ ordering
+    binLs = np.arange(firstBin, lastBin + 1)
+    offsets = binLs[np.newaxis,:] - minBinL[:,np.newaxis]
+    valid = (offsets >= 0) & (binLs[np.newaxis,:] <= maxBinL[:,np.newaxis]) \
+            & (offsets % steps[:,np.newaxis] == 0)
+    widthIndex, binIndex = np.nonzero(valid)
+
+    self.binL = binLs[binIndex]
+    self.width = widths[widthIndex]
+    self.binR = self.binL + self.width - 1
+    self.sidebandWidth = sidebandWidths[widthIndex]
+    self.useSidebands = useSidebands
+
+    # WindowPvalueIndex for each background scanned with these windows
+    self.pvalueIndices = {}
+
+  def __len__(self) :
+    return len(self.binL)
+
+
+def cumulativeSums(content) :
+  '''Cumulative sums with a leading zero along the last axis, so that
+  the sum of bins binL..binR (numbered from 1) is cum[binR]-cum[binL-1].'''
+  content = np.asarray(content, dtype=float)
+  cum = np.zeros(content.shape[:-1] + (content.shape[-1] + 1,))
+  np.cumsum(content, axis=-1, out=cum[...,1:])
+  return cum
+
+
+class BumpHunterScan(StatisticalTest) :
+
+  ## ----------------------------------------------------
+  ## Initialisers
+
+  def __init__(self) :
+    StatisticalTest.__init__(self)
+
+    # Defaults as in MjjBumpHunter
+    self.allowDeficitFlag = False
+    self.useSidebands = False
+    self.minBinsInBump = 1
+    self.maxBinsInBump = 100000
+    self.nBinsInSideband = 1
+    self.nBinsInShift = 1
+    self.errHist = None
+
+    self.mostInterestingP = 1.
+    self.lowEdge = 0.
+    self.highEdge = 0.
+    self.lowEdgesAllBumps = np.zeros(0)
+    self.highEdgesAllBumps = np.zeros(0)
+    self.probAllBumps = np.zeros(0)
+
+    self.windowCache = {}
+    # Window p-values kept across spectra, off by default: it only pays
+    # off when toys often repeat window counts (low-count spectra)
+    self.pvalCache = PvalCache(0)
+    # Tables of window p-values for the fixed background, off by default
+    self.useWindowIndex = False
+    self.windowIndexSigma = 5.
+    self.windowIndexDirectory = None
+    # Largest (spectra x windows) array built at once in doTestBatch
+    self.maxWindowEntries = 4000000
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  # Permit the most significant deviation to be a deficit
+  def allowDeficit(self, doAllow) :
+    self.allowDeficitFlag = doAllow
+
+  def setMaxBumpWidth(self, nbins) :
+    self.maxBinsInBump = nbins
+    self.windowCache = {}
+
+  def setMinBumpWidth(self, nbins) :
+    self.minBinsInBump = max(nbins, 1)
+    self.windowCache = {}
+
+  # Ignore bumps whose sidebands also show a discrepancy
+  def setUseSidebands(self, yesOrNo) :
+    self.useSidebands = yesOrNo
+    self.windowCache = {}
+
+  # Does not activate sidebands by itself
+  def setSidebandWidth(self, nbins) :
+    self.nBinsInSideband = nbins
+    self.windowCache = {}
+
+  def setNBinsInWindowShift(self, nbins) :
+    self.nBinsInShift = nbins
+    self.windowCache = {}
+
+  # Background uncertainty per bin: switches to PoissonConvGammaPval
+  def setUseError(self, errHist) :
+    self.errHist = np.asarray(errHist, dtype=float)
+
+  # Look up window p-values in tables made once per background. Worth it
+  # when many toys are scanned against the same background. Tables are
+  # read from and saved to directory if given.
+  def setUseWindowIndex(self, yesOrNo, nSigma=5., directory=None) :
+    self.useWindowIndex = yesOrNo
+    self.windowIndexSigma = nSigma
+    self.windowIndexDirectory = directory
+
+  # Number of window p-values remembered. Zero switches the cache off.
+  def setPvalCacheSize(self, nEntries) :
+    self.pvalCache.setMaxEntries(nEntries)
+
+  ## ----------------------------------------------------
+  ## Getters
+
+  def getFurtherInformation(self) :
+    '''Low and high edge of the most significant bump.'''
+    return [self.lowEdge, self.highEdge]
+
+  def getConfiguration(self) :
+    '''Settings which change the outcome of the scan. Those of the
+    caches and tables only change its speed.'''
+    configuration = StatisticalTest.getConfiguration(self)
+    configuration.update({"allowDeficit" : self.allowDeficitFlag,
+                          "useSidebands" : self.useSidebands,
+                          "bumpWidths" : (self.minBinsInBump, self.maxBinsInBump),
+                          "sidebandWidth" : self.nBinsInSideband,
+                          "windowShift" : self.nBinsInShift,
+                          "errHist" : None if self.errHist is None else \
+                                      hashlib.md5(np.ascontiguousarray(self.errHist).tobytes()).hexdigest()})
+    return configuration
+
+  def getPvalCache(self) :
+    '''Cache of window p-values, e.g. to check its hit rate.'''
+    return self.pvalCache
+
+  def getBumpHunterTomography(self) :
+    '''Tomography points as arrays of (x, p-value, x half-width),
+    the same points as MjjBumpHunter::GetBumpHunterTomography.'''
+    x = (self.lowEdgesAllBumps + self.highEdgesAllBumps)/2.
+    xErr = (self.highEdgesAllBumps - self.lowEdgesAllBumps)/2.
+    return x, self.probAllBumps.copy(), xErr
+
+  def getWindows(self, firstBin, lastBin) :
+    '''Windows of each region tested between firstBin and lastBin.
+    Cached, since they do not depend on the spectrum.'''
+    key = (firstBin, lastBin, self.excludeWindow, self.firstBinToExclude, self.lastBinToExclude)
+    if key not in self.windowCache :
+      if self.excludeWindow :
+        regions = [(firstBin, self.firstBinToExclude - 1), (self.lastBinToExclude + 1, lastBin)]
+      else :
+        regions = [(firstBin, lastBin)]
+      windowList = []
+      for thisFirstBin, thisLastBin in regions :
+        nBins = thisLastBin - thisFirstBin + 1
+        minWidth = max(self.minBinsInBump, 1)
+        maxWidth = min(self.maxBinsInBump, nBins//2)
+        windowList.append(ScanWindows(thisFirstBin, thisLastBin, minWidth, maxWidth, \
+                          self.nBinsInShift, self.useSidebands, self.nBinsInSideband))
+      self.windowCache[key] = windowList
+    return self.windowCache[key]
+
+  def getBinRange(self, data, firstBinToUse=-1, lastBinToUse=-1) :
+    '''Bins with data, overwritten with the user's choice where reasonable.'''
+    firstBin, lastBin = getOutermostBinsWithData(data)
+    if firstBinToUse > 0 and firstBinToUse > firstBin and firstBinToUse < lastBin :
+      firstBin = firstBinToUse
+    if lastBinToUse > firstBinToUse and lastBinToUse > 0 and lastBinToUse > firstBin \
+       and lastBinToUse < lastBin :
+      lastBin = lastBinToUse
+    return firstBin, lastBin
+
+  ## ----------------------------------------------------
+  ## Main functions
+
+  def doTest(self, data, bkg, binEdges, firstBinToUse=-1, lastBinToUse=-1) :
+    '''BumpHunter statistic -log(p) of the least probable window.
+    data and bkg are effective contents of bins 1..N; binEdges
+    holds the N+1 bin edges.'''
+
+    data = np.asarray(data, dtype=float)
+    bkg = np.asarray(bkg, dtype=float)
+    binEdges = np.asarray(binEdges, dtype=float)
+    assert data.shape == bkg.shape
+
+    firstBin, lastBin = self.getBinRange(data, firstBinToUse, lastBinToUse)
+
+    cumData = cumulativeSums(data)[np.newaxis,:]
+    cumBkg = cumulativeSums(bkg)
+    cumErr = cumulativeSums(self.errHist) if self.errHist is not None else None
+
+    self.mostInterestingP = 1.
+    self.lowEdge = self.highEdge = 0.
+    lowEdges, highEdges, probs = [], [], []
+
+    for windows in self.getWindows(firstBin, lastBin) :
+      prob = self.windowPvalues(windows, cumData, cumBkg, cumErr)[0]
+      tested = np.isfinite(prob)
+      binL, binR, prob = windows.binL[tested], windows.binR[tested], prob[tested]
+      lowEdges.append(binEdges[binL - 1])
+      highEdges.append(binEdges[binR])
+      probs.append(prob)
+
+      # First window with the smallest p-value, as in the C++ loop
+      if prob.size and prob.min() < self.mostInterestingP :
+        best = np.argmin(prob)
+        self.mostInterestingP = float(prob[best])
+        self.lowEdge = float(binEdges[binL[best] - 1])
+        self.highEdge = float(binEdges[binR[best]])
+
+    self.lowEdgesAllBumps = np.concatenate(lowEdges) if lowEdges else np.zeros(0)
+    self.highEdgesAllBumps = np.concatenate(highEdges) if highEdges else np.zeros(0)
+    self.probAllBumps = np.concatenate(probs) if probs else np.zeros(0)
+
+    if self.mostInterestingP == 0 :
+      bump = self.findBumpInCaseOfIncalculable(data, bkg, binEdges, firstBin, lastBin)
+      if bump is not None :
+        self.lowEdge, self.highEdge = bump
+
+    if self.mostInterestingP == 0 : return float('inf')
+    return -math.log(self.mostInterestingP)
+
+  def doTestBatch(self, dataMatrix, template, firstBinToUse=-1, lastBinToUse=-1) :
+    '''doTest for every row of dataMatrix against the same template
+    Spectrum, without storing tomographies. Returns the statistics and
+    an (nRows x 2) array of bump low and high edges.'''
+
+    dataMatrix = np.atleast_2d(np.asarray(dataMatrix, dtype=float))
+    nRows = dataMatrix.shape[0]
+    bkg = template.effectiveContent
+    binEdges = template.binEdges
+
+    cumData = cumulativeSums(dataMatrix)
+    cumBkg = cumulativeSums(bkg)
+    cumErr = cumulativeSums(self.errHist) if self.errHist is not None else None
+
+    mostInterestingP = np.ones(nRows)
+    edges = np.zeros((nRows, 2))
+
+    # Rows scanning the same bin range share their windows
+    firstBins, lastBins = self.getBinRangeBatch(dataMatrix, firstBinToUse, lastBinToUse)
+    ranges = np.stack([firstBins, lastBins], axis=1)
+    for firstBin, lastBin in np.unique(ranges, axis=0) :
+      rows = np.flatnonzero((firstBins == firstBin) & (lastBins == lastBin))
+      for windows in self.getWindows(int(firstBin), int(lastBin)) :
+        if len(windows) == 0 : continue
+        # Bound the size of the (rows x windows) arrays
+        rowsPerChunk = max(1, self.maxWindowEntries//len(windows))
+        for start in range(0, len(rows), rowsPerChunk) :
+          chunk = rows[start:start + rowsPerChunk]
+          prob = self.windowPvalues(windows, cumData[chunk], cumBkg, cumErr)
+          best = np.argmin(prob, axis=1)
+          bestP = prob[np.arange(len(chunk)), best]
+          better = bestP < mostInterestingP[chunk]
+          improved = chunk[better]
+          mostInterestingP[improved] = bestP[better]
+          edges[improved,0] = binEdges[windows.binL[best[better]] - 1]
+          edges[improved,1] = binEdges[windows.binR[best[better]]]
+
+      for row in rows[mostInterestingP[rows] == 0] :
+        bump = self.findBumpInCaseOfIncalculable(dataMatrix[row], bkg, binEdges, int(firstBin), int(lastBin))
+        if bump is not None :
+          edges[row] = bump
+
+    with np.errstate(divide='ignore') :
+      statistics = -np.log(mostInterestingP)
+    return statistics, edges
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def getBinRangeBatch(self, dataMatrix, firstBinToUse=-1, lastBinToUse=-1) :
+    '''getBinRange for each row of a matrix.'''
+    firstWithData, lastWithData = getOutermostBinsWithDataBatch(dataMatrix)
+    firstBins = firstWithData.copy()
+    if firstBinToUse > 0 :
+      useFirst = (firstBinToUse > firstWithData) & (firstBinToUse < lastWithData)
+      firstBins[useFirst] = firstBinToUse
+    lastBins = lastWithData.copy()
+    if lastBinToUse > firstBinToUse and lastBinToUse > 0 :
+      useLast = (lastBinToUse > firstBins) & (lastBinToUse < lastWithData)
+      lastBins[useLast] = lastBinToUse
+    return firstBins, lastBins
+
+  def windowPvalues(self, windows, cumData, cumBkg, cumErr=None) :
+    '''p-value of every window (columns) for every spectrum (rows of
+    cumData). Windows failing the excess or sideband requirements
+    are given an infinite p-value.'''
+
+    binL, binR = windows.binL, windows.binR
+    dC = cumData[:,binR] - cumData[:,binL - 1]
+    bC = np.broadcast_to(cumBkg[binR] - cumBkg[binL - 1], dC.shape)
+
+    # Only keep excesses unless flagged otherwise
+    keep = np.ones(dC.shape, dtype=bool) if self.allowDeficitFlag else dC > bC
+    rows, columns = np.nonzero(keep)
+
+    if cumErr is not None :
+      deltaBC = (cumErr[binR] - cumErr[binL - 1])[columns]
+      probC = self.pvalCache.poissonConvGammaPval(dC[keep], bC[keep], deltaBC)
+      # As in MjjBumpHunter, error mode evaluates the sidebands on the central window
+      probL = probR = probC
+    else :
+      if self.useWindowIndex :
+        probC = self.getWindowIndex(windows, cumBkg).poissonPval(dC[keep], columns)
+      else :
+        probC = self.pvalCache.poissonPval(dC[keep], bC[keep])
+      if windows.useSidebands :
+        thisBinL, thisBinR = binL[columns], binR[columns]
+        binLL = thisBinL - windows.sidebandWidth[columns]
+        binRR = thisBinR + windows.sidebandWidth[columns]
+        probL = self.pvalCache.poissonPval(cumData[rows,thisBinL - 1] - cumData[rows,binLL - 1], \
+                            cumBkg[thisBinL - 1] - cumBkg[binLL - 1])
+        probR = self.pvalCache.poissonPval(cumData[rows,binRR] - cumData[rows,thisBinR], \
+                            cumBkg[binRR] - cumBkg[thisBinR])
+
+    # Ignore cases where a significant discrepancy is observed in sidebands
+    if windows.useSidebands :
+      probC = np.where((probL > 1e-3) & (probR > 1e-3), probC, np.inf)
+
+    prob = np.full(dC.shape, np.inf)
+    prob[rows, columns] = probC
+    return prob
+
+  def getWindowIndex(self, windows, cumBkg) :
+    '''WindowPvalueIndex of these windows for this background.'''
+    key = (hashlib.md5(np.ascontiguousarray(cumBkg).tobytes()).hexdigest(), \
+           self.windowIndexSigma, self.allowDeficitFlag)
+    if key not in windows.pvalueIndices :
+      windows.pvalueIndices[key] = getWindowIndex(windows, cumBkg, self.windowIndexSigma, \
+                                     not self.allowDeficitFlag, self.windowIndexDirectory)
+    return windows.pvalueIndices[key]
+
+  def findBumpInCaseOfIncalculable(self, data, bkg, binEdges, firstBin, lastBin) :
+    '''If single bins have p-value zero and are all adjacent, return
+    the edges of the bump they form. Otherwise None.'''
+    bins = np.arange(firstBin, lastBin + 1)
+    D = data[bins - 1]
+    B = bkg[bins - 1]
+    infBins = bins[(poissonPval(D, B) == 0) & (D > B)]
+    if infBins.size > 0 and np.all(np.diff(infBins) == 1) :
+      return float(binEdges[infBins[0] - 1]), float(binEdges[infBins[-1]])
+    return None
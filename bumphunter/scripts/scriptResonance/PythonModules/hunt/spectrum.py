@@ -0,0 +1,46 @@
+# Python counterpart of MjjHistogram: a spectrum held as numpy
+# arrays, together with its effective (unweighted-equivalent)
+# contents and per-bin weights. Only bins 1..N are stored; the
+# underflow and overflow are dropped.
+
+import numpy as np
+
+from hunt.statisticaltest import getOutermostBinsWithData
+
+
+class Spectrum(object) :
+
+  def __init__(self, content, errors, binEdges, getEffFromErrs=True) :
+
+    self.content = np.asarray(content, dtype=float)
+    self.errors = np.asarray(errors, dtype=float)
+    self.binEdges = np.asarray(binEdges, dtype=float)
+    assert len(self.binEdges) == len(self.content) + 1
+
+    self.firstBinWithData, self.lastBinWithData = getOutermostBinsWithData(self.content)
+    self.storeEffectiveHistAndErrors(getEffFromErrs)
+
+  @classmethod
+  def fromTH1(cls, hist, getEffFromErrs=True) :
+    '''Copy contents, errors and edges out of a PyROOT TH1.'''
+    nBins = hist.GetNbinsX()
+    content = [hist.GetBinContent(bin) for bin in range(1, nBins + 1)]
+    errors = [hist.GetBinError(bin) for bin in range(1, nBins + 1)]
+    binEdges = [hist.GetBinLowEdge(bin) for bin in range(1, nBins + 2)]
+    return cls(content, errors, binEdges, getEffFromErrs)
+
+  def getNbins(self) :
+    return len(self.content)
+
+  def storeEffectiveHistAndErrors(self, getEffFromErrs) :
+    '''Effective contents N_eff = (N/err)^2 and weights N/N_eff,
+    as in MjjHistogram::StoreEffectiveHistAndErrors.'''
+    nonzeroErr = self.errors != 0
+    safeErrors = np.where(nonzeroErr, self.errors, 1.)
+    nEff = np.where(nonzeroErr, (self.content/safeErrors)**2, 0.)
+    wEff = np.where(nEff != 0, self.content/np.where(nEff != 0, nEff, 1.), 1.)
+    # Protect against future floating point errors
+    unweighted = (np.abs(wEff - 1.) < np.finfo(np.float32).eps) | (not getEffFromErrs)
+    self.effectiveContent = np.where(unweighted, self.content, nEff)
+    self.effectiveErrors = np.where(unweighted, self.errors, np.sqrt(nEff))
+    self.weights = np.where(unweighted, 1., wEff)
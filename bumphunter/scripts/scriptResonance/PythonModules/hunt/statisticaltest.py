@@ -0,0 +1,58 @@
+# Base class for the python statistical tests, mirroring
+# MjjStatisticalTest in src/. Spectra are passed as numpy
+# arrays of effective bin contents, one entry per bin with
+# no underflow or overflow. Bin numbers given to or returned
+# by the tests follow the ROOT convention (first bin is 1) so
+# that they can be used interchangeably with runBumpHunter.
+
+import numpy as np
+
+
+class StatisticalTest(object) :
+
+  def __init__(self) :
+    self.excludeWindow = False
+    self.firstBinToExclude = 0
+    self.lastBinToExclude = 0
+
+  def setUseWindowExclusion(self, doExclusion) :
+    self.excludeWindow = doExclusion
+
+  def setWindowToExclude(self, lowBin, highBin) :
+    self.excludeWindow = True
+    self.firstBinToExclude = lowBin
+    self.lastBinToExclude = highBin
+
+  def doTest(self, data, bkg, firstBinToUse=-1, lastBinToUse=-1) :
+    '''Compare data to background. Implemented in daughter classes.'''
+    raise NotImplementedError
+
+  def getFurtherInformation(self) :
+    '''Any other useful information from the latest test.'''
+    return []
+
+  def getConfiguration(self) :
+    '''Settings which change the outcome of the test.'''
+    return {"excludeWindow" : self.excludeWindow,
+            "binsToExclude" : (self.firstBinToExclude, self.lastBinToExclude)}
+
+
+def getOutermostBinsWithData(content) :
+  '''First and last bins with nonzero content, as in
+  MjjHistogram::GetHistOutermostBinsWithData.'''
+  nBins = len(content)
+  filled = np.flatnonzero(np.asarray(content)) + 1
+  if filled.size == 0 :
+    print("No data in histogram! Resetting limits to first and last bin.")
+    return 1, nBins
+  return int(filled[0]), int(filled[-1])
+
+
+def getOutermostBinsWithDataBatch(dataMatrix) :
+  '''getOutermostBinsWithData for each row of a matrix.'''
+  nBins = dataMatrix.shape[1]
+  filled = dataMatrix != 0
+  anyFilled = filled.any(axis=1)
+  firstBins = np.where(anyFilled, np.argmax(filled, axis=1) + 1, 1)
+  lastBins = np.where(anyFilled, nBins - np.argmax(filled[:,::-1], axis=1), nBins)
+  return firstBins, lastBins
@@ -0,0 +1,116 @@
+# Precomputed window p-values for a fixed background.
+#
+# In every pseudo-experiment the background is the same, so each
+# window (binL, width) always has the same background sum b, and a
+# toy only changes the integer count d observed in it. For each
+# window this index stores b and poissonPval(d, b) for the counts
+# within nSigma standard deviations of b (only d > b if deficits are
+# ignored), so that scanning a toy becomes window sums plus table
+# lookups. Counts outside a table, or non-integer counts, are
+# calculated directly. Values come from poissonPval itself, so
+# results are identical with or without the index.
+#
+# Indices can be written to .npz files named after a hash of the
+# background and the windows, and read back by later runs on the
+# same background.
+
+import hashlib
+import os
+import numpy as np
+
+from hunt.mathfunctions import poissonPval
+
+
+def getIndexKey(cumBkg, windows, nSigma, excessesOnly) :
+  '''Hash identifying the index for this background and these windows.'''
+  key = hashlib.md5()
+  for array in (cumBkg, windows.binL, windows.binR) :
+    key.update(np.ascontiguousarray(array).tobytes())
+  key.update(("%g %d" % (nSigma, excessesOnly)).encode())
+  return key.hexdigest()
+
+
+class WindowPvalueIndex(object) :
+
+  def __init__(self, binL, binR, bkgSum, lowCount, offsets, table, key="") :
+    self.binL = binL
+    self.binR = binR
+    self.bkgSum = bkgSum
+    # Table of window i covers counts lowCount[i] .. lowCount[i]+length-1,
+    # stored in table[offsets[i]:offsets[i+1]]
+    self.lowCount = lowCount
+    self.offsets = offsets
+    self.table = table
+    self.key = key
+
+  @classmethod
+  def build(cls, windows, cumBkg, nSigma=5., excessesOnly=True, maxTableEntries=50000000) :
+    '''Tables for the windows of a ScanWindows on the background with
+    cumulative sums cumBkg. Windows which would take the total size
+    past maxTableEntries get empty tables.'''
+    binL, binR = windows.binL, windows.binR
+    bkgSum = cumBkg[binR] - cumBkg[binL - 1]
+    spread = nSigma*np.sqrt(bkgSum + 1.)
+    if excessesOnly :
+      lowCount = np.floor(bkgSum) + 1.
+    else :
+      lowCount = np.maximum(0., np.floor(bkgSum - spread))
+    highCount = np.ceil(bkgSum + spread)
+    lengths = (highCount - lowCount + 1).astype(np.int64)
+    overBudget = np.cumsum(lengths) > maxTableEntries
+    if overBudget.any() :
+      print("Window index limited to %d entries: %d of %d windows without table" \
+            % (maxTableEntries, overBudget.sum(), len(lengths)))
+    lengths[overBudget] = 0
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    window = np.repeat(np.arange(len(lengths)), lengths)
+    counts = lowCount[window] + (np.arange(offsets[-1]) - offsets[window])
+    table = poissonPval(counts, bkgSum[window])
+    return cls(binL, binR, bkgSum, lowCount, offsets, table, \
+               getIndexKey(cumBkg, windows, nSigma, excessesOnly))
+
+  @classmethod
+  def load(cls, fileName) :
+    stored = np.load(fileName)
+    return cls(stored["binL"], stored["binR"], stored["bkgSum"], stored["lowCount"], \
+               stored["offsets"], stored["table"], str(stored["key"]))
+
+  def save(self, fileName) :
+    # Written under a temporary name, so a killed job leaves no partial index
+    temporaryName = fileName + ".tmp.npz"
+    np.savez(temporaryName, binL=self.binL, binR=self.binR, bkgSum=self.bkgSum, \
+             lowCount=self.lowCount, offsets=self.offsets, table=self.table, key=self.key)
+    os.rename(temporaryName, fileName)
+
+  def poissonPval(self, d, columns) :
+    '''poissonPval(d, b) of the windows given by columns, for observed
+    window counts d.'''
+    d = np.asarray(d, dtype=float)
+    position = d - self.lowCount[columns]
+    lengths = self.offsets[columns + 1] - self.offsets[columns]
+    found = (position >= 0) & (position < lengths) & (position == np.floor(position))
+    answer = np.empty(d.shape)
+    answer[found] = self.table[self.offsets[columns[found]] + position[found].astype(np.int64)]
+    notFound = ~found
+    if notFound.any() :
+      answer[notFound] = poissonPval(d[notFound], self.bkgSum[columns[notFound]])
+    return answer
+
+
+def getWindowIndex(windows, cumBkg, nSigma=5., excessesOnly=True, directory=None) :
+  '''The index for windows on this background: read from directory if
+  it was saved there before, else built (and saved if directory is set).'''
+  key = getIndexKey(cumBkg, windows, nSigma, excessesOnly)
+  fileName = os.path.join(directory, "windowindex_%s.npz" % key) if directory else None
+  if fileName and os.path.exists(fileName) :
+    index = WindowPvalueIndex.load(fileName)
+    if index.key == key :
+      return index
+  index = WindowPvalueIndex.build(windows, cumBkg, nSigma, excessesOnly)
+  if fileName :
+    if not os.path.exists(directory) :
+      os.makedirs(directory)
+    index.save(fileName)
+  return index
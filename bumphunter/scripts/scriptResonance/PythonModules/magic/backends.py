@@ -0,0 +1,466 @@
+# Batch systems Juggernaut can submit to, monitor and download from.
+#
+# A backend submits commands as jobs and describes each job with a job
+# info object with the attributes Juggernaut and GridJob read from the
+# pbook job database: JobID, inDS, outDS, site, jobStatus, dbStatus,
+# buildStatus and retryID. Job statuses follow PanDA's; a job is over
+# once its dbStatus is 'frozen'. Output datasets (outDS) are fetched by
+# running the shell command of getDownloadCommand in the output
+# directory, and checked against listExpectedFiles and, where the
+# backend knows them, listExpectedChecksums.
+#
+#   PandaBackend     PanDA through pbook, outputs through dq2
+#   LocalBackend     commands run on this machine, a few at a time
+#   FakeGridBackend  simulated grid with configurable latencies and
+#                    failure rates, for running Juggernaut off-grid
+
+
+import os
+import sys
+import time
+import random
+import signal
+import zlib
+import subprocess
+import multiprocessing
+from os import environ, path
+
+
+class JobInfo(object) :
+  '''Job as described by the pbook job database.'''
+
+  def __init__(self, JobID, outDS="", inDS="", site="") :
+    self.JobID = JobID
+    self.outDS = outDS
+    self.inDS = inDS
+    self.site = site
+    self.jobStatus = 'defined'
+    self.dbStatus = ''
+    self.buildStatus = 'finished'
+    self.retryID = 0
+
+  def freeze(self, jobStatus) :
+    self.jobStatus = jobStatus
+    self.dbStatus = 'frozen'
+
+
+class JobBackend(object) :
+  '''Interface of the batch systems. Job IDs are strings.'''
+
+  ## ----------------------------------------------------
+  ## Jobs
+
+  def submit(self, command) :
+    '''Submit command. Returns the IDs of the jobs made.'''
+    raise NotImplementedError
+
+  def sync(self) :
+    '''Bring the job infos up to date.'''
+    pass
+
+  def getJobInfo(self, jobID) :
+    '''Job info of jobID, None if there is no such job.'''
+    raise NotImplementedError
+
+  def getJobInfos(self, jobIDs) :
+    '''Job infos of the jobs of jobIDs which exist, by job ID.'''
+    jobInfos = {}
+    for jobID in jobIDs :
+      jobInfo = self.getJobInfo(jobID)
+      if jobInfo != None :
+        jobInfos[jobID] = jobInfo
+    return jobInfos
+
+  def getRunningJobIDs(self) :
+    '''IDs of all jobs which are not over.'''
+    raise NotImplementedError
+
+  def kill(self, jobID) :
+    raise NotImplementedError
+
+  def retry(self, jobID, newSite=False) :
+    '''Resubmit jobID. Returns the ID of the new job.'''
+    raise NotImplementedError
+
+  ## ----------------------------------------------------
+  ## Outputs
+
+  def getDownloadCommand(self, outDS, files=None) :
+    '''Shell command downloading outDS to the current directory, or
+    only the [dataset, file name] pairs of files if given.'''
+    raise NotImplementedError
+
+  def listExpectedFiles(self, outDS) :
+    '''Size of every ROOT file outDS should hold, by file name, by
+    dataset of outDS.'''
+    raise NotImplementedError
+
+  def listExpectedChecksums(self, outDS) :
+    '''Checksum ('ad:' adler32 or 'md5:' and the hex digest) of the
+    files of listExpectedFiles, where known.'''
+    return {}
+
+
+class PandaBackend(JobBackend) :
+
+  def __init__(self, dq2SetupScript) :
+    # Python 2 grid tools, only available with the ATLAS setup
+    from pandatools import PdbUtils
+    from dq2.clientapi.DQ2 import DQ2
+    from gridobjects import GridJobset
+    self.PdbUtils = PdbUtils
+    self.GridJobset = GridJobset
+    self.dq2SetupScript = dq2SetupScript
+    self.createPbook()
+    self.createPdbUtils()
+    self.dq2Client = DQ2()
+    # The contents of closed datasets do not change: the catalog is
+    # asked about each container and dataset once.
+    self.containerDatasets = {}
+    self.datasetFiles = {}
+
+  def createPbook(self) :
+    enforceEnter = False
+    verbose   = False
+    restoreDB = False
+    # Import pbook
+    namespace = {"__name__" : "pbook"}
+    execfile(path.join(environ["ATLAS_LOCAL_ROOT_BASE"], "x86_64/PandaClient/current/bin/pbook"), namespace)
+    self.pbookCore = namespace["PBookCore"](enforceEnter, verbose, restoreDB)
+
+  def createPdbUtils(self) :
+    verbose = False
+    self.PdbUtils.initialzieDB(verbose)
+
+  ## ----------------------------------------------------
+  ## Jobs
+
+  def submit(self, command) :
+    newjobset = self.GridJobset(command)
+    newjobset.submit()
+    return ['%d' % jobID for jobID in newjobset.JobIDs]
+
+  def sync(self) :
+    self.pbookCore.sync()
+
+  def getJobInfo(self, jobID) :
+    return self.PdbUtils.readJobDB(jobID,False)
+
+  def getJobInfos(self, jobIDs) :
+    # One read of the local job database where pandatools can
+    if not hasattr(self.PdbUtils, "bulkReadJobDB") :
+      return JobBackend.getJobInfos(self, jobIDs)
+    jobInfos = {}
+    for jobInfo in self.PdbUtils.bulkReadJobDB(False) :
+      jobID = str(jobInfo.JobID)
+      if jobID in jobIDs :
+        jobInfos[jobID] = jobInfo
+    return jobInfos
+
+  def getRunningJobIDs(self) :
+    # Param 'True' means only jobs not 'frozen' are kept
+    return [str(jobID) for jobID in self.PdbUtils.getListOfJobIDs(True,False)]
+
+  def kill(self, jobID) :
+    self.pbookCore.kill(jobID)
+
+  def retry(self, jobID, newSite=False) :
+    # Determine whether we need to redo build
+    jobInfo = self.PdbUtils.readJobDB(jobID,False)
+    if jobInfo.buildStatus in ['','finished'] :
+      print "Build OK."
+      self.pbookCore.retry(jobID,newSite=newSite)
+    else :
+      print "Retrying build."
+      self.pbookCore.retry(jobID,retryBuild=True,newSite=newSite)
+    # Retrieve ID of new job
+    jobInfo = self.PdbUtils.readJobDB(jobID,False)
+    newJobID = jobInfo.retryID
+    if newJobID == 0 :
+      newJobID = jobID
+    return str(newJobID)
+
+  ## ----------------------------------------------------
+  ## Outputs
+
+  def getDownloadCommand(self, outDS, files=None) :
+    command = '. '+self.dq2SetupScript+'; '
+    if files == None :
+      return command+'dq2-get '+outDS
+    # Files of each dataset in one dq2-get; whole datasets without
+    # listing their files, which would make too long a command
+    fileNames = {}
+    for dataset, fileName in files :
+      fileNames.setdefault(dataset, []).append(fileName)
+    expectedFiles = self.listExpectedFiles(outDS)
+    commands = []
+    for dataset in sorted(fileNames.keys()) :
+      if sorted(fileNames[dataset]) == sorted(expectedFiles.get(dataset, {}).keys()) :
+        commands.append('dq2-get '+dataset)
+      else :
+        commands.append('dq2-get -f '+','.join(fileNames[dataset])+' '+dataset)
+    return command+'; '.join(commands)
+
+  def listExpectedFiles(self, outDS) :
+    theoreticalFiles = {}
+    for dataset, rootFiles in self.getRootFileData(outDS).items() :
+      theoreticalFiles[dataset] = dict([(filename, filedata['filesize']) \
+                                        for filename, filedata in rootFiles.items()])
+    return theoreticalFiles
+
+  def listExpectedChecksums(self, outDS) :
+    checksums = {}
+    for dataset, rootFiles in self.getRootFileData(outDS).items() :
+      checksums[dataset] = dict([(filename, filedata['checksum']) \
+                                 for filename, filedata in rootFiles.items() if filedata.get('checksum')])
+    return checksums
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def getRootFileData(self, outDS) :
+    '''dq2 file data of each ROOT file, by file name, by dataset.'''
+    if outDS not in self.containerDatasets :
+      self.containerDatasets[outDS] = self.dq2Client.listDatasetsInContainer(outDS)
+    rootFileData = {}
+    for dataset in self.containerDatasets[outDS] :
+      if dataset not in self.datasetFiles :
+        dictofoutfiles = {}
+        for item in self.dq2Client.listFilesInDataset(dataset) : # (content, timestamp)
+          if isinstance(item, dict) :
+            dictofoutfiles = item
+        rootFiles = {}
+        for handle in dictofoutfiles.keys() :
+          filedata = dictofoutfiles[handle]
+          if "root" in filedata['lfn'] :
+            rootFiles[filedata['lfn']] = filedata
+        self.datasetFiles[dataset] = rootFiles
+      rootFileData[dataset] = self.datasetFiles[dataset]
+    return rootFileData
+
+
+class LocalBackend(JobBackend) :
+  '''Runs each command as a job on this machine, nSlots at a time.
+  Jobs write their outputs themselves, so they have no outDS.'''
+
+  def __init__(self, nSlots=None, logdir="localJobLogs") :
+    if nSlots == None :
+      nSlots = multiprocessing.cpu_count()
+    self.nSlots = nSlots
+    self.logdir = logdir
+    self.jobs = {}
+    self.commands = {}
+    self.processes = {}
+    # Jobs waiting for a slot, in order of submission
+    self.queue = []
+    self.nextJobID = 1
+
+  ## ----------------------------------------------------
+  ## Jobs
+
+  def submit(self, command) :
+    jobID = str(self.nextJobID)
+    self.nextJobID += 1
+    jobInfo = JobInfo(jobID, site="local")
+    # Waiting for a slot, which does not make a job stuck
+    jobInfo.jobStatus = 'sent'
+    self.jobs[jobID] = jobInfo
+    self.commands[jobID] = command
+    self.queue.append(jobID)
+    self.sync()
+    return [jobID]
+
+  def sync(self) :
+    for jobID, process in self.processes.items() :
+      returnCode = process.poll()
+      if returnCode != None :
+        del self.processes[jobID]
+        self.jobs[jobID].freeze('finished' if returnCode == 0 else 'failed')
+    while self.queue and len(self.processes) < self.nSlots :
+      self.start(self.queue.pop(0))
+
+  def getJobInfo(self, jobID) :
+    return self.jobs.get(str(jobID))
+
+  def getRunningJobIDs(self) :
+    return [jobID for jobID in sorted(self.jobs.keys()) if self.jobs[jobID].dbStatus != 'frozen']
+
+  def kill(self, jobID) :
+    jobID = str(jobID)
+    if jobID in self.processes :
+      try :
+        os.killpg(self.processes[jobID].pid, signal.SIGTERM)
+      except OSError :
+        pass
+      self.processes[jobID].wait()
+      del self.processes[jobID]
+    if jobID in self.queue :
+      self.queue.remove(jobID)
+    self.jobs[jobID].freeze('failed')
+
+  def retry(self, jobID, newSite=False) :
+    newJobID = self.submit(self.commands[str(jobID)])[0]
+    self.jobs[str(jobID)].retryID = newJobID
+    return newJobID
+
+  ## ----------------------------------------------------
+  ## Outputs
+
+  def getDownloadCommand(self, outDS, files=None) :
+    return 'true'
+
+  def listExpectedFiles(self, outDS) :
+    return {}
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def start(self, jobID) :
+    if not os.path.isdir(self.logdir) :
+      os.makedirs(self.logdir)
+    log = open(os.path.join(self.logdir, "job_%s.log" % jobID), "w")
+    # Own process group, so that kill stops all of the command
+    self.processes[jobID] = subprocess.Popen(self.commands[jobID], shell=True, \
+        stdout=log, stderr=subprocess.STDOUT, preexec_fn=os.setsid)
+    log.close()
+    self.jobs[jobID].jobStatus = 'running'
+
+
+class FakeGridBackend(JobBackend) :
+  '''Simulated grid: jobs wait queueTime and run for runTime seconds,
+  each drawn uniformly from a (low, high) range, then finish, or fail
+  with probability failureRate. With probability stuckRate a job never
+  leaves the queue. Every job has an output container of one dataset
+  of nFiles files, each of which downloads in downloadTime. A download
+  fails part way with probability downloadFailureRate, and leaves each
+  file of the wrong size or with the wrong contents with probability
+  corruptionRate.'''
+
+  def __init__(self, nJobsPerCommand=1, queueTime=(1,10), runTime=(10,60), \
+               failureRate=0.1, stuckRate=0., downloadTime=(0.2,1), \
+               downloadFailureRate=0.1, corruptionRate=0.05, \
+               nFiles=3, fileSize=1000, seed=None) :
+    self.nJobsPerCommand = nJobsPerCommand
+    self.queueTime = queueTime
+    self.runTime = runTime
+    self.failureRate = failureRate
+    self.stuckRate = stuckRate
+    self.downloadTime = downloadTime
+    self.downloadFailureRate = downloadFailureRate
+    self.corruptionRate = corruptionRate
+    self.nFiles = nFiles
+    self.fileSize = fileSize
+    self.random = random.Random(seed)
+    self.jobs = {}
+    self.commands = {}
+    # When each job starts running and ends, and how
+    self.timeline = {}
+    self.nextJobID = 1
+
+  ## ----------------------------------------------------
+  ## Jobs
+
+  def submit(self, command) :
+    jobIDs = []
+    for job in range(self.nJobsPerCommand) :
+      jobIDs.append(self.makeJob(command))
+    return jobIDs
+
+  def sync(self) :
+    now = time.time()
+    for jobID, jobInfo in self.jobs.items() :
+      if jobInfo.dbStatus == 'frozen' :
+        continue
+      startTime, endTime, endStatus = self.timeline[jobID]
+      if now >= endTime :
+        jobInfo.freeze(endStatus)
+      elif now >= startTime :
+        jobInfo.jobStatus = 'running'
+
+  def getJobInfo(self, jobID) :
+    return self.jobs.get(str(jobID))
+
+  def getRunningJobIDs(self) :
+    return [jobID for jobID in sorted(self.jobs.keys()) if self.jobs[jobID].dbStatus != 'frozen']
+
+  def kill(self, jobID) :
+    jobInfo = self.jobs[str(jobID)]
+    if jobInfo.dbStatus != 'frozen' :
+      jobInfo.freeze('failed')
+
+  def retry(self, jobID, newSite=False) :
+    newJobID = self.makeJob(self.commands[str(jobID)])
+    self.jobs[str(jobID)].retryID = newJobID
+    return newJobID
+
+  ## ----------------------------------------------------
+  ## Outputs
+
+  def getDownloadCommand(self, outDS, files=None) :
+    expectedFiles = self.listExpectedFiles(outDS)
+    if files == None :
+      files = [[dataset, fileName] for dataset in sorted(expectedFiles.keys()) \
+               for fileName in sorted(expectedFiles[dataset].keys())]
+    commands = ['mkdir -p %s' % dataset for dataset in sorted(expectedFiles.keys())]
+    failAfter = len(files)
+    if files and self.random.random() < self.downloadFailureRate :
+      failAfter = self.random.randrange(len(files))
+    # Files written right go in shell loops over their numbers, which
+    # keeps the command short for datasets of thousands of files
+    seconds = self.random.uniform(*self.downloadTime)
+    numbers = []
+    for index, (dataset, fileName) in enumerate(files) :
+      if index == failAfter :
+        commands += self.loopOverFiles(outDS, dataset, numbers, seconds)
+        commands.append('echo "Download failed"; exit 1')
+        return '; '.join(commands)
+      if self.random.random() < self.corruptionRate :
+        commands += self.loopOverFiles(outDS, dataset, numbers, seconds)
+        numbers = []
+        size = expectedFiles[dataset][fileName]
+        source = '/dev/zero'
+        if self.random.random() < 0.5 :
+          size -= 1
+        else :
+          source = '/dev/urandom'
+        commands.append('sleep %.3f; head -c %d %s > %s' % (seconds, size, source, path.join(dataset, fileName)))
+      else :
+        numbers.append(fileName.split('.')[-3])
+    commands += self.loopOverFiles(outDS, dataset, numbers, seconds)
+    return '; '.join(commands)
+
+  def listExpectedFiles(self, outDS) :
+    dataset = outDS.rstrip('/') + '_sub0'
+    files = {}
+    for index in range(self.nFiles) :
+      files['%s.%05d.hist-output.root' % (outDS.rstrip('/'), index + 1)] = self.fileSize
+    return {dataset : files}
+
+  def listExpectedChecksums(self, outDS) :
+    # Files are all zeros
+    checksum = 'ad:%08x' % (zlib.adler32('\0' * self.fileSize) & 0xffffffff)
+    return dict([(dataset, dict.fromkeys(files.keys(), checksum)) \
+                 for dataset, files in self.listExpectedFiles(outDS).items()])
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def loopOverFiles(self, outDS, dataset, numbers, seconds) :
+    if not numbers :
+      return []
+    return ['for number in %s; do sleep %.3f; head -c %d /dev/zero > %s/%s.$number.hist-output.root; done' \
+            % (' '.join(numbers), seconds, self.fileSize, dataset, outDS.rstrip('/'))]
+
+  def makeJob(self, command) :
+    jobID = str(self.nextJobID)
+    self.nextJobID += 1
+    self.jobs[jobID] = JobInfo(jobID, outDS="user.fake.%s/" % jobID, site="FAKE_SITE")
+    self.commands[jobID] = command
+    startTime = time.time() + self.random.uniform(*self.queueTime)
+    if self.random.random() < self.stuckRate :
+      startTime = endTime = float('inf')
+    else :
+      endTime = startTime + self.random.uniform(*self.runTime)
+    endStatus = 'failed' if self.random.random() < self.failureRate else 'finished'
+    self.timeline[jobID] = (startTime, endTime, endStatus)
+    return jobID
@@ -0,0 +1,109 @@
+# Decides which finished jobs Juggernaut downloads the output of, and
+# how many at once.
+#
+# Jobs wait in a priority queue: those which needed the most retries
+# first, as they have waited longest, then those with the smallest
+# outputs. The number of streams starts at half the maximum and, if
+# adaptive, is tuned to the observed throughput: after every round of
+# as many downloads as there are streams, the bytes downloaded per
+# second are compared with the previous round's. Streams are added
+# (or removed) one at a time while that helps, and the direction turns
+# when the throughput drops.
+
+
+import heapq
+import time
+
+
+class DownloadScheduler(object) :
+
+  ## ----------------------------------------------------
+  ## Initialisers
+
+  def __init__(self, maxStreams, adaptive=True) :
+    self.maxStreams = maxStreams
+    self.adaptive = adaptive
+    self.nStreams = self.getStartingStreams()
+    self.nInProgress = 0
+    # Entries are (priority, order of arrival, jobID)
+    self.heldJobs = []
+    self.heldJobIDs = set()
+    self.nArrived = 0
+    # Throughput of the current and the previous round
+    self.step = 1
+    self.lastRate = None
+    self.roundStart = None
+    self.roundBytes = 0
+    self.roundDownloads = 0
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  def setMaxStreams(self, maxStreams) :
+    self.maxStreams = maxStreams
+    self.nStreams = self.getStartingStreams()
+
+  def setAdaptive(self, adaptive) :
+    self.adaptive = adaptive
+    self.nStreams = self.getStartingStreams()
+
+  ## ----------------------------------------------------
+  ## Main functions
+
+  def hold(self, jobID, priority) :
+    '''Queue jobID for download. Lower priorities go first.'''
+    if jobID in self.heldJobIDs :
+      return
+    heapq.heappush(self.heldJobs, (priority, self.nArrived, jobID))
+    self.heldJobIDs.add(jobID)
+    self.nArrived += 1
+
+  def nextToStart(self) :
+    '''jobID of the next download to start, if a stream is free.'''
+    if self.nInProgress >= self.nStreams or not self.heldJobs :
+      return None
+    priority, order, jobID = heapq.heappop(self.heldJobs)
+    self.heldJobIDs.discard(jobID)
+    self.nInProgress += 1
+    if self.roundStart == None :
+      self.roundStart = time.time()
+    return jobID
+
+  def finished(self, nBytes) :
+    '''A download ended, with nBytes downloaded.'''
+    self.nInProgress -= 1
+    self.roundBytes += nBytes
+    self.roundDownloads += 1
+    if self.roundDownloads >= self.nStreams :
+      self.endRound()
+
+  ## ----------------------------------------------------
+  ## Getters
+
+  def isHeld(self, jobID) :
+    return jobID in self.heldJobIDs
+
+  def getNStreams(self) :
+    return self.nStreams
+
+  ## ----------------------------------------------------
+  ## Constituent functions
+
+  def getStartingStreams(self) :
+    if not self.adaptive :
+      return self.maxStreams
+    return max(1, (self.maxStreams + 1) / 2)
+
+  def endRound(self) :
+    seconds = time.time() - self.roundStart
+    rate = self.roundBytes / max(seconds, 1e-3)
+    if self.adaptive :
+      # Turn around if the last change made things worse
+      if self.lastRate != None and rate < 0.9 * self.lastRate :
+        self.step = -self.step
+      self.lastRate = rate
+      self.nStreams = min(self.maxStreams, max(1, self.nStreams + self.step))
+      print "Downloaded %.3g MB/s; using %d dq2 streams." % (rate / 1e6, self.nStreams)
+    self.roundStart = time.time() if self.nInProgress > 0 else None
+    self.roundBytes = 0
+    self.roundDownloads = 0
@@ -12,7 +12,10 @@ import subprocess
 import time
 import os
 import signal
-from dq2.clientapi.DQ2 import DQ2
+import threading
+import zlib
+import hashlib
+from multiprocessing.pool import ThreadPool
 from os import environ, path
 
 class GridJobset(object) :
@@ -51,7 +54,7 @@ class GridJob(object) :
   ## ----------------------------------------------------
   ## Initialisers
 
-  def __init__(self, jobinfo, outputdir, dq2SetupScript, downloadTimeout, downloadLimit) :
+  def __init__(self, jobinfo, outputdir, backend, downloadTimeout, downloadLimit, checksumThreads=0) :
 
     # jobinfo object has attributes:
     # ['id','JobID','PandaID','jobStatus','site','cloud','jobType',
@@ -65,7 +68,8 @@ class GridJob(object) :
     self.site = jobinfo.site
 
     self.outputdir = outputdir
-    self.dq2SetupScript = dq2SetupScript
+    # JobBackend of the job, which knows how to fetch its output
+    self.backend = backend
     self.dq2process = None
     self.dq2processStart = 0
     self.status = ['None']
@@ -79,18 +83,30 @@ class GridJob(object) :
     self.isCurrentlyDownloading = False
     self.isDownloadFinished = False
     self.isDownloadFailed = False
+    self.missingFiles = []
     self.corruptedFiles = []
-
-    self.createDQ2Client()
-
-  def createDQ2Client(self) :
-    self.dq2Client = DQ2()
+    # Bytes fetched by downloadOutput
+    self.downloadedBytes = 0
+
+    # What the output should look like, asked of the backend once
+    self.expectedFiles = None
+    self.expectedChecksums = None
+    # Threads verifying checksums; 0 checks file sizes only
+    self.checksumThreads = checksumThreads
+    # (size, modification time) of each file found complete, by path,
+    # and (modification time, time listed, file names) of each dataset
+    # directory
+    self.verifiedFiles = {}
+    self.datasetListings = {}
+    # JobStore the download progress is recorded in, if any
+    self.stateStore = None
 
   ## ----------------------------------------------------
   ## Constituent functions
 
-  def retrieveOutput(self) :
-    '''Retrieves finished job via dq2-get. Starts a subprocess.'''
+  def retrieveOutput(self, files=None) :
+    '''Retrieves finished job via dq2-get, only the [dataset, file]
+    pairs of files if given. Starts a subprocess.'''
 
     # If already tried the maximum number of times, don't do this again.
     if self.dq2AttemptCount >= self.dq2RetryLimit :
@@ -106,8 +122,7 @@ class GridJob(object) :
       os.makedirs(self.outputdir)
 
     # Format dq2 command.
-    command = '. '+self.dq2SetupScript+'; '
-    command += 'dq2-get '+self.outDS
+    command = self.backend.getDownloadCommand(self.outDS, files)
     print "Executing",command
 
     # This formatting stolen from Tom.
@@ -117,119 +132,196 @@ class GridJob(object) :
     self.dq2process = process
     self.dq2processStart = time.time()
 
+  def downloadOutput(self) :
+    '''Download and validate the output, retrying until it is complete
+    or the retry limit is reached. Each attempt fetches only the files
+    still missing or corrupted. Blocks until then: meant to run in a
+    thread of its own.'''
+    isValid = self.validateOutput()
+    bytesBefore = self.getBytesPresent()
+    while not isValid :
+      self.cleanAndRestart()
+      if self.isDownloadFailed :
+        break
+      if not self.waitForDQ2() :
+        print "Killed download attempt."
+      isValid = self.validateOutput()
+      self.saveDownloadProgress()
+    self.downloadedBytes = self.getBytesPresent() - bytesBefore
+    self.saveDownloadProgress()
+    self.isDownloadFinished = True
+    self.isCurrentlyDownloading = False
+
   def validateOutput(self) :
-    '''Make sure all information is in finished job.'''
+    '''Make sure all information is in finished job. Lists all
+    missing and corrupted files in one pass. Files already found
+    complete are not looked at again while their directory is
+    unchanged.'''
 
     # Clear every time we re-validate.
+    self.missingFiles = []
     self.corruptedFiles = []
 
-    # We can find out from dq2 what the output is supposed to look like.
-    theoreticalFiles = {}
-    datasets = self.dq2Client.listDatasetsInContainer(self.outDS)
-    for dataset in datasets :
-      dictofoutfiles = {}
-      rootFiles = {}
-      for item in self.dq2Client.listFilesInDataset(dataset) : # (content, timestamp)
-        if isinstance(item, dict) :
-          dictofoutfiles = item
-      for handle in dictofoutfiles.keys() :
-        filedata = dictofoutfiles[handle]
-        filename = filedata['lfn']
-        filesize = filedata['filesize']
-        if "root" in filename:
-          rootFiles[filename] = filesize
-      theoreticalFiles[dataset] = rootFiles
-
-    # Now allRootFiles should contain a dict of every root file expected
-    # in download, with its size, sorted by containing dataset name.
+    # We can find out from the backend what the output is supposed to look like.
+    theoreticalFiles = self.getExpectedFiles()
+    checksums = self.getExpectedChecksums() if self.checksumThreads > 0 else {}
+
     # Question is: are they all there?
-    actualFiles = {}
-    for dataset in theoreticalFiles.keys() :
-      # Did it get downloaded at all?
-      if dataset in os.listdir(self.outputdir) :
-        Files = {}
-        for fileName in [x for x in os.listdir(os.path.join(self.outputdir,dataset)) \
-              if os.path.isfile(os.path.join(os.path.join(self.outputdir,dataset),x))]:
-          Files[fileName] = os.path.getsize(os.path.join(os.path.join(self.outputdir,dataset),fileName))
-        actualFiles[dataset] = Files
-
-    # Possibilities:
-    # Entire dataset missing.
-    if len(actualFiles.keys()) < len(theoreticalFiles.keys()) :
+    toChecksum = []
+    for dataset in sorted(theoreticalFiles.keys()) :
+      presentFiles, isDirectoryChanged = self.listDataset(dataset)
+      nMissing = 0
+      for fileName in sorted(theoreticalFiles[dataset].keys()) :
+        filePath = os.path.join(self.outputdir,dataset,fileName)
+        if fileName not in presentFiles :
+          self.verifiedFiles.pop(filePath, None)
+          self.missingFiles.append([dataset,fileName])
+          nMissing += 1
+          continue
+        if filePath in self.verifiedFiles and not isDirectoryChanged :
+          continue
+        fileStat = os.stat(filePath)
+        fileState = (fileStat.st_size, fileStat.st_mtime)
+        if fileState == self.verifiedFiles.get(filePath) :
+          continue
+        self.verifiedFiles.pop(filePath, None)
+        shouldBeFileSize = theoreticalFiles[dataset][fileName]
+        # Files present but wrong size.
+        if fileStat.st_size != shouldBeFileSize :
+          self.corruptedFiles.append([dataset,fileName])
+          print "File",fileName,"corrupted!"
+          print "Actual size:",fileStat.st_size
+          print "Should be size:",shouldBeFileSize
+        elif fileName in checksums.get(dataset, {}) :
+          toChecksum.append([dataset,fileName,fileState])
+        else :
+          self.verifiedFiles[filePath] = fileState
+      if nMissing > 0 :
+        print nMissing,"files in dataset",dataset,"missing!"
+
+    # Files of the right size but wrong contents.
+    if toChecksum :
+      pool = ThreadPool(min(self.checksumThreads, len(toChecksum)))
+      try :
+        actualChecksums = pool.map(computeChecksum, \
+            [(os.path.join(self.outputdir,dataset,fileName), checksums[dataset][fileName]) \
+             for dataset, fileName, fileState in toChecksum])
+      finally :
+        pool.close()
+        pool.join()
+      for (dataset, fileName, fileState), actualChecksum in zip(toChecksum, actualChecksums) :
+        if actualChecksum != checksums[dataset][fileName] :
+          self.corruptedFiles.append([dataset,fileName])
+          print "File",fileName,"corrupted!"
+          print "Actual checksum:",actualChecksum
+          print "Should be checksum:",checksums[dataset][fileName]
+        else :
+          self.verifiedFiles[os.path.join(self.outputdir,dataset,fileName)] = fileState
+
+    return len(self.missingFiles) == 0 and len(self.corruptedFiles) == 0
+
+  def waitForDQ2(self) :
+    '''Wait for dq2-get to end, killing it if it runs for longer than
+    the download timeout. Returns whether it ended by itself.'''
+    process = self.dq2process
+    timer = threading.Timer(self.defineDownloadAsStuck, self.killThisDownload)
+    timer.start()
+    # Reading the output keeps dq2-get from blocking on a full pipe
+    for line in iter(process.stdout.readline, '') :
+      pass
+    process.wait()
+    timer.cancel()
+    if self.dq2process is None :
       return False
-
-    # Files within dataset missing.
-    for datasetName in theoreticalFiles.keys() :
-      theoreticalDataset = theoreticalFiles[datasetName]
-      actualDataset = actualFiles[datasetName]
-      shouldBeFiles = theoreticalDataset.keys()
-      areFiles = actualDataset.keys()
-      if len(areFiles) < len(shouldBeFiles) :
-        print "Files in dataset", datasetName,"missing!"
-        return False
-
-    # Files present but wrong size.
-      else :
-        for file in shouldBeFiles :
-          shouldBeFileSize = theoreticalDataset[file]
-          actualFileSize = actualDataset[file]
-          if actualFileSize != shouldBeFileSize :
-            self.corruptedFiles.append([datasetName,file])
-            print "File",file,"corrupted!"
-            print "Actual size:",actualFileSize
-            print "Should be size:",shouldBeFileSize
-            return False
-
-    # If we made it here, everything is there!
+    self.dq2process = None
+    self.dq2processStart = 0
     return True
 
   def killThisDownload(self) :
     '''Stop a running subprocess'''
     if self.dq2process != None:
-      os.killpg(self.dq2process.pid, signal.SIGTERM)
+      try :
+        os.killpg(self.dq2process.pid, signal.SIGTERM)
+      except OSError :
+        # Ended in the meantime
+        pass
     self.dq2process = None
     self.dq2processStart = 0
 
   def cleanAndRestart(self) :
-    '''Remove corrupted files and restart dq2'''
+    '''Remove corrupted files and restart dq2 for them and the
+    missing ones, as found by validateOutput'''
     # Reset flags
     self.isDownloadFinished=False
-    # Delete corrupted files dataset folder
+    # Delete corrupted files dataset folder, also those left by
+    # an interrupted download
     for file in self.corruptedFiles :
       datasetname = file[0]
       filename = file[1]
       os.remove(os.path.join(os.path.join(self.outputdir,datasetname), filename))
     # Now restart dq2-get.
-    self.retrieveOutput()
-
-  def checkDQ2(self) :
-    '''Check progress of dq2. Request restart if download stuck.'''
-    isComplete = self.dq2process.poll()
-    if isComplete == None :
-      if time.time()-self.dq2processStart > self.defineDownloadAsStuck :
-        print "Killing and retrying download attempt."
-        self.killThisDownload()
-        self.retrieveOutput()
-    if isComplete != None :
-      self.isDownloadFinished = True
-
-  def checkDownloadProgress(self) :
-    '''Report if download complete.'''
-
-    # Check how download is going
-    self.checkDQ2()
-
-    # Validate. Report complete when finished.
-    if self.isDownloadFinished==True :
-      if self.isDownloadFailed==False :
-        allFilesOK = self.validateOutput()
-        if (allFilesOK):
-          return 'complete'
-        else :
-          self.cleanAndRestart()
-          return 'incomplete'
-      else :
-        return 'complete'
-
-    return 'incomplete'
-
+    self.retrieveOutput(self.missingFiles + self.corruptedFiles)
+
+  def saveDownloadProgress(self) :
+    if self.stateStore != None :
+      self.stateStore.saveDownloadProgress(self)
+
+  def getExpectedFiles(self) :
+    '''Size of each expected output file, by file name, by dataset.'''
+    if self.expectedFiles == None :
+      self.expectedFiles = self.backend.listExpectedFiles(self.outDS)
+    return self.expectedFiles
+
+  def getExpectedChecksums(self) :
+    if self.expectedChecksums == None :
+      self.expectedChecksums = self.backend.listExpectedChecksums(self.outDS)
+    return self.expectedChecksums
+
+  def getExpectedSize(self) :
+    '''Total size of the output in bytes.'''
+    return sum([sum(files.values()) for files in self.getExpectedFiles().values()])
+
+  def getBytesPresent(self) :
+    '''Total size of the files found complete by validateOutput.'''
+    return sum([fileState[0] for fileState in self.verifiedFiles.values()])
+
+  def listDataset(self, dataset) :
+    '''Names of the files in the directory of dataset, listed again
+    only if it changed, and whether it did since the last call.'''
+    directory = os.path.join(self.outputdir,dataset)
+    if not os.path.isdir(directory) :
+      self.datasetListings.pop(dataset, None)
+      return set(), True
+    modificationTime = os.stat(directory).st_mtime
+    if dataset in self.datasetListings :
+      listedTime, listedAt, fileNames = self.datasetListings[dataset]
+      # A listing made within a second of a change may have missed a
+      # later change with the same coarse modification time
+      if listedTime == modificationTime and listedAt - listedTime > 1 :
+        return fileNames, False
+    listedAt = time.time()
+    fileNames = set([x for x in os.listdir(directory) if os.path.isfile(os.path.join(directory,x))])
+    self.datasetListings[dataset] = (modificationTime, listedAt, fileNames)
+    return fileNames, True
+
+
+def computeChecksum(arguments) :
+  '''Checksum of a file in the form of the expected one, which
+  gives the algorithm: 'ad:' for adler32, 'md5:' for md5.'''
+  filePath, expected = arguments
+  algorithm = expected.split(':')[0]
+  if algorithm not in ['ad', 'md5'] :
+    # Unknown: taken as matching
+    return expected
+  adler = 1
+  md5 = hashlib.md5()
+  readableFile = open(filePath, 'rb')
+  for block in iter(lambda : readableFile.read(1 << 20), '') :
+    if algorithm == 'ad' :
+      adler = zlib.adler32(block, adler)
+    else :
+      md5.update(block)
+  readableFile.close()
+  if algorithm == 'ad' :
+    return 'ad:%08x' % (adler & 0xffffffff)
+  return 'md5:' + md5.hexdigest()
@@ -0,0 +1,128 @@
+# Record of everything Juggernaut knows about its jobs, kept in an
+# SQLite file so that a monitor which crashed or was stopped carries on
+# where it left off when started again with the same file: submitted
+# commands are not submitted again, retry and download attempts keep
+# their counts, and files already downloaded and validated are neither
+# fetched nor checked again.
+#
+# Each change is written in a transaction of its own. Jobs are in one
+# of the states
+#
+#   submitted    submitted, not yet read from the backend
+#   monitoring   waiting for the job to end
+#   held         waiting for a download stream
+#   downloading  output being downloaded
+#   retried      replaced by a new job
+#   successful, failed
+#
+# Only backends whose jobs outlive the monitor (PanDA) can be resumed.
+
+
+import sqlite3
+import threading
+import time
+
+schema = """
+CREATE TABLE IF NOT EXISTS commands (
+  command TEXT PRIMARY KEY, JobIDs TEXT, submitted REAL);
+CREATE TABLE IF NOT EXISTS jobs (
+  JobID TEXT PRIMARY KEY, inDS TEXT, outDS TEXT, site TEXT, state TEXT,
+  status TEXT, statusSince REAL, prunAttemptCount INTEGER,
+  dq2AttemptCount INTEGER, downloadedBytes INTEGER, updated REAL);
+CREATE TABLE IF NOT EXISTS files (
+  JobID TEXT, path TEXT, size INTEGER, mtime REAL, PRIMARY KEY (JobID, path));
+"""
+
+endStates = ['retried', 'successful', 'failed']
+
+
+class JobStore(object) :
+
+  ## ----------------------------------------------------
+  ## Initialisers
+
+  def __init__(self, fileName=":memory:") :
+    self.fileName = fileName
+    # Written to by download threads too
+    self.lock = threading.Lock()
+    self.connection = sqlite3.connect(fileName, check_same_thread=False)
+    self.connection.row_factory = sqlite3.Row
+    # Job IDs and names as str, like those of the backends
+    self.connection.text_factory = str
+    if fileName != ":memory:" :
+      # Readers and the writer do not block each other; a crash can
+      # lose at most the last transactions, never corrupt the file.
+      self.connection.execute("PRAGMA journal_mode=WAL")
+      self.connection.execute("PRAGMA synchronous=NORMAL")
+    with self.lock :
+      self.connection.executescript(schema)
+
+  ## ----------------------------------------------------
+  ## Setters
+
+  def saveSubmission(self, command, jobIDs) :
+    with self.lock, self.connection :
+      self.connection.execute("INSERT OR REPLACE INTO commands VALUES (?, ?, ?)", \
+                              (command, ",".join(jobIDs), time.time()))
+      for jobID in jobIDs :
+        self.connection.execute("INSERT OR IGNORE INTO jobs (JobID, state, updated) VALUES (?, 'submitted', ?)", \
+                                (jobID, time.time()))
+
+  def saveJob(self, job, state, retriedJobID=None) :
+    '''Record job, and that it replaces retriedJobID if given.'''
+    with self.lock, self.connection :
+      self.connection.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", \
+                              (str(job.JobID), job.inDS, job.outDS, job.site, state, ",".join(job.status), \
+                               job.statusSince, job.prunAttemptCount, job.dq2AttemptCount, \
+                               job.downloadedBytes, time.time()))
+      if retriedJobID != None and str(retriedJobID) != str(job.JobID) :
+        self.connection.execute("UPDATE jobs SET state = 'retried', updated = ? WHERE JobID = ?", \
+                                (time.time(), str(retriedJobID)))
+
+  def setState(self, jobID, state) :
+    with self.lock, self.connection :
+      self.connection.execute("UPDATE jobs SET state = ?, updated = ? WHERE JobID = ?", \
+                              (state, time.time(), str(jobID)))
+
+  def saveStatus(self, job) :
+    with self.lock, self.connection :
+      self.connection.execute("UPDATE jobs SET status = ?, statusSince = ?, updated = ? WHERE JobID = ?", \
+                              (",".join(job.status), job.statusSince, time.time(), str(job.JobID)))
+
+  def saveDownloadProgress(self, job) :
+    '''Record the download attempts of job and the files found
+    complete so far.'''
+    with self.lock, self.connection :
+      self.connection.execute("UPDATE jobs SET dq2AttemptCount = ?, downloadedBytes = ?, updated = ? WHERE JobID = ?", \
+                              (job.dq2AttemptCount, job.downloadedBytes, time.time(), str(job.JobID)))
+      self.connection.execute("DELETE FROM files WHERE JobID = ?", (str(job.JobID),))
+      self.connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?)", \
+                                  [(str(job.JobID), filePath, size, mtime) \
+                                   for filePath, (size, mtime) in job.verifiedFiles.items()])
+
+  ## ----------------------------------------------------
+  ## Getters
+
+  def isSubmitted(self, command) :
+    with self.lock :
+      row = self.connection.execute("SELECT 1 FROM commands WHERE command = ?", (command,)).fetchone()
+    return row != None
+
+  def loadJobs(self) :
+    '''Rows of the jobs which have not ended, each with the dict
+    files of the (size, mtime) of its complete files by path.'''
+    with self.lock :
+      rows = self.connection.execute("SELECT * FROM jobs WHERE state NOT IN (?, ?, ?) ORDER BY JobID", \
+                                     endStates).fetchall()
+      jobs = []
+      for row in rows :
+        job = dict(zip(row.keys(), row))
+        job["files"] = dict([(fileRow["path"], (fileRow["size"], fileRow["mtime"])) for fileRow in \
+            self.connection.execute("SELECT * FROM files WHERE JobID = ?", (row["JobID"],))])
+        jobs.append(job)
+    return jobs
+
+  def getEndedJobIDs(self, state) :
+    with self.lock :
+      rows = self.connection.execute("SELECT JobID FROM jobs WHERE state = ? ORDER BY updated", (state,)).fetchall()
+    return [row["JobID"] for row in rows]
@@ -12,14 +12,13 @@
 import sys
 import subprocess
 import time
-from os import environ, path
-from pandatools import PdbUtils
-from gridobjects import GridJobset, GridJob
-
-# Import pbook
-tmp, __name__ = __name__, 'pbook'
-execfile(path.join(environ["ATLAS_LOCAL_ROOT_BASE"], "x86_64/PandaClient/current/bin/pbook") )
-__name__ = tmp
+import threading
+import traceback
+import Queue
+from gridobjects import GridJob
+from downloadscheduler import DownloadScheduler
+from jobstore import JobStore
+from backends import JobInfo
 
 class Juggernaut(object) :
 
@@ -35,25 +34,22 @@ class Juggernaut(object) :
     self.defineDownloadAsStuck = 3600 # One hour
     self.pandaRetryLimit =3 
     self.dq2RetryLimit = 3
-    self.maxDQ2Streams = 3
-    self.nDQ2StreamsInProgress = 0
+    # Each download runs in a thread, which puts the JobID of its job
+    # here when it is done. Jobs waiting for a stream are held by the
+    # scheduler, which also sets the number of streams (at most 3).
+    self.finishedDownloads = Queue.Queue()
+    self.scheduler = DownloadScheduler(3)
     self.dq2SetupScript = "/home/pachal/scripts/dq2_setup.sh"
+    self.checksumThreads = 0
 
     self.syncToRunningJobs = False
     self.additionalJobs = []
 
-    self.createPbook()
-    self.createPdbUtils()
-
-  def createPbook(self) :
-    enforceEnter = False
-    verbose   = False
-    restoreDB = False
-    self.pbookCore = PBookCore(enforceEnter, verbose, restoreDB)
-
-  def createPdbUtils(self) :
-    verbose = False
-    PdbUtils.initialzieDB(verbose)
+    # JobBackend the jobs run on: PanDA unless set otherwise
+    self.backend = None
+    # SQLite file the state of all jobs is kept in, to resume from
+    self.stateFile = ":memory:"
+    self.stateStore = None
 
   ## ----------------------------------------------------
   ## Setters
@@ -82,7 +78,17 @@ class Juggernaut(object) :
 
   # Maximum number of subjobs dq2-getting things at once
   def setMaxDQ2Streams(self, maxStreams) :
-    self.maxDQ2Streams = maxStreams
+    self.scheduler.setMaxStreams(maxStreams)
+
+  # Whether to tune the number of streams to the download speed,
+  # up to the maximum, or always use the maximum
+  def setAdaptiveDQ2Streams(self, adaptive) :
+    self.scheduler.setAdaptive(adaptive)
+
+  # Verify the checksums of downloaded files on this many threads,
+  # where the backend knows them. 0 checks file sizes only.
+  def setChecksumThreads(self, nThreads) :
+    self.checksumThreads = nThreads
 
   # Time at which a job not yet running is considered stuck
   def setTimeToDefineStuckJob(self, timeout) :
@@ -101,26 +107,49 @@ class Juggernaut(object) :
   def setDQ2SetupScript(self, script) :
     self.dq2SetupScript = script
 
+  # Batch system to use instead of PanDA and dq2: see backends.py
+  def setBackend(self, backend) :
+    self.backend = backend
+
+  # Keep the state of all jobs in this file. Started again with the
+  # same file, the monitor resumes where it stopped: commands in it
+  # are not submitted again. Delete it to start afresh. Only jobs which
+  # outlive the monitor (PanDA) can be resumed: those of other backends
+  # are marked failed.
+  def setStateFile(self, fileName) :
+    self.stateFile = fileName
+
+  # Rest time in seconds between two checks of all jobs
+  def setDowntime(self, downtime) :
+    self.downtime = downtime
+
   ## ----------------------------------------------------
   ## Main function
 
   def execute(self) :
 
-    # Hold output jobs
-    self.failedJobs = []
-    self.successfulJobs = []
+    if self.backend == None :
+      from backends import PandaBackend
+      self.backend = PandaBackend(self.dq2SetupScript)
+
+    # Hold output jobs, starting with those of an earlier run
+    self.stateStore = JobStore(self.stateFile)
+    self.failedJobs = self.stateStore.getEndedJobIDs('failed')
+    self.successfulJobs = self.stateStore.getEndedJobIDs('successful')
+    self.currentJobs = {}
+    self.resumeJobs()
 
     # Run all commands to submit new jobsets to the grid.
     # Retrieve the JobIDs and stats of all newly created jobs.
     print "About to submit requested jobs"
-    self.currentJobs = {}
     for item in self.commandList :
-      newjobset = GridJobset(item)
-      newjobset.submit()
-      createdJobs = newjobset.JobIDs
+      if self.stateStore.isSubmitted(item) :
+        print "Already submitted:",item
+        continue
+      createdJobs = self.backend.submit(item)
+      self.stateStore.saveSubmission(item, createdJobs)
       # Register newly existing JobIDS
-      self.pbookCore.sync()
-      PdbUtils.getListOfJobIDs(True,False)
+      self.backend.sync()
       for jobID in createdJobs :
         self.addJobToList(jobID)
     print "Submitted jobs",self.currentJobs.keys()
@@ -128,14 +157,15 @@ class Juggernaut(object) :
     # If specified jobs to pick up, get those:
     if len(self.additionalJobs)!=0 :
       print "Adding specified jobs to list."
+      self.backend.sync()
       for item in self.additionalJobs :
         self.addJobToList(item)
 
     # If we are supposed to include all running jobs, add those
     if self.syncToRunningJobs==True :
       print "Adding currently running jobs to list."
-      # Param 'True' means only jobs not 'frozen' are kept
-      runningJobs = PdbUtils.getListOfJobIDs(True,False)
+      self.backend.sync()
+      runningJobs = self.backend.getRunningJobIDs()
       for item in runningJobs :
         self.addJobToList(item)
 
@@ -144,14 +174,20 @@ class Juggernaut(object) :
     # Run this until all jobs are complete.
     while len(self.currentJobs.keys())>0 :
 
-      # Synchronise pbook.
-      self.pbookCore.sync()
+      # Synchronise the backend and read all jobs, once per cycle.
+      self.backend.sync()
+      jobInfos = self.backend.getJobInfos(self.currentJobs.keys())
 
-      # Check each job and act accordingly.
+      # Check each job and act accordingly. Jobs which are downloading
+      # are left to their download threads.
       self.currentJobIDs = sorted(self.currentJobs.keys())
       for jobID in self.currentJobIDs :
+        if jobID not in self.currentJobs :
+          continue
         job = self.currentJobs[jobID]
-        currentStatus = self.checkCurrentStatus(job)
+        if job.isCurrentlyDownloading :
+          continue
+        currentStatus = self.checkCurrentStatus(job, jobInfos.get(jobID))
 
         if currentStatus == 'stillRunning' :
           continue
@@ -159,12 +195,13 @@ class Juggernaut(object) :
         elif currentStatus == 'stuck' :
           self.unstick(job)
 
-        elif currentStatus == 'failed' :
-          if job.prunAttemptCount < self.pandaRetryLimit :
+        elif currentStatus == 'failed' or currentStatus == 'lost' :
+          if currentStatus == 'failed' and job.prunAttemptCount < self.pandaRetryLimit :
             self.retryFailed(job)
           else :
-            self.failedJobs.append[jobID]
+            self.failedJobs.append(jobID)
             del self.currentJobs[jobID]
+            self.stateStore.setState(jobID, 'failed')
 
         elif currentStatus == 'finished' :
           ## If running a test code which does not produce an
@@ -172,18 +209,20 @@ class Juggernaut(object) :
           if job.outDS == "" :
             del self.currentJobs[jobID]
             self.successfulJobs.append(jobID)
+            self.stateStore.setState(jobID, 'successful')
           ## dq2-get output.
           else :
-            self.getOutput(job)
+            self.getOutput(jobID)
 
         else :
           print "Error!"
           self.currentJobs = {}
           break
 
-      # Wait required gap time, then go to next iteration.
+      # Until the next cycle, deal with downloads as they end.
+      self.startHeldDownloads()
       print "\n"
-      time.sleep(self.downtime)
+      self.waitForDownloads(self.downtime)
 
     print "All jobs finished."
     print "Successful jobs:",self.successfulJobs
@@ -194,101 +233,184 @@ class Juggernaut(object) :
   ## ----------------------------------------------------
   ## Constituent functions
 
-  def addJobToList(self, jobID) :
-    '''Get job info for jobID and add GridJob to self.currentJobs'''
-    self.pbookCore.sync()
+  def addJobToList(self, jobID, retriedJob=None) :
+    '''Get job info for jobID and add GridJob to self.currentJobs.
+    If it is a retry of retriedJob, it keeps its count of attempts.
+    The backend has to be synchronised beforehand.'''
     if not isinstance(jobID, str) :
       jobID = '%d' % jobID
+    if jobID in self.successfulJobs or jobID in self.failedJobs :
+      return
     if jobID not in self.currentJobs.keys() :
-      jobinfo = PdbUtils.readJobDB(jobID,False)
+      jobinfo = self.backend.getJobInfo(jobID)
       if jobinfo==None :
         print "No job found with ID",jobID,"!"
         self.failedJobs.append(jobID)
+        self.stateStore.setState(jobID, 'failed')
         return
-      newjob = GridJob(jobinfo,self.outputdir,self.dq2SetupScript,\
-               self.defineDownloadAsStuck,self.dq2RetryLimit)
+      newjob = self.makeGridJob(jobinfo)
+      retriedJobID = None
+      if retriedJob != None :
+        newjob.prunAttemptCount = retriedJob.prunAttemptCount
+        retriedJobID = retriedJob.JobID
       self.currentJobs[jobID] = newjob
+      self.stateStore.saveJob(newjob, 'monitoring', retriedJobID)
+
+  def makeGridJob(self, jobinfo) :
+    newjob = GridJob(jobinfo,self.outputdir,self.backend,\
+             self.defineDownloadAsStuck,self.dq2RetryLimit,self.checksumThreads)
+    newjob.stateStore = self.stateStore
+    return newjob
+
+  def resumeJobs(self) :
+    '''Monitor again the jobs of an earlier run which had not ended,
+    as they were then. Downloads which were under way start over,
+    keeping the files they had completed.'''
+    submittedJobs = []
+    for row in self.stateStore.loadJobs() :
+      if row["state"] == 'submitted' :
+        submittedJobs.append(row["JobID"])
+        continue
+      jobinfo = JobInfo(row["JobID"], row["outDS"], row["inDS"], row["site"])
+      job = self.makeGridJob(jobinfo)
+      job.status = row["status"].split(",")
+      job.statusSince = row["statusSince"]
+      job.prunAttemptCount = row["prunAttemptCount"]
+      job.dq2AttemptCount = row["dq2AttemptCount"]
+      job.verifiedFiles = row["files"]
+      self.currentJobs[row["JobID"]] = job
+      if row["state"] != 'monitoring' :
+        self.stateStore.setState(row["JobID"], 'monitoring')
+    if not self.currentJobs and not submittedJobs :
+      return
+    self.backend.sync()
+    # Jobs of backends whose jobs end with the monitor are gone
+    for jobID in sorted(self.currentJobs.keys()) :
+      if self.backend.getJobInfo(jobID) == None :
+        print "Job",jobID,"of",self.stateFile,"is unknown to the backend, whose jobs",\
+              "may not outlive the monitor. Marking it failed."
+        del self.currentJobs[jobID]
+        self.failedJobs.append(jobID)
+        self.stateStore.setState(jobID, 'failed')
+    for jobID in submittedJobs :
+      self.addJobToList(jobID)
+    if self.currentJobs :
+      print "Resuming jobs",sorted(self.currentJobs.keys())
 
   def performRetry(self,job) :
     '''Retry a previous job. Update stored information.'''
     # Get current info for this job
     oldJobID = job.JobID
-    jobInfo = PdbUtils.readJobDB(oldJobID,False)
-    # Determine whether we need to redo build
-    if jobInfo.buildStatus in ['','finished'] :
-      print "Build OK."
-      self.pbookCore.retry(oldJobID,newSite=self.useNewSite)
-    else :
-      print "Retrying build."
-      self.pbookCore.retry(oldJobID,retryBuild=True,newSite=self.useNewSite)
-    # Retrieve ID of new job
-    jobInfo = PdbUtils.readJobDB(oldJobID,False)
-    newJobID = jobInfo.retryID
-    if newJobID == 0 :
-      newJobID == oldJobID
+    newJobID = self.backend.retry(oldJobID,newSite=self.useNewSite)
     # Remove old information in currentJobs
     if not isinstance(oldJobID,str) :
       oldJobID = '%d' % oldJobID
     del self.currentJobs[oldJobID]
-    # Put current information in currentJobs
-    self.addJobToList(newJobID)
+    # Put current information in currentJobs, keeping count of attempts
+    self.addJobToList(newJobID, job)
     print "Retrying job",oldJobID,". New JobID:",newJobID
 
   def unstick(self,job) :
     '''Kill and retry stuck job. Replace old jobID with new one.'''
     idToKill = job.JobID
-    self.pbookCore.kill(idToKill)
+    self.backend.kill(idToKill)
     self.performRetry(job)
 
   def retryFailed(self, job) :
     '''Retry a failed job once db entry is frozen.'''
     print "retrying failed job"
     #Is anything in the job still running? If so, kill it.
-    jobInfo = PdbUtils.readJobDB(job.JobID,False)
+    jobInfo = self.backend.getJobInfo(job.JobID)
     if jobInfo.dbStatus!='frozen' :
-      self.pbookCore.kill(job.JobID)
-    self.performRetry(job)
+      self.backend.kill(job.JobID)
     job.prunAttemptCount += 1
+    self.performRetry(job)
 
-  def getOutput(self, job) :
-    '''Start process of dq2-getting output from completed job'''
-    if job.isCurrentlyDownloading :
-      status = job.checkDownloadProgress()
-      if status == 'incomplete' :
-        print "Job",job.JobID,"currently downloading, status==incomplete"
-        return
-      else :
-        print "Job",job.JobID,"done downloading!"
-        del self.currentJobs[job.JobID]
-        self.nDQ2StreamsInProgress -= 1
-        if job.isDownloadFailed == True :
-          self.failedJobs.append(job.JobID)
-        else :
-          self.successfulJobs.append(job.JobID)
-    elif self.nDQ2StreamsInProgress >= self.maxDQ2Streams :
-      print "Holding job",job.JobID,"until dq2 stream available."
+  def getOutput(self, jobID) :
+    '''Queue the output of a completed job for dq2-getting. Outputs
+    of jobs retried most often go first, then the smallest.'''
+    if self.scheduler.isHeld(jobID) :
       return
+    job = self.currentJobs[jobID]
+    print "Holding job",jobID,"until dq2 stream available."
+    self.scheduler.hold(jobID, (-job.prunAttemptCount, job.getExpectedSize()))
+    self.stateStore.setState(jobID, 'held')
+
+  def startHeldDownloads(self) :
+    '''Start held downloads on the free streams.'''
+    jobID = self.scheduler.nextToStart()
+    while jobID != None :
+      self.startDownload(jobID)
+      jobID = self.scheduler.nextToStart()
+
+  def startDownload(self, jobID) :
+    '''Download and validate the output of a job in a thread.'''
+    print "Starting download of job",jobID
+    job = self.currentJobs[jobID]
+    job.isCurrentlyDownloading = True
+    self.stateStore.setState(jobID, 'downloading')
+    thread = threading.Thread(target=self.download, args=(jobID, job))
+    thread.daemon = True
+    thread.start()
+
+  def download(self, jobID, job) :
+    # In the download thread
+    try :
+      job.downloadOutput()
+    except Exception :
+      traceback.print_exc()
+      job.isDownloadFailed = True
+    self.finishedDownloads.put(jobID)
+
+  def waitForDownloads(self, timeout) :
+    '''For timeout seconds, handle downloads as they end, starting
+    held ones on the streams they free.'''
+    endTime = time.time() + timeout
+    while len(self.currentJobs.keys())>0 :
+      remaining = endTime - time.time()
+      if remaining <= 0 :
+        return
+      try :
+        jobID = self.finishedDownloads.get(True, remaining)
+      except Queue.Empty :
+        return
+      self.finishDownload(jobID)
+      self.startHeldDownloads()
+
+  def finishDownload(self, jobID) :
+    print "Job",jobID,"done downloading!"
+    job = self.currentJobs.pop(jobID)
+    self.scheduler.finished(job.downloadedBytes)
+    if job.isDownloadFailed == True :
+      self.failedJobs.append(jobID)
+      self.stateStore.setState(jobID, 'failed')
     else :
-      print "Starting download of job",job.JobID
-      self.nDQ2StreamsInProgress += 1
-      job.retrieveOutput()
+      self.successfulJobs.append(jobID)
+      self.stateStore.setState(jobID, 'successful')
 
-  def checkCurrentStatus(self,job) :
+  def checkCurrentStatus(self,job,jobInfo=None) :
     '''I use combinations of panda job statuses to define
-    jobs as finished, failed, stuck, or running.'''
+    jobs as finished, failed, stuck, or running; jobs the
+    backend does not know are lost. jobInfo is read if not
+    given.'''
 
     # Panda job status options are:
     # [defined, assigned, activated, running
     #  holding, transferring, finished, failed]
     # https://www.gridpp.ac.uk/wiki/ATLAS_Monitoring_For_Sites
 
-    jobInfo = PdbUtils.readJobDB(job.JobID)
+    if jobInfo == None :
+      jobInfo = self.backend.getJobInfo(job.JobID)
+    if jobInfo == None :
+      print "Job",job.JobID,"is unknown to the backend!"
+      return 'lost'
     statusstring = jobInfo.jobStatus
     status = statusstring.split(",")
     print "Status of job", job.JobID, "is", status
     if sorted(status)!=sorted(job.status) :
       job.status = status
       job.statusSince = time.time() # seconds
+      self.stateStore.saveStatus(job)
     timeInThisState = time.time() - job.statusSince
 
     # If anything has failed, need to retry
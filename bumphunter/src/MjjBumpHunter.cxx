@@ -184,17 +184,17 @@ void MjjBumpHunter::DoTestCore(TH1D h_data, TH1D h_bkg, int minWidth, int maxWid
       // Get probabilities for observations in window and sidebands
       if (fDoErr) {
         //if (fNoisy) std::cout << "Doing number " << counter << ": bins " << binL << " to " << binR << std::endl;
-        probC = PoissonConvGammaPval(dC,bC,deltaBC);
+        probC = fPvalCache.PoissonConvGammaPval(dC,bC,deltaBC);
         if (fUseSidebands) {
-          probL = PoissonConvGammaPval(dC,bC,deltaBC);
-          probR = PoissonConvGammaPval(dC,bC,deltaBC);
+          probL = fPvalCache.PoissonConvGammaPval(dC,bC,deltaBC);
+          probR = fPvalCache.PoissonConvGammaPval(dC,bC,deltaBC);
         }
         if (probC < 0.0000001) {std::cout << "Error!" << std::endl;}
       } else {
-        probC = PoissonPval(dC,bC);
+        probC = fPvalCache.PoissonPval(dC,bC);
         if (fUseSidebands) {
-          probL = PoissonPval(dL,bL);
-          probR = PoissonPval(dR,bR);
+          probL = fPvalCache.PoissonPval(dL,bL);
+          probR = fPvalCache.PoissonPval(dR,bR);
         }
       }
 
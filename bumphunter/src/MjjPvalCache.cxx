@@ -0,0 +1,109 @@
+// ---------------------------------------------------------
+
+#include "inc/MjjPvalCache.h"
+
+// ---------------------------------------------------------
+MjjPvalCache::MjjPvalCache(unsigned int maxEntries)
+{
+
+  fMaxEntries = maxEntries;
+  fHits = 0;
+  fMisses = 0;
+
+}
+
+// ---------------------------------------------------------
+MjjPvalCache::~MjjPvalCache()
+   { }
+
+// ---------------------------------------------------------
+double MjjPvalCache::PoissonPval(const double& d, const double& b)
+{
+
+  Key key = {d, b, -1.};
+  return Lookup(key);
+
+}
+
+// ---------------------------------------------------------
+double MjjPvalCache::PoissonConvGammaPval(const double& d, const double& b, const double& bErr)
+{
+
+  Key key = {d, b, bErr};
+  return Lookup(key);
+
+}
+
+// ---------------------------------------------------------
+double MjjPvalCache::Lookup(const Key & key)
+{
+
+  std::unordered_map<Key, EntryList::iterator, KeyHash>::iterator found = fIndex.find(key);
+  if (found != fIndex.end()) {
+    fHits++;
+    // Move to the front: most recently used
+    fEntries.splice(fEntries.begin(), fEntries, found->second);
+    return found->second->second;
+  }
+
+  fMisses++;
+  double pval;
+  if (key.bErr < 0) pval = ::PoissonPval(key.d,key.b);
+  else pval = ::PoissonConvGammaPval(key.d,key.b,key.bErr);
+
+  if (fMaxEntries == 0) return pval;
+
+  fEntries.push_front(std::make_pair(key,pval));
+  fIndex[key] = fEntries.begin();
+  while (fEntries.size() > fMaxEntries) {
+    fIndex.erase(fEntries.back().first);
+    fEntries.pop_back();
+  }
+
+  return pval;
+
+}
+
+// ---------------------------------------------------------
+double MjjPvalCache::GetHitRate()
+{
+
+  unsigned long total = fHits + fMisses;
+  if (total == 0) return 0;
+  return (double)fHits/(double)total;
+
+}
+
+// ---------------------------------------------------------
+void MjjPvalCache::PrintStatistics()
+{
+
+  std::cout << "P-value cache: " << fEntries.size() << " entries, " << fHits << " hits, "
+            << fMisses << " misses, hit rate " << GetHitRate() << std::endl;
+
+}
+
+// ---------------------------------------------------------
+void MjjPvalCache::SetMaxEntries(unsigned int maxEntries)
+{
+
+  fMaxEntries = maxEntries;
+  while (fEntries.size() > fMaxEntries) {
+    fIndex.erase(fEntries.back().first);
+    fEntries.pop_back();
+  }
+
+}
+
+// ---------------------------------------------------------
+void MjjPvalCache::Clear()
+{
+
+  fEntries.clear();
+  fIndex.clear();
+  fHits = 0;
+  fMisses = 0;
+
+}
+
+// ---------------------------------------------------------